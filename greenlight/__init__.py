@@ -28,6 +28,7 @@ Public methods:
     - convert_energy_plus: Convert an EnergyPlus weather file from EnergyPlus' CSV format to the format needed by
         the GreenLight model (Katzin 2020, Katzin 2021)
     - copy_builtin_models: Copy the built-in model files included in the greenlight package to a user-provided location
+    - convert_input_data: Convert an input data CSV file to a binary file (.npz, .parquet, .feather, or .npy)
 """
 
 __author__ = "David Katzin, Wageningen University & Research"
@@ -47,6 +48,6 @@ except Exception:
 
 from .core import GreenLight
 from .energy_plus import convert_energy_plus
-from .utils import copy_builtin_models
+from .utils import convert_input_data, copy_builtin_models
 
-__all__ = ["GreenLight", "convert_energy_plus", "copy_builtin_models"]
+__all__ = ["GreenLight", "convert_energy_plus", "convert_input_data", "copy_builtin_models"]
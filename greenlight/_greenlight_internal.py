@@ -45,7 +45,13 @@ class GreenLightInternal:
         variables_formatted (dict[str, str]): The model variables after being loaded and formatted
         dependencies (dict[str, str]): For each variable, a list of the variables that this variable depends on
         solving_order (list): All model variables, ordered in a way they can be solved sequentially
+        solving_levels (list[list[str]]): The variables of solving_order, grouped into levels that can be solved
+            in parallel: each variable depends only on variables in earlier levels
         commands (list[str]): Representation of the defined dynamic model as Python commands
+        jac_commands (list[str]): Representation of the Jacobian of the dynamic model as Python commands,
+            if options["jacobian"] is "analytic"
+        parameters (list[str]): Names of the model constants given to the ODE function as an array of parameters,
+            if options["parametrize_consts"] is "True"
 
         consts (dict[str, str]): A subset of variables, containing the model constants
         inputs (dict[str, str]): A subset of variables, containing the model inputs
@@ -53,11 +59,15 @@ class GreenLightInternal:
         aux (dict[str, str]): A subset of variables, containing model auxiliary states
         states (dict[str, str]): A subset of variables, containing the model states
         init (dict[str, str]): A dict with the same keys sa states, and with values containing the initial values
-        input_data (pandas.DataFrame):  Input data provided to the model for each variable in inputs
+        input_data (pandas.DataFrame):  Input data provided to the model for each variable in inputs. May be a read-only
+            view of a memory-mapped .npy file, see greenlight._load._input_files.read_input_array
+        input_time_step (float | None): The step size of input_data["Time"] if it is equally spaced, otherwise None
 
         start_time (datetime.datetime): The start time in the simulated model run
         states_sol (numpy.array): Solution of the states trajectories
         full_sol (pandas.DataFrame): Time trajectories of all model variables, after solving
+        compiled_code (dict): Compiled Python functions (or modules, if options["rhs_module"] is "True") created while
+            solving, with their source code as keys. Reused when the model is solved again
 
         options (dict[str, str]): A dictionary containing options related to model formatting and solving
     """
@@ -125,10 +135,10 @@ class GreenLightInternal:
 
         # Add to object log some system information
         try:
-            version = importlib.metadata.version('greenlight')
+            version = importlib.metadata.version("greenlight")
         except importlib.metadata.PackageNotFoundError:
             version = "development"
-        
+
         self.log = (
             f"GreenLight simulation running greenlight version {version}\n"
             f"Python version: {platform.python_version()}\n"
@@ -147,7 +157,10 @@ class GreenLightInternal:
         self.variables_formatted = {}
         self.dependencies = {}
         self.solving_order = []
+        self.solving_levels = []
         self.commands = []
+        self.jac_commands = []
+        self.parameters = []
 
         self.consts = {}
         self.inputs = {}
@@ -156,9 +169,11 @@ class GreenLightInternal:
         self.states = {}
         self.init = {}
         self.input_data = pd.DataFrame()
+        self.input_time_step = None
 
         self.start_time = None
 
+        self.compiled_code = {}
         self.states_sol = []
         self.full_sol = pd.DataFrame()
 
@@ -171,10 +186,34 @@ class GreenLightInternal:
             # will be expanded to be described using only built-in expressions, inputs, and model states
             "expand_functions": "True",  # If "True", model functions will be expanded and replaced
             # in variable definitions
+            "function_temporaries": "False",  # If "True", function arguments used more than once in the function
+            # definition become temporary variables when functions are expanded, see greenlight._load._expand_functions
             "solving_method": "solve_ivp_from_str",  # "solve_ivp" or "solve_ivp_from_str"
             "interpolation": "linear",  # "left" or "linear"
+            "input_time_grid": "first",  # "first" or "union", the time points of input data combined from
+            # several files: those of the first file, or those of all files
+            "trim_input_data": "True",  # If "True", only the rows of input data files needed for simulating from
+            # t_start to t_end are read
             "solver": "BDF",  # Depends on the solving method, typically one of the methods of solve_ivp, see:
             # https://docs.scipy.org/doc/scipy/reference/generated/scipy.integrate.solve_ivp.html
+            "jacobian": "finite_difference",  # "finite_difference" or "analytic", how the Jacobian of the model
+            # is computed by implicit solvers (BDF, Radau, LSODA)
+            "jac_sparsity": "False",  # If "True", the sparsity pattern of the Jacobian, found from the model
+            # dependencies, is passed to implicit solvers (BDF, Radau, LSODA)
+            "fold_constants": "True",  # If "True", constants and expressions depending only on constants are
+            # evaluated once while loading, see greenlight._load._fold_constants
+            "cache_dir": "None",  # If not "None", directory for storing compiled models, reused when the same
+            # model is loaded again, e.g., "~/.cache/greenlight"
+            "rhs_module": "False",  # If "True", the ODE function is written to a Python module in cache_dir and
+            # imported, instead of being defined from a string
+            "parametrize_consts": "False",  # If "True", model constants are given to the ODE function as an array,
+            # allowing to change their values without loading the model again
+            "cse": "True",  # If "True", repeated subexpressions in the model are computed once per evaluation
+            # of the ODE function, see greenlight._load._cse
+            "rhs_mode": "array",  # "array" or "scalar", whether the ODE function generated by solve_ivp_from_str
+            # operates on NumPy arrays or on Python floats
+            "vectorized": "False",  # If "True", the ODE function accepts states of shape (n_states, k), allowing
+            # implicit solvers (BDF, Radau) to evaluate several perturbed states in one call
             "first_step": "None",  # Passed as an argument to the ODE solver
             "max_step": "3600",  # Default is 1 hour = 3600 seconds
             "atol": "1e-3",  # Passed as an argument to the ODE solver
@@ -14,6 +14,11 @@ Modules:
     - _parse_model: Functions for parsing a model stored in a GreenLightInternal object and reformatting it
         according to predefined settings
     - _expand_functions: Functions for parsing model function calls and definitions in a GreenLightInternal object.
+    - _differentiate: Functions for symbolic differentiation of model expressions, used for an analytic Jacobian
+    - _fold_constants: Constant folding, evaluating model constants and constant subexpressions while loading
+    - _cache: On-disk cache of compiled models, reused when the same model is loaded again
+    - _json_cache: In-memory cache of parsed JSON files, reused when the same files are loaded again in a process
+    - _cse: Common subexpression elimination, replacing repeated subexpressions in the model by temporary variables
     - _utils: Functions for performing small tasks
 """
 
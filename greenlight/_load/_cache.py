@@ -0,0 +1,161 @@
+"""
+GreenLight/greenlight/_load/_cache.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+On-disk cache of compiled models, see options["cache_dir"] in docs/simulation_options.md.
+After the model definitions are read (from JSON files, CSV files, and dicts), the loaded model is compiled:
+its expressions are formatted, folded, and converted to Python commands. Compiling takes most of the loading time,
+and its result depends only on the model definitions, some of the options, and the code of greenlight._load.
+The compiled attributes are therefore stored in a file whose name is a hash of these, and read from this file when
+the same model is loaded again. Any change in the content of a model file, an inline dict, a relevant option,
+or the code of greenlight._load leads to a different hash, so outdated files are never used.
+
+Public functions:
+    cache_key(mdl: GreenLightInternal) -> str
+        Create a hash of everything that the compiled model depends on
+    load_from_cache(mdl: GreenLightInternal, cache_dir: str) -> bool
+        Set the compiled attributes of mdl from the cache, if they are available
+    save_to_cache(mdl: GreenLightInternal, cache_dir: str, log: str) -> None
+        Store the compiled attributes of mdl in the cache
+
+Public attributes:
+    CACHED_ATTRIBUTES: tuple[str]
+        The attributes of a GreenLightInternal object stored in the cache
+    KEY_OPTIONS: tuple[str]
+        The options that affect the compiled model, and are part of the cache key
+
+External dependencies:
+    - None
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+from greenlight._greenlight_internal import GreenLightInternal
+
+CACHED_ATTRIBUTES = (
+    "variables_formatted",
+    "dependencies",
+    "solving_order",
+    "solving_levels",
+    "parameters",
+    "commands",
+    "jac_commands",
+)
+
+KEY_OPTIONS = (
+    "formatting_mode",
+    "expand_variables",
+    "expand_functions",
+    "function_temporaries",
+    "jacobian",
+    "parametrize_consts",
+    "fold_constants",
+    "cse",
+    "warn_loading",
+)
+
+# Version of the format of the cache files. Change this if the content of the files changes
+_CACHE_FORMAT = 2
+
+
+def _source_hash() -> str:
+    """Hash of the source code of greenlight._load, which determines how models are compiled"""
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def cache_key(mdl: GreenLightInternal) -> str:
+    """
+    Create a hash of everything that the compiled model depends on: the model definitions (as read from all files and
+    dicts in mdl.input_prompt), the variable types, the options in KEY_OPTIONS, and the code of greenlight._load
+
+    :param mdl: A GreenLightInternal object, after its model definitions were read
+    :return: A hexadecimal string
+    """
+    content = {
+        "format": _CACHE_FORMAT,
+        "source": _source_hash(),
+        "variables": mdl.variables,
+        "types": {name: list(getattr(mdl, name).keys()) for name in ("consts", "inputs", "functions", "aux", "states")},
+        "functions": mdl.functions,
+        "options": {option: mdl.options.get(option, "") for option in KEY_OPTIONS},
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _cache_file(cache_dir: str, key: str) -> str:
+    return os.path.join(os.path.expanduser(cache_dir), f"greenlight_model_{key}.pkl")
+
+
+def load_from_cache(mdl: GreenLightInternal, cache_dir: str) -> bool:
+    """
+    If the compiled model of mdl is in cache_dir, set the attributes in CACHED_ATTRIBUTES from it.
+    The log messages created when the model was compiled are added to mdl.log.
+    Unreadable cache files are ignored
+
+    :param mdl: A GreenLightInternal object, after its model definitions were read
+    :param cache_dir: Directory of the cache files
+    :return: True if the attributes were set from the cache, False otherwise
+    """
+    file_name = _cache_file(cache_dir, cache_key(mdl))
+    if not os.path.isfile(file_name):
+        return False
+    try:
+        with open(file_name, "rb") as file:
+            cached = pickle.load(file)
+        attributes = {name: cached[name] for name in CACHED_ATTRIBUTES}
+    # Besides UnpicklingError, corrupt pickle data can raise any of the other errors listed in the pickle documentation
+    except (
+        OSError,
+        EOFError,
+        KeyError,
+        TypeError,
+        ValueError,
+        AttributeError,
+        ImportError,
+        IndexError,
+        pickle.UnpicklingError,
+    ) as err:
+        mdl.add_to_log(f"Could not read compiled model from cache file {file_name}: {err}", warn=False)
+        return False
+
+    for name, value in attributes.items():
+        setattr(mdl, name, value)
+    mdl.add_to_log(f"Compiled model loaded from cache file {file_name}", warn=False)
+    if cached.get("log"):
+        mdl.add_to_log(cached["log"], warn=False)
+    return True
+
+
+def save_to_cache(mdl: GreenLightInternal, cache_dir: str, log: str) -> None:
+    """
+    Store the attributes in CACHED_ATTRIBUTES of mdl in cache_dir. The file is first written to a temporary file,
+    so that concurrent loads never read a partially written file. Failing to write the file is logged, but does not
+    raise an error
+
+    :param mdl: A GreenLightInternal object, after its model was compiled
+    :param cache_dir: Directory of the cache files, created if it does not exist
+    :param log: The log messages created when compiling the model
+    :return: None
+    """
+    file_name = _cache_file(cache_dir, cache_key(mdl))
+    cached = {name: getattr(mdl, name) for name in CACHED_ATTRIBUTES} | {"log": log}
+    try:
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        temp_file_name = f"{file_name}.{os.getpid()}.tmp"
+        with open(temp_file_name, "wb") as file:
+            pickle.dump(cached, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file_name, file_name)
+    except OSError as err:
+        mdl.add_to_log(f"Could not write compiled model to cache file {file_name}: {err}", warn=False)
+        return
+    mdl.add_to_log(f"Compiled model saved to cache file {file_name}", warn=False)
@@ -0,0 +1,233 @@
+"""
+GreenLight/greenlight/_load/_cse.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+Common subexpression elimination (CSE) for model expressions.
+Model definitions often repeat the same subexpressions, e.g., saturation vapour pressure terms, especially after model
+functions are expanded (see options["expand_functions"]). Here, repeated subexpressions are found and replaced by
+temporary variables, which are defined once, before the first expression that uses them.
+
+Repeated subexpressions are found by hash consing: every subexpression is stored once, and identical subexpressions
+(with identical structure, after their own subexpressions were stored) are represented by the same entry. A
+subexpression is replaced by a temporary variable if it is used by at least two distinct expressions or
+subexpressions. This means that a subexpression which only appears inside a larger repeated subexpression is not
+replaced by a temporary variable of its own.
+
+Public functions:
+    eliminate_common_subexpressions(expressions: dict[str, str], order: Iterable[str], temp_prefix: str = "_cse")
+        -> tuple[dict[str, str], list[str], int, int]
+        Replace repeated subexpressions in expressions by temporary variables
+
+External dependencies:
+    - None
+"""
+
+import ast
+from typing import Iterable
+
+# Nodes that are never replaced by temporary variables: names, numbers, and attributes (e.g., "np.exp")
+_LEAF_TYPES = (ast.Name, ast.Constant, ast.Attribute, ast.Subscript)
+
+# Nodes whose subexpressions are not always evaluated (e.g., "x if c else 1/x"). Their subexpressions are not
+# searched, since computing them in advance could raise errors that the original expression avoids
+_CONDITIONAL_TYPES = (ast.IfExp, ast.BoolOp)
+
+
+class _SubexpressionTable:
+    """
+    Table of all distinct subexpressions. Each subexpression is stored as a template: a copy of its AST node in which
+    each direct subexpression is replaced by a placeholder holding its index in the table
+    """
+
+    def __init__(self):
+        self.templates = []  # Templates of the subexpressions
+        self.children = []  # For each subexpression, the indices of its direct subexpressions
+        self.uses = []  # For each subexpression, the number of distinct expressions and subexpressions that use it
+        self.ops = []  # For each subexpression, the number of operations (calls, operators) needed to evaluate it
+        self._index = {}  # Maps the structure of a template to its index
+
+    def add(self, node: ast.AST) -> int:
+        """
+        Add a subexpression and all its subexpressions to the table
+
+        :param node: The AST node of the subexpression
+        :return: The index of the subexpression in the table
+        """
+        if isinstance(node, _LEAF_TYPES + _CONDITIONAL_TYPES):
+            template, children = node, []
+        else:
+            children = []
+
+            def placeholder(child):
+                children.append(self.add(child))
+                return ast.Name(id=f"\0{children[-1]}", ctx=ast.Load())
+
+            template = _map_children(node, placeholder)
+
+        key = ast.dump(template)
+        if key not in self._index:
+            self._index[key] = len(self.templates)
+            self.templates.append(template)
+            self.children.append(children)
+            self.uses.append(0)
+            if isinstance(node, _LEAF_TYPES):
+                self.ops.append(0)
+            elif isinstance(node, _CONDITIONAL_TYPES):
+                self.ops.append(
+                    sum(not isinstance(sub, _LEAF_TYPES) for sub in ast.walk(node) if isinstance(sub, ast.expr))
+                )
+            else:
+                self.ops.append(1 + sum(self.ops[child] for child in children))
+            for child in children:
+                self.uses[child] += 1
+        return self._index[key]
+
+    def is_leaf(self, index: int) -> bool:
+        return isinstance(self.templates[index], _LEAF_TYPES)
+
+    def build(self, index: int, names: dict[int, str]) -> ast.AST:
+        """
+        Create the AST node of a subexpression, where subexpressions that appear in names are replaced by the names
+
+        :param index: Index of the subexpression in the table
+        :param names: Maps indices of subexpressions to the names of temporary variables replacing them
+        :return: The AST node
+        """
+        if not self.children[index]:  # Leaves and conditional expressions are stored as they are
+            return self.templates[index]
+        return _map_children(
+            self.templates[index],
+            lambda child: (
+                ast.Name(id=names[int(child.id[1:])], ctx=ast.Load())
+                if int(child.id[1:]) in names
+                else self.build(int(child.id[1:]), names)
+            ),
+        )
+
+    def count_ops(self, index: int, names: dict[int, str]) -> int:
+        """
+        Count the number of operations needed to evaluate a subexpression, if the subexpressions in names are
+        replaced by temporary variables
+        """
+        if not self.children[index]:
+            return self.ops[index]
+        return 1 + sum(self.count_ops(child, names) for child in self.children[index] if child not in names)
+
+
+def _map_children(node: ast.AST, function) -> ast.AST:
+    """
+    Create a shallow copy of node, in which every direct subexpression (ast.expr) is replaced by function(subexpression)
+    """
+    new_node = type(node)()
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, ast.expr):
+            value = function(value)
+        elif isinstance(value, list):
+            value = [function(item) if isinstance(item, ast.expr) else _map_keyword(item, function) for item in value]
+        setattr(new_node, field, value)
+    return new_node
+
+
+def _map_keyword(item, function):
+    if isinstance(item, ast.keyword):
+        return ast.keyword(arg=item.arg, value=function(item.value))
+    return item
+
+
+def eliminate_common_subexpressions(
+    expressions: dict[str, str], order: Iterable[str], temp_prefix: str = "_cse"
+) -> tuple[dict[str, str], list[str], int, int]:
+    """
+    Replace repeated subexpressions in expressions by temporary variables.
+    A subexpression is replaced if it is used by at least two distinct expressions or subexpressions, and it is either
+    a function call or contains at least two operations.
+
+    Example:
+        >>> eliminate_common_subexpressions(
+        ...     {"v1": "np.exp(x + 1) * 2", "v2": "3 + np.exp(x + 1)"}, ["v1", "v2"]
+        ... )
+        ({'_cse0': 'np.exp(x + 1)', 'v1': '_cse0 * 2', 'v2': '3 + _cse0'}, ['_cse0', 'v1', 'v2'], 6, 4)
+
+    :param expressions: Dict of expressions, with variable names as keys
+    :param order: The variable names of expressions, in the order in which they are evaluated
+    :param temp_prefix: Prefix for the names of the temporary variables, followed by a running number.
+                        Should not be the prefix of any name used in expressions
+    :return: A tuple of:
+        - A dict of the new expressions, including the definitions of the temporary variables
+        - The order in which the new expressions should be evaluated: each temporary variable is placed before the
+            first expression that uses it
+        - The total number of operations in expressions
+        - The total number of operations in the new expressions
+    """
+    order = list(order)
+    table = _SubexpressionTable()
+    roots = {}
+    for var_name in order:
+        try:
+            roots[var_name] = table.add(ast.parse(expressions[var_name].strip(), mode="eval").body)
+        except SyntaxError:  # Expressions that can't be parsed are kept as they are
+            continue
+        table.uses[roots[var_name]] += 1
+
+    # Choose the subexpressions to replace by temporary variables
+    names = {}
+    for index in range(len(table.templates)):
+        if table.uses[index] >= 2 and not table.is_leaf(index):
+            if isinstance(table.templates[index], ast.Call) or table.ops[index] >= 2:
+                names[index] = f"{temp_prefix}{len(names)}"
+
+    new_expressions = {}
+    new_order = []
+    visited = set()
+
+    def define(index):
+        # Define the temporary variables used by subexpression index, and the subexpression itself if it is replaced
+        if index in visited:
+            return
+        visited.add(index)
+        for child in table.children[index]:
+            define(child)
+        if index in names:
+            new_expressions[names[index]] = ast.unparse(table.build(index, _without(names, index)))
+            new_order.append(names[index])
+
+    ops_before = 0
+    for var_name in order:
+        if var_name not in roots:
+            new_expressions[var_name] = expressions[var_name]
+            new_order.append(var_name)
+            continue
+        root = roots[var_name]
+        ops_before += table.ops[root]
+        define(root)
+        if root in names:
+            new_expressions[var_name] = names[root]
+        elif any(child in names for child in _descendants(table, root)):
+            new_expressions[var_name] = ast.unparse(table.build(root, names))
+        else:  # Nothing to replace, keep the original expression
+            new_expressions[var_name] = expressions[var_name]
+        new_order.append(var_name)
+
+    ops_after = sum(table.count_ops(roots[var_name], names) for var_name in roots if roots[var_name] not in names)
+    ops_after += sum(table.count_ops(index, _without(names, index)) for index in names)
+
+    return new_expressions, new_order, ops_before, ops_after
+
+
+def _descendants(table: _SubexpressionTable, index: int) -> set:
+    """The indices of all subexpressions of subexpression index, at any depth"""
+    found = set()
+    stack = list(table.children[index])
+    while stack:
+        child = stack.pop()
+        if child not in found:
+            found.add(child)
+            stack.extend(table.children[child])
+    return found
+
+
+def _without(names: dict[int, str], index: int) -> dict[int, str]:
+    """names without the entry of index, used for building the definition of the temporary variable of index"""
+    return {key: value for key, value in names.items() if key != index}
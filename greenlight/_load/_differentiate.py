@@ -0,0 +1,410 @@
+"""
+GreenLight/greenlight/_load/_differentiate.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+Functions for symbolic differentiation of the mathematical expressions of a GreenLightInternal object. These are used
+for creating an analytic Jacobian of the model ODEs, which can be used by implicit solvers instead of a finite
+difference approximation.
+
+Expressions are differentiated by parsing them into a Python abstract syntax tree (ast). Supported are the arithmetic
+operators, comparisons (which have zero derivative), and the builtin expressions listed in
+_parse_model.format_expressions (see docs/math_expressions.md), with or without the "np." or "math." prefix.
+
+Public functions:
+    differentiate(expression: str, var_name: str, prefix: str = "np.") -> str
+        Differentiate a mathematical expression with respect to a variable
+    expressions_to_jac_str(y_vars, d_vars, a_vars, a_order, prefix) -> list[str]
+        Create a list of Python type expressions computing the Jacobian of the ODEs described by y_vars
+
+Example usage:
+    >>> differentiate("x**2 + np.exp(3*x) * z", "x")
+    '2 * x + np.exp(3 * x) * 3 * z'
+
+Exceptions:
+    ValueError if an expression contains a function or operator that cannot be differentiated
+
+External dependencies:
+    - None
+"""
+
+import ast
+from typing import Iterable
+
+from ._utils import find_dependencies, substitute_identifiers
+
+_ZERO = None  # A zero derivative is represented by None
+
+
+def differentiate(expression: str, var_name: str, prefix: str = "np.") -> str:
+    """
+    Differentiate the mathematical expression with respect to var_name.
+    Example: differentiate("x**2 + np.exp(3*x) * z", "x") returns "2 * x + np.exp(3 * x) * 3 * z"
+
+    :param expression: A mathematical expression, e.g., "x**2 + np.exp(3*x) * z"
+    :param var_name: The name of the variable to differentiate by, e.g., "x"
+    :param prefix: The prefix used for builtin expressions created by the differentiation, e.g., "np." will create
+        "np.log(x)" and "math." will create "math.log(x)". Builtin expressions already in expression keep their prefix
+    :return: The derivative of expression, with respect to var_name. "0" if the derivative is zero
+    :raises: ValueError if expression contains a function or operator that cannot be differentiated
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval").body
+    except SyntaxError as err:
+        raise ValueError("Could not parse expression %r: %r" % (expression, err))
+    derivative = _Differentiator(var_name, prefix).diff(tree)
+    if derivative is _ZERO:
+        return "0"
+    return ast.unparse(derivative)
+
+
+def expressions_to_jac_str(
+    y_vars: dict[str, str],
+    d_vars: Iterable[str],
+    a_vars: dict[str, str] = {},
+    a_order: Iterable[str] = [],
+    prefix: str = "np.",
+    p_vars: Iterable[str] = [],
+) -> list[str]:
+    """
+    Create a list of Python type expressions that compute the Jacobian of the ODEs described by y_vars.
+    The expressions use the same array notation as _utils.expressions_to_dy_str: states are elements of an array y,
+    auxiliary states are elements of an array a, inputs are elements of an array d, and parameters are elements of
+    an array p. It is assumed that a has
+    already been computed (by the commands created by expressions_to_dy_str).
+    Derivatives of auxiliary states with respect to the states are stored in an array g, and the Jacobian is stored
+    in an array jac, so that jac[i, j] is the derivative of dy[i] with respect to y[j].
+
+    The Jacobian is computed by the chain rule: the derivative of each auxiliary state with respect to a state y[j]
+    is the sum, over all variables v in its definition, of its partial derivative with respect to v times
+    the derivative of v with respect to y[j]. Only nonzero elements are computed.
+
+    Example:
+        if y_vars = {"var1": "a_var1 * var1", "var2": "input1"},
+        d_vars = ["input1"],
+        a_vars = {"a_var1": "var2**2"},
+        a_order = ["a_var1"],
+    the function will return:
+        ["g[0] = 2 * y[1]",
+        "jac[0, 0] = a[0]",
+        "jac[0, 1] = y[0] * g[0]"]
+    Here, g[0] is the derivative of a_var1 with respect to var2
+
+    :param y_vars: A dict containing state variables, with their names as keys and definitions as values
+    :param d_vars: An Iterable[str] containing names of input variables
+    :param a_vars: A dict containing auxiliary variables, with their names as keys and their definitions as values
+    :param a_order: An Iterable[str] of the keys in a_vars, sorted so that the variables can be resolved in the given
+        order. Must be the same order as used by expressions_to_dy_str
+    :param prefix: The prefix used for builtin expressions created by the differentiation, see differentiate()
+    :param p_vars: An Iterable[str] containing names of parameters (model constants given as an array p)
+    :return: A list[str] of expressions as described above
+    :raises: ValueError if any of the expressions cannot be differentiated
+    """
+    states = list(y_vars.keys())
+    a_order = list(a_order)
+
+    # How each variable is represented in the array notation
+    array_names = {name: f"y[{j}]" for j, name in enumerate(states)}
+    array_names.update({name: f"a[{j}]" for j, name in enumerate(a_order)})
+    array_names.update({name: f"d[{j + 1}]" for j, name in enumerate(d_vars)})
+    array_names.update({name: f"p[{j}]" for j, name in enumerate(p_vars)})
+
+    # For each state and each auxiliary state, the representation of its derivative by each state it depends on
+    # For a state, this is 1 for itself. For auxiliary states these will be elements of g.
+    derivatives = {name: {name: "1"} for name in states}
+    positions = {name: i for i, name in enumerate(states + a_order)}
+
+    array_expressions = []
+    n_g = 0  # Number of elements of g used so far
+
+    def _chain_rule(var_name, expression):
+        # Find the derivative of expression with respect to each state, using the chain rule.
+        # Return a dict with states as keys and derivatives (in array notation) as values
+        nonlocal n_g
+        terms = {}  # For each state, a list of terms which sum up to the derivative
+        deps = find_dependencies(expression, derivatives.keys(), [var_name])
+        for dep in sorted(deps, key=positions.get):  # Sorted so that the created expressions are reproducible
+            partial = differentiate(expression, dep, prefix)
+            if partial == "0":
+                continue
+            partial = substitute_identifiers(partial, array_names)
+            if not _is_simple(partial):  # Store the partial derivative in g to avoid recomputing it
+                array_expressions.append(f"g[{n_g}] = {partial}")
+                partial = f"g[{n_g}]"
+                n_g = n_g + 1
+            for state, dep_derivative in derivatives[dep].items():
+                if dep_derivative == "1":
+                    terms.setdefault(state, []).append(partial)
+                elif partial == "1":
+                    terms.setdefault(state, []).append(dep_derivative)
+                else:
+                    terms.setdefault(state, []).append(f"{partial} * {dep_derivative}")
+        return {state: " + ".join(state_terms) for state, state_terms in terms.items()}
+
+    for var_name in a_order:
+        var_derivatives = {}
+        for state, derivative in _chain_rule(var_name, a_vars[var_name]).items():
+            if _is_simple(derivative):
+                var_derivatives[state] = derivative
+            else:
+                array_expressions.append(f"g[{n_g}] = {derivative}")
+                var_derivatives[state] = f"g[{n_g}]"
+                n_g = n_g + 1
+        if var_derivatives:
+            derivatives[var_name] = var_derivatives
+
+    for i, expression in enumerate(y_vars.values()):
+        for state, derivative in _chain_rule("", expression).items():
+            array_expressions.append(f"jac[{i}, {states.index(state)}] = {derivative}")
+
+    return array_expressions
+
+
+def _is_simple(expression: str) -> bool:
+    """
+    Check if an expression is simple enough to be repeated instead of stored: a number or a single array element,
+    possibly negated
+
+    :param expression: A mathematical expression in array notation
+    :return: True if the expression is simple
+    """
+    expression = expression.strip().lstrip("-").strip()
+    try:
+        float(expression)
+        return True
+    except ValueError:
+        return expression[:2] in ["y[", "a[", "d[", "g["] and expression.endswith("]") and expression.count("[") == 1
+
+
+class _Differentiator:
+    """
+    Symbolic differentiation of an ast expression tree with respect to a single variable.
+    Zero derivatives are represented by None, which allows to drop zero terms while differentiating.
+    """
+
+    def __init__(self, var_name: str, prefix: str):
+        """
+        :param var_name: The name of the variable to differentiate by
+        :param prefix: The prefix used for builtin expressions created by the differentiation, e.g., "np."
+        """
+        self.var_name = var_name
+        self.prefix = prefix
+
+    def diff(self, node: ast.AST) -> ast.AST | None:
+        """
+        Differentiate node with respect to self.var_name
+
+        :param node: An ast node representing a mathematical expression
+        :return: An ast node representing the derivative of node, or None if the derivative is zero
+        :raises: ValueError if node contains a function or operator that cannot be differentiated
+        """
+        if isinstance(node, ast.Constant):
+            return _ZERO
+        if isinstance(node, ast.Name):
+            return ast.Constant(1) if node.id == self.var_name else _ZERO
+        if isinstance(node, ast.Attribute):  # e.g., np.pi
+            return _ZERO
+        if isinstance(node, (ast.Compare, ast.BoolOp)):  # Piecewise constant
+            return _ZERO
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.USub):
+                return _neg(self.diff(node.operand))
+            if isinstance(node.op, ast.UAdd):
+                return self.diff(node.operand)
+            if isinstance(node.op, ast.Not):
+                return _ZERO
+        if isinstance(node, ast.BinOp):
+            return self._diff_bin_op(node)
+        if isinstance(node, ast.IfExp):
+            body = self.diff(node.body)
+            orelse = self.diff(node.orelse)
+            if body is _ZERO and orelse is _ZERO:
+                return _ZERO
+            return ast.IfExp(node.test, _zero_if_none(body), _zero_if_none(orelse))
+        if isinstance(node, ast.Call):
+            return self._diff_call(node)
+        raise ValueError("Cannot differentiate expression %r" % ast.unparse(node))
+
+    def _diff_bin_op(self, node: ast.BinOp) -> ast.AST | None:
+        left, right = node.left, node.right
+        d_left, d_right = self.diff(left), self.diff(right)
+        if isinstance(node.op, ast.Add):
+            return _add(d_left, d_right)
+        if isinstance(node.op, ast.Sub):
+            return _sub(d_left, d_right)
+        if isinstance(node.op, ast.Mult):  # (uv)' = u'v + uv'
+            return _add(_mul(d_left, right), _mul(left, d_right))
+        if isinstance(node.op, ast.Div):  # (u/v)' = u'/v - uv'/v**2
+            return _sub(_div(d_left, right), _div(_mul(left, d_right), _pow(right, ast.Constant(2))))
+        if isinstance(node.op, ast.Pow):
+            if d_right is _ZERO:  # (u**c)' = c * u**(c-1) * u'
+                if isinstance(right, ast.Constant):
+                    exponent = ast.Constant(right.value - 1)
+                else:
+                    exponent = ast.BinOp(right, ast.Sub(), ast.Constant(1))
+                return _mul(_mul(right, _pow(left, exponent)), d_left)
+            # (u**v)' = u**v * (v' * log(u) + v * u' / u)
+            log_left = self._call("log", [left])
+            return _mul(node, _add(_mul(d_right, log_left), _div(_mul(right, d_left), left)))
+        if isinstance(node.op, ast.Mod):  # (u % v)' = u' - floor(u/v) * v'
+            return _sub(d_left, _mul(self._call("floor", [ast.BinOp(left, ast.Div(), right)]), d_right))
+        raise ValueError("Cannot differentiate expression %r" % ast.unparse(node))
+
+    def _diff_call(self, node: ast.Call) -> ast.AST | None:
+        func = node.func
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            func_name = func.attr
+            prefix = func.value.id + "."  # Keep the prefix used in the expression
+        elif isinstance(func, ast.Name):
+            func_name = func.id
+            prefix = ""
+        else:
+            raise ValueError("Cannot differentiate expression %r" % ast.unparse(node))
+
+        def call(name, args):
+            return ast.Call(_func_node(prefix + name), args, [])
+
+        args = node.args
+        if func_name in ["floor", "ceil", "logical_and", "logical_or", "contains"]:  # Piecewise constant
+            return _ZERO
+        if func_name == "where":
+            d_true, d_false = self.diff(args[1]), self.diff(args[2])
+            if d_true is _ZERO and d_false is _ZERO:
+                return _ZERO
+            return call("where", [args[0], _zero_if_none(d_true), _zero_if_none(d_false)])
+        if func_name == "mod":
+            d_left, d_right = self.diff(args[0]), self.diff(args[1])
+            return _sub(d_left, _mul(call("floor", [ast.BinOp(args[0], ast.Div(), args[1])]), d_right))
+        if func_name == "arctan2":  # d/dx arctan2(u, v) = (v*u' - u*v') / (u**2 + v**2)
+            d_u, d_v = self.diff(args[0]), self.diff(args[1])
+            norm = ast.BinOp(_pow(args[0], ast.Constant(2)), ast.Add(), _pow(args[1], ast.Constant(2)))
+            return _div(_sub(_mul(args[1], d_u), _mul(args[0], d_v)), norm)
+
+        if len(args) != 1:
+            raise ValueError("Cannot differentiate expression %r" % ast.unparse(node))
+        u = args[0]
+        d_u = self.diff(u)
+        if d_u is _ZERO:
+            return _ZERO
+
+        one = ast.Constant(1)
+        two = ast.Constant(2)
+        if func_name == "exp":
+            outer = node
+        elif func_name == "expm1":
+            outer = call("exp", [u])
+        elif func_name == "log":
+            outer = _div(one, u)
+        elif func_name == "log10":
+            outer = _div(one, ast.BinOp(u, ast.Mult(), call("log", [ast.Constant(10)])))
+        elif func_name == "log1p":
+            outer = _div(one, ast.BinOp(one, ast.Add(), u))
+        elif func_name == "sqrt":
+            outer = _div(one, ast.BinOp(two, ast.Mult(), node))
+        elif func_name == "sin":
+            outer = call("cos", [u])
+        elif func_name == "cos":
+            outer = _neg(call("sin", [u]))
+        elif func_name == "tan":
+            outer = _div(one, _pow(call("cos", [u]), two))
+        elif func_name == "sinh":
+            outer = call("cosh", [u])
+        elif func_name == "cosh":
+            outer = call("sinh", [u])
+        elif func_name == "tanh":
+            outer = ast.BinOp(one, ast.Sub(), _pow(node, two))
+        elif func_name == "arcsin":
+            outer = _div(one, call("sqrt", [ast.BinOp(one, ast.Sub(), _pow(u, two))]))
+        elif func_name == "arccos":
+            outer = _neg(_div(one, call("sqrt", [ast.BinOp(one, ast.Sub(), _pow(u, two))])))
+        elif func_name == "arctan":
+            outer = _div(one, ast.BinOp(one, ast.Add(), _pow(u, two)))
+        elif func_name == "arcsinh":
+            outer = _div(one, call("sqrt", [ast.BinOp(_pow(u, two), ast.Add(), one)]))
+        elif func_name == "arccosh":
+            outer = _div(one, call("sqrt", [ast.BinOp(_pow(u, two), ast.Sub(), one)]))
+        elif func_name == "arctanh":
+            outer = _div(one, ast.BinOp(one, ast.Sub(), _pow(u, two)))
+        elif func_name == "abs":  # The sign of u, written with comparisons so that it works in all formatting modes
+            outer = ast.BinOp(
+                ast.BinOp(ast.Compare(u, [ast.Gt()], [ast.Constant(0)]), ast.Mult(), ast.Constant(1.0)),
+                ast.Sub(),
+                ast.BinOp(ast.Compare(u, [ast.Lt()], [ast.Constant(0)]), ast.Mult(), ast.Constant(1.0)),
+            )
+        elif func_name == "radians":
+            outer = ast.Constant(0.017453292519943295)  # pi / 180
+        else:
+            raise ValueError("Cannot differentiate function %r in expression %r" % (func_name, ast.unparse(node)))
+        return _mul(outer, d_u)
+
+    def _call(self, func_name: str, args: list) -> ast.Call:
+        # A call to a builtin expression, using the default prefix
+        return ast.Call(_func_node(self.prefix + func_name), args, [])
+
+
+def _func_node(full_name: str) -> ast.AST:
+    # Create the ast node of a function name, e.g., "np.log" becomes np.log
+    if "." in full_name:
+        module, name = full_name.split(".", 1)
+        return ast.Attribute(ast.Name(module, ast.Load()), name, ast.Load())
+    return ast.Name(full_name, ast.Load())
+
+
+def _is_const(node: ast.AST | None, value: float) -> bool:
+    return isinstance(node, ast.Constant) and not isinstance(node.value, bool) and node.value == value
+
+
+def _zero_if_none(node: ast.AST | None) -> ast.AST:
+    return ast.Constant(0) if node is _ZERO else node
+
+
+def _neg(node: ast.AST | None) -> ast.AST | None:
+    if node is _ZERO:
+        return _ZERO
+    if isinstance(node, (ast.Constant, ast.Name, ast.Subscript)):
+        return ast.UnaryOp(ast.USub(), node)
+    # Multiply rather than negate, since node may evaluate to a boolean (e.g., a comparison), which numpy can't negate
+    return ast.BinOp(ast.Constant(-1), ast.Mult(), node)
+
+
+def _add(left: ast.AST | None, right: ast.AST | None) -> ast.AST | None:
+    if left is _ZERO:
+        return right
+    if right is _ZERO:
+        return left
+    return ast.BinOp(left, ast.Add(), right)
+
+
+def _sub(left: ast.AST | None, right: ast.AST | None) -> ast.AST | None:
+    if right is _ZERO:
+        return left
+    if left is _ZERO:
+        return _neg(right)
+    return ast.BinOp(left, ast.Sub(), right)
+
+
+def _mul(left: ast.AST | None, right: ast.AST | None) -> ast.AST | None:
+    if left is _ZERO or right is _ZERO or _is_const(left, 0) or _is_const(right, 0):
+        return _ZERO
+    if _is_const(left, 1):
+        return right
+    if _is_const(right, 1):
+        return left
+    return ast.BinOp(left, ast.Mult(), right)
+
+
+def _div(left: ast.AST | None, right: ast.AST) -> ast.AST | None:
+    if left is _ZERO or _is_const(left, 0):
+        return _ZERO
+    if _is_const(right, 1):
+        return left
+    return ast.BinOp(left, ast.Div(), right)
+
+
+def _pow(base: ast.AST, exponent: ast.AST) -> ast.AST:
+    if _is_const(exponent, 1):
+        return base
+    if _is_const(exponent, 0):
+        return ast.Constant(1)
+    return ast.BinOp(base, ast.Pow(), exponent)
@@ -6,11 +6,18 @@ https://github.com/davkat1/GreenLight
 
 Functions for parsing model function calls and definitions in a GreenLightInternal object.
 
+Function calls are expanded on the parsed expression trees (using Python's ast module): the definition of each
+function is parsed once, the calls in it are expanded, and the arguments of each call are then substituted into it.
+Expansions are memoized per function and arguments, so a call that appears in several expressions is only expanded
+once. Optionally, arguments that are used more than once in a function definition are stored as temporary variables
+instead of being copied into the expansion, see options["function_temporaries"] in docs/simulation_options.md.
+
 Public functions:
-    parse(expressions_to_format: dict[str, str], functions: dict[str, str], builtin_expressions: Iterable[str]) -> None
+    parse(expressions_to_format: dict[str, str], functions: dict[str, str], builtin_expressions: Iterable[str],
+        temp_prefix: str | None = None) -> None
         Modify expressions_to_format so that all function calls in this dict are expanded to their full description.
         Example: if "func1(x, y + z)" appears in expressions_to_format and functions["func1(a, b)"] is "a + b**2", then
-         "func1(x, y + z)" will be replaced by "x + (y + z)**2".
+         "func1(x, y + z)" will be replaced by "x + (y + z) ** 2".
 
 Example usage:
     >>> _expand_functions.parse(mdl.variables, mdl.functions, builtin_expressions)
@@ -20,32 +27,46 @@ Example usage:
         `builtin_expressions` is a list of builtin expressions (e.g., ["sin", "exp"])
 
 Exceptions:
-    ValueError in case of mismatched parentheses, mismatch in number of parameters between a function call and its
-        definition, a function definition is not found, or anything else went wrong during substitution.
+    ValueError in case a function definition cannot be parsed, mismatch in number of parameters between a function call
+        and its definition, a function definition is not found, or a function is defined recursively.
 
 External dependencies:
     - None
 """
 
-import logging
+import ast
+import copy
 import re
+from collections import Counter
 from typing import Iterable
 
 
-def parse(expressions_to_format: dict[str, str], functions: dict[str, str], builtin_expressions: Iterable[str]) -> None:
+def parse(
+    expressions_to_format: dict[str, str],
+    functions: dict[str, str],
+    builtin_expressions: Iterable[str],
+    temp_prefix: str | None = None,
+) -> None:
     """
     Modify the dict expressions_to_format so that all function calls in this dict are expanded to their full
     description. Builtin expressions are ignored.
     In expressions_to_format, any function call will be replaced by its expansion based on functions.
     Example: if expressions_to_format is {"var1": "func1(x, y + z)"} and f_defs is {"func1(a, b)": "a + b**2"},
-    expressions_to_format will be modified to {"var1": "x + (y + z)**2"}.
+    expressions_to_format will be modified to {"var1": "x + (y + z) ** 2"}.
     This parsing helps convert model definitions in a given model used into fully expanded expressions which may be
     used by multiple solvers, enhancing flexibility and running speed.
+    Expressions without function calls, and expressions that cannot be parsed, are kept as they are.
 
     :param expressions_to_format: A dict containing variables and their mathematical definitions, which may include
         function calls. Example: {"var1": "func1(x, y + z), "var2": "var1 + 5"}
     :param functions: A dict of function declarations and descriptions. Example: {"func1(a, b)": "a + b**2"}
     :param builtin_expressions: Expressions that do not need to parsed as a function. Example: ["exp", "sqrt"]
+    :param temp_prefix: If given, function arguments that are used more than once in the function definition
+        (and are not a single name or number) are not copied into the expansion. Instead, they are added to
+        expressions_to_format as temporary variables, named temp_prefix followed by a number, and the expansion uses
+        these names. Example: if temp_prefix is "_fn", expressions_to_format is {"var1": "func1(x, y + z)"} and
+        f_defs is {"func1(a, b)": "a * b + b"}, expressions_to_format will be modified to
+        {"var1": "x * _fn0 + _fn0", "_fn0": "y + z"}
     """
     func_pattern = r"(\w+)\((.*?)\)"  # A word, '(', some words, ')'
 
@@ -57,209 +78,141 @@ def parse(expressions_to_format: dict[str, str], functions: dict[str, str], buil
         match = re.match(func_pattern, key)
         if match:
             func_name = match.group(1)
-            function_args[func_name] = re.split(r"\s*,\s*", match.group(2))
+            function_args[func_name] = re.split(r"\s*,\s*", match.group(2).strip())
             function_defs[func_name] = value
 
     # Functions do not need to be formatted
     for key, value in functions.items():
         del expressions_to_format[key]
 
+    temporaries = {} if temp_prefix is not None else None
+    inliner = _FunctionInliner(function_defs, function_args, builtin_expressions, temporaries, temp_prefix)
+    inliner.reserved.update(expressions_to_format.keys())
     for key, value in expressions_to_format.items():
-        expressions_to_format[key] = _parse_expression(value, function_defs, function_args, builtin_expressions)
+        try:
+            tree = ast.parse(value.strip(), mode="eval")
+        except SyntaxError:
+            continue
+        inliner.changed = False
+        tree.body = inliner.visit(tree.body)
+        if inliner.changed:
+            expressions_to_format[key] = ast.unparse(tree)
+
+    if temporaries:
+        expressions_to_format.update(temporaries)
 
 
-def _parse_expression(
-    expr: str, f_defs: dict[str, str], f_args: dict[str, Iterable[str]], builtin: Iterable[str]
-) -> str:
+class _FunctionInliner(ast.NodeTransformer):
     """
-    Given a string expr and dicts of function definitions and arguments, replace any appearance of a function in expr
-    with the full definition of the function. Ignore any builtin expressions.
-    Example: if expr is "func1(x, y + z)", f_defs is {"func1": "a + b**2"}, and f_args is {"func1": ["a", "b"]}
-    The function will return "x + (y + z)**2".
-    This function recurses through all function calls in expr to ensure that all function calls are replaced
-    :param expr: A string with a mathematical expression which may include some function calls, e.g., "func1(x, y + z)".
+    Replace calls of the functions in f_defs by their expansions. Calls of builtin functions are kept, but their
+    arguments are expanded. self.changed is set to True whenever a call is expanded.
+
     :param f_defs: A dict with function definitions, e.g., {"func1": "a + b**2"}
-    :param f_args: A dict with function arguments. The keys in f_args should be the same as the keys of f_defs.
-        Both should include all function names in str
-    :param builtin: An Iterable[str] with function names that need not be parsed, e.g., ["exp", "sqrt"]
-    :return: A parsed string where the function calls in expr are replaced by the function definition,
-        e.g., "x + (y + z)**2"
-    :raises: ValueError if a function call func1() is found but its definition doesn't exist in f_defs.
-             ValueError if a function call func1() is found but the number of arguments doesn't match the number of
-                arguments in f_args.
-             ValueError if for any other reason the substitution fails.
+    :param f_args: A dict with function arguments. The keys in f_args should be the same as the keys of f_defs,
+        e.g., {"func1": ["a", "b"]}
+    :param builtin: An Iterable[str] with function names that need not be expanded, e.g., ["exp", "sqrt"]
+    :param temporaries: If not None, a dict to which arguments that are used more than once in a function definition
+        are added, with new variable names (temp_prefix followed by a number) as keys
+    :param temp_prefix: The prefix of the names in temporaries
     """
-    # Get a list of the highest-level functions in expr
-    high_level_funcs = _high_level_functions(expr)
-
-    # If expr contains multiple high-level functions, parse them individually
-    if len(high_level_funcs) > 1:
-        parsed_high_level_funcs = [_parse_expression(func, f_defs, f_args, builtin) for func in high_level_funcs]
-
-        parsed_func_call = expr
-        # replace the parsed funcs in expr
-        for i, arg in enumerate(high_level_funcs):
-            parsed_func_call = re.sub(re.escape(arg), parsed_high_level_funcs[i], parsed_func_call)
-
-        return parsed_func_call
-
-    # Check if expr contains any relevant function call
-    greedy_func_pattern = r"(\w+)\((.*)\)"
-    func_call = re.search(greedy_func_pattern, expr.strip())
-    if not func_call or expr in builtin:
-        return expr  # No relevant function call, return as is
-
-    # Otherwise, expr contains one high-level function. Start by handling the outermost level
-    outermost_func = _outermost_function(expr)
-    if not outermost_func:
-        return expr  # No function call found, return as is
-
-    func_call = outermost_func[0]  # Full function call
-    func_name = outermost_func[1]  # Function name
-    call_args = outermost_func[2:]  # Function arguments
-
-    # Example: if outermost_func is "func1(x, y + z)",
-    # then func_call is "func1(x, y + z)", func_name is "func1", call_args is ["x", "y + z"]
-
-    if func_name not in f_defs.keys() | builtin:
-        raise ValueError("No definition found for function %r" % (func_name,))
-
-    if func_name in builtin:  # builtin function, only the arguments may need to be parsed
-        parsed_func_call = func_call
-    else:  # parse the function call
-        parsed_func_call = f_defs[func_name]
-        func_args = f_args[func_name]
-
-        # Example: if f_defs["func1"] is "a + b**2" and f_args["func1"] is ["a", "b"],
-        # then parsed_func_call is "a + b**2" and func_args is ["a", "b"]
-        # Now, just need to modify parsed_func_call: replace "a" with "x" and "b" with "y + z"
 
-        # First check that the number of func_args and call_args is the same
-        if len(func_args) != len(call_args):
+    def __init__(
+        self,
+        f_defs: dict[str, str],
+        f_args: dict[str, list[str]],
+        builtin: Iterable[str],
+        temporaries: dict[str, str] | None = None,
+        temp_prefix: str | None = None,
+    ):
+        self.f_defs = f_defs
+        self.f_args = f_args
+        self.builtin = set(builtin)
+        self.temporaries = temporaries
+        self.temp_prefix = temp_prefix
+        self.reserved = set(f_defs)  # Names that can't be used for temporaries
+        self.changed = False
+
+        self._templates = {}  # For each function: its definition with all calls expanded, and its name counts
+        self._expansions = {}  # Expanded calls, with (function name, dumps of the arguments, temporaries) as keys
+        self._temp_names = {}  # Names of the temporaries, with dumps of their expressions as keys
+        self._in_progress = []  # Functions whose definitions are being expanded, to detect recursive definitions
+
+    def visit_Call(self, node):
+        self.generic_visit(node)  # Expand the arguments first
+        if not isinstance(node.func, ast.Name) or node.func.id in self.builtin:
+            return node
+
+        func_name = node.func.id
+        if func_name not in self.f_defs:
+            raise ValueError("No definition found for function %r" % (func_name,))
+        if node.keywords or len(node.args) != len(self.f_args[func_name]):
             raise ValueError(
                 "Error in function %r while replacing %r with %r: mismatch in number of arguments"
-                % (func_name, call_args, func_args)
+                % (func_name, [ast.unparse(arg) for arg in node.args + node.keywords], self.f_args[func_name])
             )
-        # If so, replace the function args (func_args) with the call args (call_args)
-        try:
-            logger = logging.getLogger(__name__)
-            for i, arg in enumerate(call_args):
-                parsed_func_call = re.sub(r"\b%s\b" % func_args[i], f"({arg})", parsed_func_call)
-        except Exception:
-            logger.error("Error in function %r while replacing %r with %r" % (func_name, call_args, func_args))
-            raise ValueError
-
-    # Now also parse the function call arguments if needed
-    for call_arg in call_args:
-        parsed_call_arg = _parse_expression(call_arg, f_defs, f_args, builtin)
-        parsed_func_call = re.sub(re.escape(call_arg), parsed_call_arg, parsed_func_call)
-
-    return re.sub(re.escape(func_call), f"({parsed_func_call})", expr)
-
-
-def _high_level_functions(input_str: str) -> list[str]:
-    """
-    Given an input string containing a mathematical expression, list the names of the highest-level functions described
-    in the string.
-    :param input_str: A mathematical expression possibly containing multiple, nested, function calls,
-        e.g., "func1(a + b * c * func2(func3(x)) + func4(b, c), b + d) + func5(y)"
-    :return: The names of the highest-level functions of input_str, e.g., ["func1", "func5"]
-    :raises: ValueError if mismatched parentheses are found.
-    """
-    funcs = []
-    current_func = []
-    depth = 0
-
-    # Regular expression to match any non-alphanumeric character except whitespace
-    non_alnum_pattern = re.compile(r"[^a-zA-Z0-9_\s]")
-
-    for char in input_str:
-        if char == "(":
-            depth += 1
-        elif char == ")":
-            depth -= 1
-            if depth < 0:
-                raise ValueError("Mismatched parentheses in string %r" % (input_str,))
-        elif non_alnum_pattern.match(char) and depth == 0:
-            # Split at operator only if it's at the top level (depth == 0)
-            funcs.append("".join(current_func).strip())
-            current_func = []
-            continue
 
-        current_func.append(char)
-
-    if depth != 0:
-        raise ValueError("Mismatched parentheses in string %r" % (input_str,))
-
-    # Add the last collected function call to funcs
-    if current_func:
-        funcs.append("".join(current_func).strip())
-
-    return funcs
-
-
-def _outermost_function(input_str: str) -> list[str]:
-    """
-    Given an input string containing a mathematical expression, find the outermost (highest level) function described
-    in the string.
-    :param input_str: A mathematical expression possibly containing multiple, nested, function calls,
-        e.g., "func1(a + b * c * func2(func3(x)) + func4(b, c), b + d)"
-    :return: The outermost function in input_str, in the following order:
-        - The full function call, e.g., "func1(a + b * c * func2(func3(x)) + func4(b, c), b + d)"
-        - The function name, e.g., "func1"
-        - All other function arguments, e.g., ["a + b * c * func2(func3(x)) + func4(b, c)", "b + d"]
-    """
-    # Remove leading and trailing white spaces and parentheses if they exist
-    func_call = input_str.strip()
-    while func_call.startswith("(") and func_call.endswith(")"):  # Check for outer parentheses
-        func_call = func_call[1:-1].strip()  # Remove outer parentheses if present
-
-    # Regular expression to match the function name at the start of the string
-    func_name_pattern = re.compile(r"\b(\w+)\s*\(")
-    matches = func_name_pattern.finditer(func_call)
-
-    if not matches:
-        return []
-
-    # Extract the function name
-    match = next(matches, None)
-    func_name = match.group(1)
-
-    # Initialize variables for extracting arguments
-    start_idx = match.end()  # Position after the opening parenthesis
-    end_idx = len(func_call)
-    depth = 0
-    current_arg = []
-    args = []
-
-    # Iterate over the string to extract arguments
-    for i in range(start_idx, len(func_call)):
-        char = func_call[i]
-        if char == "(":
-            depth += 1
-        elif char == ")":
-            depth -= 1
-
-        # When depth is 0 and we encounter a comma, it means we've reached the end of an argument
-        if char == "," and depth == 0:
-            args.append("".join(current_arg).strip())
-            current_arg = []
-        else:
-            current_arg.append(char)
-
-        # When we reach the closing parenthesis at the top depth, finish parsing
-        if depth < 0 and char == ")":
-            end_idx = i
-            current_arg = current_arg[:-1]
-            break
-
-    # Add the last argument, if any
-    if current_arg:
-        args.append("".join(current_arg).strip())
-
-    # Return the function call - do not include any strings that were outside the call
-    match = re.search(r"\b\w+\($", func_call[:start_idx])
-    if match:
-        func_call = match.group(0) + func_call[start_idx : end_idx + 1]
-
-    return [func_call, func_name] + args
+        # Temporaries are only used in expressions, not in the expanded function definitions, where the arguments
+        # are the parameters of the calling function
+        use_temporaries = self.temporaries is not None and not self._in_progress
+        key = (func_name, tuple(ast.dump(arg) for arg in node.args), use_temporaries)
+        if key not in self._expansions:
+            self._expansions[key] = self._expand(func_name, node.args, use_temporaries)
+        self.changed = True
+        return copy.deepcopy(self._expansions[key])
+
+    def _template(self, func_name: str) -> tuple[ast.expr, Counter]:
+        """The definition of func_name with all function calls in it expanded, and the number of uses of each name"""
+        if func_name not in self._templates:
+            if func_name in self._in_progress:
+                raise ValueError(
+                    "Function %r is defined recursively: %s" % (func_name, " -> ".join(self._in_progress + [func_name]))
+                )
+            try:
+                body = ast.parse(self.f_defs[func_name].strip(), mode="eval").body
+            except SyntaxError as err:
+                raise ValueError("Could not parse definition of function %r: %s" % (func_name, err)) from err
+
+            self._in_progress.append(func_name)
+            changed = self.changed
+            body = self.visit(body)
+            self.changed = changed
+            self._in_progress.pop()
+
+            uses = Counter(name.id for name in ast.walk(body) if isinstance(name, ast.Name))
+            self._templates[func_name] = (body, uses)
+        return self._templates[func_name]
+
+    def _expand(self, func_name: str, args: list[ast.expr], use_temporaries: bool) -> ast.expr:
+        """Substitute args in the definition of func_name"""
+        body, uses = self._template(func_name)
+        substitutions = {}
+        for param, arg in zip(self.f_args[func_name], args):
+            if use_temporaries and uses[param] > 1 and not isinstance(arg, (ast.Name, ast.Constant)):
+                arg = ast.Name(id=self._temporary(arg), ctx=ast.Load())
+            substitutions[param] = arg
+        return _Substituter(substitutions).visit(copy.deepcopy(body))
+
+    def _temporary(self, expression: ast.expr) -> str:
+        """The name of the temporary variable holding expression, which is created if needed"""
+        key = ast.dump(expression)
+        if key not in self._temp_names:
+            i = len(self._temp_names)
+            while f"{self.temp_prefix}{i}" in self.reserved:
+                i += 1
+            name = f"{self.temp_prefix}{i}"
+            self.reserved.add(name)
+            self._temp_names[key] = name
+            self.temporaries[name] = ast.unparse(expression)
+        return self._temp_names[key]
+
+
+class _Substituter(ast.NodeTransformer):
+    """Replace names by expression trees, in a single pass over the tree"""
+
+    def __init__(self, substitutions: dict[str, ast.expr]):
+        self.substitutions = substitutions
+
+    def visit_Name(self, node):
+        if node.id in self.substitutions:
+            return copy.deepcopy(self.substitutions[node.id])
+        return node
@@ -0,0 +1,174 @@
+"""
+GreenLight/greenlight/_load/_fold_constants.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+Constant folding for model expressions.
+Model constants, and auxiliary variables which depend only on constants, have the same value throughout a simulation.
+Here, these variables are evaluated once, and their values are substituted as numbers in the expressions that use
+them. Subexpressions which contain only numbers (e.g., "-2 / 10 * np.log(100)") are evaluated and replaced by their
+values as well. The ODE function then only needs to compute expressions that depend on the states and the inputs.
+
+Subexpressions are evaluated exactly as they would be evaluated during solving, so folding does not change the
+results. Subexpressions whose evaluation fails, or gives a value that cannot be written as a Python number
+(e.g., inf, NaN, arrays, or complex numbers), are kept as they are.
+
+Public functions:
+    fold_constants(expressions: dict[str, str], order: Iterable[str], keep: Iterable[str] = ())
+        -> tuple[dict[str, str], dict[str, Any], int]
+        Evaluate the variables in expressions that depend only on numbers, and fold constant subexpressions
+
+External dependencies:
+    - numpy: for evaluating expressions with NumPy functions
+"""
+
+import ast
+import math
+from typing import Any, Iterable
+
+import numpy as np
+
+# Namespace in which constant subexpressions are evaluated
+_NAMESPACE = {"np": np, "math": math}
+
+
+def _literal(value: Any) -> ast.expr | None:
+    """
+    Create an AST node representing value, or None if value cannot be written as a Python number.
+    Negative numbers are represented by a unary minus, so that they are parenthesized where needed, e.g., (-2)**0.5
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return ast.Constant(value=bool(value))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+    elif isinstance(value, (float, np.floating)):
+        value = float(value)
+        if not math.isfinite(value):
+            return None
+    else:
+        return None
+    if math.copysign(1, value) < 0:
+        return ast.UnaryOp(op=ast.USub(), operand=ast.Constant(value=-value))
+    return ast.Constant(value=value)
+
+
+def _is_literal(node: ast.AST) -> bool:
+    """Check if node was created by _literal"""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        node = node.operand
+    return isinstance(node, ast.Constant) and isinstance(node.value, (bool, int, float))
+
+
+def _is_module_attribute(node: ast.AST) -> bool:
+    """Check if node is an attribute of a module in _NAMESPACE, e.g., np.exp or np.pi"""
+    return isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id in _NAMESPACE
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    """
+    Replace names in self.values by their values, and evaluate subexpressions which contain only numbers.
+    The number of evaluated subexpressions is counted in self.folded
+    """
+
+    def __init__(self, values: dict[str, Any]):
+        self.values = values
+        self.folded = 0
+        self.changed = False
+
+    def _evaluate(self, node: ast.expr) -> ast.expr:
+        """Evaluate node, and return a node with its value, or the node itself if it could not be evaluated"""
+        try:
+            value = eval(compile(ast.fix_missing_locations(ast.Expression(body=node)), "<string>", "eval"), _NAMESPACE)
+        except Exception:
+            return node
+        literal = _literal(value)
+        if literal is None:
+            return node
+        self.folded += 1
+        self.changed = True
+        return literal
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.values:
+            literal = _literal(self.values[node.id])
+            if literal is not None:
+                self.changed = True
+                return literal
+        return node
+
+    def visit_Attribute(self, node):
+        if _is_module_attribute(node) and not callable(getattr(_NAMESPACE[node.value.id], node.attr, None)):
+            return self._evaluate(node)  # Module constants, e.g., np.pi
+        return node
+
+    def visit_Call(self, node):
+        node.args = [self.visit(arg) for arg in node.args]
+        node.keywords = [self.visit(keyword) for keyword in node.keywords]
+        if (
+            _is_module_attribute(node.func)
+            and all(_is_literal(arg) for arg in node.args)
+            and all(_is_literal(keyword.value) for keyword in node.keywords)
+        ):
+            return self._evaluate(node)
+        return node
+
+    def _visit_operation(self, node):
+        self.generic_visit(node)
+        children = [child for child in ast.iter_child_nodes(node) if isinstance(child, ast.expr)]
+        if all(_is_literal(child) for child in children) and not _is_literal(node):
+            return self._evaluate(node)
+        return node
+
+    visit_BinOp = _visit_operation
+    visit_UnaryOp = _visit_operation
+    visit_BoolOp = _visit_operation
+    visit_Compare = _visit_operation
+    visit_IfExp = _visit_operation
+
+
+def fold_constants(
+    expressions: dict[str, str], order: Iterable[str], keep: Iterable[str] = ()
+) -> tuple[dict[str, str], dict[str, Any], int]:
+    """
+    Go over the variables in order, replace the variables that were already evaluated by their values, and evaluate
+    subexpressions which contain only numbers. Variables whose expressions are then a single number are evaluated:
+    their values are substituted in the expressions of the variables that follow them.
+    Variables that are not in order (e.g., model inputs) are never evaluated.
+
+    Example:
+        >>> fold_constants({"c1": "2", "c2": "-c1 * np.log(100)", "v": "c2 * x + (1 + c1)"}, ["c1", "c2", "v"])
+        ({'c1': '2', 'c2': '-9.210340371976184', 'v': '-9.210340371976184 * x + 3'},
+         {'c1': 2, 'c2': -9.210340371976184}, 3)
+
+    :param expressions: Dict of expressions, with variable names as keys
+    :param order: Names of variables in expressions, in an order that allows for solving
+                  (no variable appears before all its dependencies)
+    :param keep: Names of variables in order which are folded, but never evaluated. Use this for variables whose
+                 expressions do not describe their values, e.g., model states, whose expressions describe their
+                 derivatives
+    :return: A tuple of:
+        - A dict with the same keys as expressions, with the folded expressions.
+            Expressions that did not change are kept as they are
+        - A dict of the evaluated variables, with the variable names as keys and their values as values
+        - The number of subexpressions that were evaluated, not counting the substitution of evaluated variables
+    """
+    folded_expressions = dict(expressions)
+    values = {}
+    folder = _ConstantFolder(values)
+    keep = set(keep)
+    for var_name in order:
+        try:
+            tree = ast.parse(expressions[var_name].strip(), mode="eval")
+        except SyntaxError:  # Expressions that can't be parsed are kept as they are
+            continue
+
+        folder.changed = False
+        tree.body = folder.visit(tree.body)
+        if folder.changed:
+            folded_expressions[var_name] = ast.unparse(tree)
+
+        if _is_literal(tree.body) and var_name not in keep:
+            values[var_name] = ast.literal_eval(tree.body)
+
+    return folded_expressions, values, folder.folded
@@ -0,0 +1,436 @@
+"""
+GreenLight/greenlight/_load/_input_files.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+Functions for reading and writing files with input data for a GreenLightInternal object.
+Input data may be given as CSV files (see docs/model_format.md), or as binary columnar files: NumPy .npz files,
+Apache Parquet (.parquet) files, or Apache Arrow (.feather) files. Binary files are loaded without parsing text.
+Their columns are the input variables, one of which is "Time". The units and descriptions of the variables are
+stored in the metadata of the file, as a JSON object {"units": {...}, "descriptions": {...}} with variable names as
+keys: in .npz files it is stored as an array named "__greenlight__", in .parquet and .feather files it is stored
+under the key "greenlight" of the schema metadata.
+
+Input data may also be given as a 2D NumPy .npy file, with one row per time point and one column per input variable,
+together with a JSON file with the same name followed by ".json" (e.g., weather.npy.json). The JSON file holds the
+names of the columns as well as the units and descriptions: {"columns": [...], "units": {...}, "descriptions": {...}}.
+These files are memory-mapped rather than read: the data stays on disk, and the operating system only reads the parts
+of the file that are used, e.g., the time points around the times requested by the solver. This allows simulating
+with long, high-resolution input data (e.g., multiple years at minute resolution) without holding it in memory.
+
+All readers return the data in the same way: a DataFrame with the header rows of the data (descriptions and units,
+as in CSV files), and a DataFrame with the numeric data. These are then added to the model by
+greenlight._load.core._add_input_variables and greenlight._load.core._add_input_data.
+
+The readers may be given a time window, in which case only the rows needed for interpolating the data within the
+window are returned (see window_rows). For CSV files, the Time column is read first, and only the rows in the window
+are then parsed. This way, simulating a few days from a file with several years of data does not require parsing it.
+
+Public functions:
+    read_input_header(open_file: Callable, file_path: str, extension: str) -> pd.DataFrame
+        Read only the variable names and the header rows of a file with input data
+    read_input_file(open_file: Callable, file_path: str, extension: str, window: tuple[float, float] | None = None,
+        linear: bool = True) -> tuple[pd.DataFrame, pd.DataFrame]
+        Read a file with input data, in any of the supported formats
+    read_input_csv(open_file: Callable, encoding: str, window: tuple[float, float] | None = None,
+        linear: bool = True) -> tuple[pd.DataFrame, pd.DataFrame]
+        Read a CSV file with input data
+    split_input_header(input_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]
+        Split a DataFrame read from a CSV file into its header rows and its numeric rows
+    read_input_table(open_file: Callable, extension: str, window: tuple[float, float] | None = None,
+        linear: bool = True) -> tuple[pd.DataFrame, pd.DataFrame]
+        Read a binary columnar file (.npz, .parquet, or .feather) with input data
+    read_input_array(file_path: str | os.PathLike, window: tuple[float, float] | None = None,
+        linear: bool = True) -> tuple[pd.DataFrame, pd.DataFrame]
+        Memory-map a .npy file with input data
+    window_rows(time: np.ndarray, window: tuple[float, float] | None, linear: bool = True) -> slice
+        Find the rows of input data needed for interpolating it within a time window
+    write_input_table(file_name: str, data: pd.DataFrame, units: dict[str, str] | None = None,
+        descriptions: dict[str, str] | None = None) -> None
+        Write input data to a binary file (.npz, .parquet, .feather, or .npy)
+
+Public attributes:
+    TABLE_EXTENSIONS: tuple[str]
+        The extensions of the supported binary columnar files
+    MAPPED_EXTENSIONS: tuple[str]
+        The extensions of the supported memory-mapped files
+
+External dependencies:
+    - numpy and pandas: for reading and writing the data
+    - pyarrow (optional): for reading and writing .parquet and .feather files
+"""
+
+import json
+import os
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+TABLE_EXTENSIONS = (".npz", ".parquet", ".feather")
+MAPPED_EXTENSIONS = (".npy",)
+
+# Name of the metadata in binary files
+_METADATA_KEY = "greenlight"
+_NPZ_METADATA_NAME = "__greenlight__"
+_NPY_METADATA_SUFFIX = ".json"
+
+# Number of rows after the variable names of an input CSV file that are read as text to find the header rows
+_HEADER_ROWS_TO_SNIFF = 10
+
+
+def read_input_header(open_file: Callable, file_path: str, extension: str) -> pd.DataFrame:
+    """
+    Read the variable names and the header rows (descriptions and units) of a file with input data, without reading
+    its data. For CSV files, only the first lines of the file are read.
+
+    :param open_file: A function opening the file, called as open_file("rb"), e.g., open or Traversable.open
+    :param file_path: Location of the file, used for memory-mapped files
+    :param extension: The extension of the file: ".csv", or one of TABLE_EXTENSIONS or MAPPED_EXTENSIONS
+    :return: A DataFrame (of str) with the variable names as columns, and the header rows as rows (possibly none)
+    :raises: ValueError if extension is not supported
+             ImportError if pyarrow is needed for reading the file but not installed
+    """
+    if extension == ".csv":
+        try:
+            return _sniff_csv(open_file, encoding="utf-8")[0]
+        except UnicodeDecodeError:  # The file was probably written in Excel but contains Unicode
+            return _sniff_csv(open_file, encoding="Windows-1252")[0]
+    if extension == ".npz":
+        with open_file("rb") as file, np.load(file, allow_pickle=False) as npz:
+            metadata = json.loads(str(npz[_NPZ_METADATA_NAME])) if _NPZ_METADATA_NAME in npz.files else {}
+            columns = metadata.get("columns", [name for name in npz.files if name != _NPZ_METADATA_NAME])
+    elif extension in (".parquet", ".feather"):
+        pyarrow_io = _import_pyarrow(extension)
+        with open_file("rb") as file:
+            if extension == ".parquet":
+                schema = pyarrow_io.read_schema(file)
+            else:  # Feather files are Arrow IPC files
+                import pyarrow.ipc
+
+                schema = pyarrow.ipc.open_file(file).schema
+        metadata = json.loads((schema.metadata or {}).get(_METADATA_KEY.encode(), b"{}"))
+        columns = schema.names
+    elif extension in MAPPED_EXTENSIONS:
+        with open(f"{file_path}{_NPY_METADATA_SUFFIX}", "r", encoding="utf-8") as metadata_file:
+            metadata = json.load(metadata_file)
+        columns = metadata.get("columns", [])
+    else:
+        raise ValueError(
+            f"Unsupported input file extension {extension!r}, "
+            f"expected one of {('.csv',) + TABLE_EXTENSIONS + MAPPED_EXTENSIONS}"
+        )
+    return _header_rows(pd.Index(columns), metadata)
+
+
+def read_input_file(
+    open_file: Callable,
+    file_path: str,
+    extension: str,
+    window: tuple[float, float] | None = None,
+    linear: bool = True,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Read a file with input data, in any of the supported formats. CSV files are read as UTF-8, or, if this fails,
+    as Windows-1252 (e.g., files written in Excel).
+
+    :param open_file: A function opening the file, called as open_file("rb"), e.g., open or Traversable.open
+    :param file_path: Location of the file, used for memory-mapped files
+    :param extension: The extension of the file: ".csv", or one of TABLE_EXTENSIONS or MAPPED_EXTENSIONS
+    :param window: If given, only the rows needed for interpolating the data between window[0] and window[1] are
+                   returned, see window_rows
+    :param linear: If True, the rows are selected for linear interpolation, otherwise for "left" interpolation
+    :return: A tuple of:
+        - A DataFrame (of str) with the header rows, possibly empty
+        - A DataFrame with the numeric data, with the variable names as columns
+    :raises: ValueError if extension is not supported
+             ImportError if pyarrow is needed for reading the file but not installed
+    """
+    if extension == ".csv":
+        try:
+            return read_input_csv(open_file, "utf-8", window, linear)
+        except UnicodeDecodeError:  # The file was probably written in Excel but contains Unicode
+            return read_input_csv(open_file, "Windows-1252", window, linear)
+    if extension in MAPPED_EXTENSIONS:
+        return read_input_array(file_path, window, linear)
+    return read_input_table(open_file, extension, window, linear)
+
+
+def read_input_csv(
+    open_file: Callable, encoding: str, window: tuple[float, float] | None = None, linear: bool = True
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Read a CSV file with input data. The file starts with a row of variable names, followed by optional header rows
+    (descriptions and units, see docs/model_format.md), followed by numeric data.
+    Only the first lines of the file are read as text to find the header rows. The data is then parsed directly into
+    float64 columns by the C parser. Files whose data contain values that are not numbers are read as text, and the
+    values that are not numbers are converted to NaN, as was done for all files in previous versions.
+    If a window is given, the Time column is read first, and then only the rows in the window are parsed.
+
+    :param open_file: A function opening the file, called as open_file("rb"), e.g., open or Traversable.open
+    :param encoding: Encoding of the file
+    :param window: If given, only the rows needed for interpolating the data between window[0] and window[1] are
+                   returned, see window_rows
+    :param linear: If True, the rows are selected for linear interpolation, otherwise for "left" interpolation
+    :return: A tuple of:
+        - A DataFrame (of str) with the header rows, possibly empty
+        - A DataFrame with the numeric data, with the variable names as columns
+    :raises: UnicodeDecodeError if the file cannot be read with the given encoding
+    """
+    header_df, head_df = _sniff_csv(open_file, encoding)
+    float_columns = {column: np.float64 for column in head_df.columns}
+    read_options = {"encoding": encoding, "engine": "c", "float_precision": "round_trip"}
+
+    if len(header_df) < len(head_df):  # The first numeric row was found
+        try:
+            if window is not None and "Time" in head_df.columns:
+                with open_file("rb") as csv_file:
+                    time = pd.read_csv(
+                        csv_file,
+                        usecols=["Time"],
+                        skiprows=range(1, len(header_df) + 1),
+                        dtype={"Time": np.float64},
+                        **read_options,
+                    )["Time"].to_numpy()
+                rows = window_rows(time, window, linear)
+                with open_file("rb") as csv_file:
+                    numeric_df = pd.read_csv(
+                        csv_file,
+                        header=None,
+                        names=list(head_df.columns),
+                        skiprows=1 + len(header_df) + rows.start,
+                        nrows=rows.stop - rows.start,
+                        dtype=float_columns,
+                        **read_options,
+                    )
+                # Rows are skipped by counting lines, check that these were the rows in the window
+                if np.array_equal(numeric_df["Time"].to_numpy(), time[rows]):
+                    return header_df, numeric_df
+            else:
+                with open_file("rb") as csv_file:
+                    numeric_df = pd.read_csv(
+                        csv_file, skiprows=range(1, len(header_df) + 1), dtype=float_columns, **read_options
+                    )
+                if list(numeric_df.columns) == list(head_df.columns):
+                    return header_df, numeric_df
+        except ValueError:  # Some values are not numbers
+            pass
+
+    with open_file("rb") as csv_file:
+        input_df = pd.read_csv(csv_file, dtype=str, encoding=encoding)
+    header_df, numeric_df = split_input_header(input_df)
+    if window is not None and "Time" in numeric_df.columns:
+        numeric_df = numeric_df[window_rows(numeric_df["Time"].to_numpy(), window, linear)].reset_index(drop=True)
+    return header_df, numeric_df
+
+
+def _sniff_csv(open_file: Callable, encoding: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Read the first rows of a CSV file as text, return its header rows and the rows that were read"""
+    with open_file("rb") as csv_file:
+        head_df = pd.read_csv(csv_file, dtype=str, encoding=encoding, nrows=_HEADER_ROWS_TO_SNIFF)
+    return split_input_header(head_df)[0], head_df
+
+
+def split_input_header(input_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Split a DataFrame of str, read from an input CSV file, into its header rows and its numeric rows.
+    The numeric rows start at the first row in which all values are numbers. Values in the numeric rows that are not
+    numbers are converted to NaN.
+
+    :param input_df: A DataFrame read from a CSV file with dtype=str
+    :return: A tuple of:
+        - A DataFrame (of str) with the rows before the first numeric row, possibly empty
+        - A DataFrame with the numeric rows, converted to numbers, with a new index
+    """
+    is_numeric_row = input_df.apply(pd.to_numeric, errors="coerce").notna().all(axis=1)
+    first_num_row = int(is_numeric_row.argmax()) if is_numeric_row.any() else len(input_df)
+
+    numeric_input = input_df[first_num_row:]
+    numeric_input = numeric_input.apply(pd.to_numeric, errors="coerce")
+    numeric_input.reset_index(drop=True, inplace=True)
+    return input_df[:first_num_row], numeric_input
+
+
+def read_input_table(
+    open_file: Callable, extension: str, window: tuple[float, float] | None = None, linear: bool = True
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Read a binary columnar file with input data. The header rows are created from the units and descriptions in the
+    metadata of the file, in the same way as they appear in CSV files: if the file has descriptions, the first row
+    contains the descriptions and the second the units. Otherwise, if the file has units, the first row contains them.
+    Variables missing from the metadata get the default unit "no_unit_defined" and the default description "".
+
+    :param open_file: A function opening the file, called as open_file("rb"), e.g., open or Traversable.open
+    :param extension: The extension of the file, one of TABLE_EXTENSIONS
+    :param window: If given, only the rows needed for interpolating the data between window[0] and window[1] are
+                   returned, see window_rows
+    :param linear: If True, the rows are selected for linear interpolation, otherwise for "left" interpolation
+    :return: A tuple of:
+        - A DataFrame (of str) with the header rows, possibly empty
+        - A DataFrame with the numeric data (as float64), with the variable names as columns
+    :raises: ValueError if extension is not supported
+             ImportError if pyarrow is needed for reading the file but not installed
+    """
+    if extension == ".npz":
+        with open_file("rb") as file, np.load(file, allow_pickle=False) as npz:
+            metadata = json.loads(str(npz[_NPZ_METADATA_NAME])) if _NPZ_METADATA_NAME in npz.files else {}
+            columns = metadata.get("columns", [name for name in npz.files if name != _NPZ_METADATA_NAME])
+            rows = window_rows(npz["Time"], window, linear) if "Time" in columns else slice(None)
+            numeric_df = pd.DataFrame({column: npz[column][rows].astype(np.float64) for column in columns})
+    elif extension in (".parquet", ".feather"):
+        pyarrow_io = _import_pyarrow(extension)
+        with open_file("rb") as file:
+            table = pyarrow_io.read_table(file)
+        schema_metadata = table.schema.metadata or {}
+        metadata = json.loads(schema_metadata.get(_METADATA_KEY.encode(), b"{}"))
+        if "Time" in table.column_names:  # Only the rows in the window are converted to a DataFrame
+            rows = window_rows(table.column("Time").to_numpy(), window, linear)
+            table = table.slice(rows.start, rows.stop - rows.start)
+        numeric_df = table.to_pandas().astype(np.float64)
+    else:
+        raise ValueError(f"Unsupported input file extension {extension!r}, expected one of {TABLE_EXTENSIONS}")
+
+    return _header_rows(numeric_df.columns, metadata), numeric_df
+
+
+def read_input_array(
+    file_path: str | os.PathLike, window: tuple[float, float] | None = None, linear: bool = True
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Memory-map a 2D .npy file with input data, with one row per time point and one column per input variable.
+    The column names, units, and descriptions are read from the JSON file file_path + ".json".
+    The data is not copied: the returned DataFrame is a read-only view of the file, and only the parts of the file
+    that are used are read from disk. Files with a data type other than float64 are converted, and thus read fully.
+
+    :param file_path: Location of the .npy file
+    :param window: If given, only the rows needed for interpolating the data between window[0] and window[1] are
+                   returned, see window_rows
+    :param linear: If True, the rows are selected for linear interpolation, otherwise for "left" interpolation
+    :return: A tuple of:
+        - A DataFrame (of str) with the header rows, as in read_input_table
+        - A DataFrame with the numeric data, with the variable names as columns, backed by the memory-mapped file
+    :raises: FileNotFoundError if the JSON file with the column names does not exist
+             ValueError if the file does not hold a 2D array, or the number of columns does not match the JSON file
+    """
+    with open(f"{file_path}{_NPY_METADATA_SUFFIX}", "r", encoding="utf-8") as metadata_file:
+        metadata = json.load(metadata_file)
+    array = np.load(file_path, mmap_mode="r", allow_pickle=False)
+    columns = metadata.get("columns", [])
+    if array.ndim != 2 or array.shape[1] != len(columns):
+        raise ValueError(
+            f"Input file {file_path} holds an array of shape {array.shape}, expected a 2D array with one column for "
+            f"each of the {len(columns)} columns in {file_path}{_NPY_METADATA_SUFFIX}"
+        )
+    if "Time" in columns:  # A slice of the rows of a memory-mapped array is still memory-mapped
+        array = array[window_rows(array[:, columns.index("Time")], window, linear)]
+    numeric_df = pd.DataFrame(array.astype(np.float64, copy=False), columns=columns, copy=False)
+    return _header_rows(numeric_df.columns, metadata), numeric_df
+
+
+def window_rows(time: np.ndarray, window: tuple[float, float] | None, linear: bool = True) -> slice:
+    """
+    Find the rows of input data needed for interpolating it at all time points within a window.
+    Interpolation at a time point t uses the last row whose time is strictly smaller than t, and, for linear
+    interpolation, also the row after it (see greenlight._solve._input_interpolator). The rows are therefore the last
+    row before window[0] up to the last row before window[1], and for linear interpolation, one row more.
+    Interpolating the selected rows gives the same values within the window as interpolating all rows.
+
+    Example:
+        >>> window_rows(np.array([0, 300, 600, 900, 1200]), (400, 900))
+        slice(1, 4, None)
+        >>> window_rows(np.array([0, 300, 600, 900, 1200]), (400, 900), linear=False)
+        slice(1, 3, None)
+
+    :param time: 1D array of increasing time points
+    :param window: The start and end of the window. If None, all rows are selected
+    :param linear: If True, select the rows for linear interpolation, otherwise for "left" interpolation
+    :return: A slice of the rows of time
+    """
+    if window is None or len(time) == 0:
+        return slice(0, len(time))
+    start = max(int(np.searchsorted(time, window[0])) - 1, 0)
+    stop = int(np.searchsorted(time, window[1])) + (1 if linear else 0)
+    return slice(start, min(max(stop, start + 1), len(time)))
+
+
+def _header_rows(columns: pd.Index, metadata: dict) -> pd.DataFrame:
+    """
+    Create the header rows of input data from the units and descriptions in metadata: if there are descriptions, the
+    first row contains the descriptions and the second the units. Otherwise, if there are units, the first row contains
+    them. Variables missing from the metadata get the default unit "no_unit_defined" and the default description "".
+    """
+    units = metadata.get("units", {})
+    descriptions = metadata.get("descriptions", {})
+    header_rows = []
+    if descriptions:
+        header_rows.append([descriptions.get(column, "") for column in columns])
+    if units or descriptions:
+        header_rows.append([units.get(column, "no_unit_defined") for column in columns])
+    return pd.DataFrame(header_rows, columns=columns, dtype=object)
+
+
+def write_input_table(
+    file_name: str,
+    data: pd.DataFrame,
+    units: dict[str, str] | None = None,
+    descriptions: dict[str, str] | None = None,
+) -> None:
+    """
+    Write input data to a binary file, which can be loaded by GreenLight instead of a CSV file.
+    The format of the file is chosen by its extension, one of TABLE_EXTENSIONS or MAPPED_EXTENSIONS.
+    For .npy files, the column names, units, and descriptions are written to file_name + ".json".
+
+    :param file_name: Location of the file to write
+    :param data: A DataFrame with numeric data, with the variable names as columns (one of which is "Time")
+    :param units: The units of the variables, with variable names as keys
+    :param descriptions: The descriptions of the variables, with variable names as keys
+    :return: None
+    :raises: ValueError if the extension of file_name is not supported
+             ImportError if pyarrow is needed for writing the file but not installed
+    """
+    extension = os.path.splitext(file_name)[1]
+    data = data.astype(np.float64)
+    metadata = {"units": units or {}, "descriptions": descriptions or {}}
+
+    if extension == ".npz":
+        metadata["columns"] = [str(column) for column in data.columns]
+        arrays = {str(column): data[column].to_numpy() for column in data.columns}
+        with open(file_name, "wb") as file:
+            np.savez(file, **arrays, **{_NPZ_METADATA_NAME: np.array(json.dumps(metadata))})
+    elif extension == ".npy":
+        # One row per time point, so that the rows around a time point are stored next to each other
+        metadata["columns"] = [str(column) for column in data.columns]
+        np.save(file_name, np.ascontiguousarray(data.to_numpy()), allow_pickle=False)
+        with open(f"{file_name}{_NPY_METADATA_SUFFIX}", "w", encoding="utf-8") as metadata_file:
+            json.dump(metadata, metadata_file, indent=4)
+    elif extension in (".parquet", ".feather"):
+        pyarrow_io = _import_pyarrow(extension)
+        import pyarrow
+
+        table = pyarrow.Table.from_pandas(data, preserve_index=False)
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[_METADATA_KEY.encode()] = json.dumps(metadata).encode()
+        table = table.replace_schema_metadata(schema_metadata)
+        if extension == ".parquet":
+            pyarrow_io.write_table(table, file_name)
+        else:
+            pyarrow_io.write_feather(table, file_name)
+    else:
+        raise ValueError(
+            f"Unsupported input file extension {extension!r}, expected one of {TABLE_EXTENSIONS + MAPPED_EXTENSIONS}"
+        )
+
+
+def _import_pyarrow(extension: str):
+    """Import the pyarrow module for reading and writing files with extension, which is only needed for these files"""
+    try:
+        if extension == ".parquet":
+            import pyarrow.parquet as pyarrow_io
+        else:
+            import pyarrow.feather as pyarrow_io
+    except ImportError as err:
+        raise ImportError(
+            f"Reading and writing {extension} files requires the pyarrow package, install it with: pip install pyarrow"
+        ) from err
+    return pyarrow_io
@@ -0,0 +1,115 @@
+"""
+GreenLight/greenlight/_load/_json_cache.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+In-memory cache of parsed JSON model definition files.
+Scripts that run many simulations (e.g., one GreenLight object per scenario) load the same model definition files
+for every simulation. Here, each file is parsed once per process, and parsed again only if its modification time or
+size changed. The cached content is read-only (dicts are FrozenDict objects and lists are tuples), so that a caller
+cannot modify the content given to later callers.
+
+Public functions:
+    load_json(file: str | os.PathLike) -> FrozenDict
+        Load a JSON file, or get its content from the cache if the file did not change since it was loaded
+    clear_json_cache() -> None
+        Remove all files from the cache
+
+Public classes:
+    FrozenDict: A read-only dict
+
+External dependencies:
+    - None
+"""
+
+import hashlib
+import json
+import os
+from typing import Any
+
+from ._utils import json_raise_on_duplicates
+
+# Maximum number of files kept in the cache. When it is exceeded, the file that was loaded first is removed
+_MAX_FILES = 256
+
+# Parsed files, with resolved file paths as keys, and (modification time, size, content) as values
+_parsed_files: dict[str, tuple] = {}
+
+
+class FrozenDict(dict):
+    """
+    A dict that cannot be modified. Methods that modify the dict raise a TypeError.
+    Use dict(frozen_dict) for a modifiable (shallow) copy
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only, use dict() for a modifiable copy")
+
+    __setitem__ = _read_only
+    __delitem__ = _read_only
+    __ior__ = _read_only
+    clear = _read_only
+    pop = _read_only
+    popitem = _read_only
+    setdefault = _read_only
+    update = _read_only
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def _freeze(value: Any) -> Any:
+    """Convert lists in value to tuples, dicts are already frozen by _frozen_pairs_hook"""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _frozen_pairs_hook(ordered_pairs: list[tuple[Any, Any]]) -> FrozenDict:
+    """object_pairs_hook for json.load, creating a FrozenDict and raising an error on duplicate keys"""
+    return FrozenDict(json_raise_on_duplicates([(key, _freeze(value)) for key, value in ordered_pairs]))
+
+
+def load_json(file: str | os.PathLike) -> FrozenDict:
+    """
+    Load a JSON file, raising an error if a key is duplicated (see _utils.json_raise_on_duplicates).
+    If the file was loaded before, and its modification time and size did not change since, the content is taken from
+    the cache instead. Files that are not on the filesystem (e.g., package resources inside a zip file) are cached by
+    their content, so that only parsing them is avoided.
+
+    :param file: Location of the file, or a package resource (from importlib.resources.files)
+    :return: The content of the file, with FrozenDict objects instead of dicts, and tuples instead of lists
+    :raises: FileNotFoundError if the file doesn't exist
+             ValueError if the file is not valid JSON or contains duplicate keys
+    """
+    try:
+        key = os.path.realpath(file)
+        stat = os.stat(key)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        text = None
+    except TypeError:  # Not a path on the filesystem
+        text = file.read_text(encoding="utf-8")
+        key = str(file)
+        signature = (hashlib.sha256(text.encode()).hexdigest(), len(text))
+
+    cached = _parsed_files.get(key)
+    if cached is not None and cached[:2] == signature:
+        return cached[2]
+
+    if text is None:
+        with open(key, "r", encoding="utf-8") as json_file:
+            content = json.load(json_file, object_pairs_hook=_frozen_pairs_hook)
+    else:
+        content = json.loads(text, object_pairs_hook=_frozen_pairs_hook)
+
+    _parsed_files.pop(key, None)
+    if len(_parsed_files) >= _MAX_FILES:
+        del _parsed_files[next(iter(_parsed_files))]
+    _parsed_files[key] = (*signature, content)
+    return content
+
+
+def clear_json_cache() -> None:
+    """Remove all files from the cache, so that they are loaded again"""
+    _parsed_files.clear()
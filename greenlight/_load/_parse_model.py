@@ -10,28 +10,26 @@ Public functions:
     format_expressions(all_expressions, basis_expressions, functions,
         formatting_mode, perform_function_parsing, perform_variable_parsing) -> (dict[str, str], dict, list):
         Format all_expressions according to formatting_mode and the other parameters.
-    extract_variables(node, extracted_type, node_name) -> dict:
-        Create a dictionary of model variables of extracted_type defined under a dict node. Recurse through sub-nodes.
-        Return dict of variable definitions, units, descriptions, and references.
-    extract_options(node, extracted_type, node_name) -> dict:
-        Create a dictionary of model options based on any options defined in node. Recurse through sub-nodes.
-        Return dict containing all model options.
+    extract_components(node) -> dict:
+        Collect the model variables, their types, initial values, and the model options defined under a dict node,
+        in a single pass through node and its sub-nodes.
+        Return dict of variable definitions, units, descriptions, references, types, initial values, and options.
 
 Exceptions:
     ValueError if circular dependencies are found
     ValueError if unrecognized formatting_mode given to format_expressions
-    ValueError if dict with a duplicate definition (two definitions for the same variable) given to extract_variables
+    ValueError if dict with a duplicate definition (two definitions for the same variable or option) given to
+        extract_components
 
 External dependencies:
     - None
 """
 
 import copy
-import re
 from typing import Iterable
 
 from . import _expand_functions
-from ._utils import check_for_cycles, find_dependencies
+from ._utils import find_dependencies, sort_dependencies, substitute_identifiers
 
 
 def format_expressions(
@@ -41,7 +39,8 @@ def format_expressions(
     formatting_mode: str,
     perform_function_parsing: bool,
     perform_variable_parsing: bool,
-) -> (dict[str, str], dict, list):
+    function_temporaries: bool = False,
+) -> (dict[str, str], dict, list, list):
     """
     Format the mathematical expressions in all_expressions according to formatting_mode and the additional parameters.
     This allows to later solve the model according to a chosen method. Note that some mathematical expressions,
@@ -51,10 +50,11 @@ def format_expressions(
     Example usage:
         For a loaded GreenLightInternal mdl, format the variables, map the dependencies, and list the solving order,
         based on mdl's, variables, states, functions, and options:
-        >>> mdl.variables_formatted, mdl.dependencies, mdl.solving_order = format_expressions(
+        >>> mdl.variables_formatted, mdl.dependencies, mdl.solving_order, mdl.solving_levels = format_expressions(
         ...     mdl.variables, mdl.states.keys(), mdl.functions, mdl.options["formatting_mode"],
         ...     mdl.options["expand_functions"].strip().lower() == "true",
         ...     mdl.options["expand_variables"].strip().lower() == "true",
+        ...     mdl.options["function_temporaries"].strip().lower() == "true",
         ... )
 
     :param all_expressions: A dict describing variables. The keys are variable names and the values are mathematical
@@ -79,6 +79,11 @@ def format_expressions(
         then the formatted expression will be {"v1": "y2*y3 + y1", "v2": "y2*y3"}.
         This should be possible to do for as long as no circular dependencies (v1 is described using v2
         which is described using v1) are found.
+    :param function_temporaries: If True (and perform_function_parsing is True), function arguments that are used
+        more than once in the function definition are added to the formatted expressions as temporary variables
+        named "_fn0", "_fn1", etc., instead of being copied into the expansion.
+        For example, if functions is {"func1(a,b)": "a * b + b"}, then the expression "func1(x,y+z)" will be
+        expanded to "x * _fn0 + _fn0", and "_fn0" will be added with the expression "y + z"
     :return:
         - formatted_expressions: A dictionary with the formatted expressions. The keys are the same as in
                 all_expressions, but the values are formatted<br>
@@ -88,7 +93,11 @@ def format_expressions(
                 and all_expressions is {"v1": "v2 + y1", "v2": "y2*y3"},
                 then dependencies is {"v1": {"v2"}, "v2": set()}<br>
         - solving_order: A list of the keys of all_variables, sorted in a way that solving is possible
-                (no variable is interpreted before all of its dependencies are interpreted)
+                (no variable is interpreted before all of its dependencies are interpreted)<br>
+        - solving_levels: The keys in solving_order, grouped into levels such that each key depends only on keys
+                in earlier levels, and the keys in each level can be interpreted in parallel.
+                For example, if all_expressions is {"v1": "v2 + y1", "v2": "y2*y3", "v3": "y1"},
+                then solving_levels is [["v2", "v3"], ["v1"]]
     :raises: A ValueError is raised if circular dependencies are found (v1 depends on v2 which depends on v1)
              A ValueError is raised if formatting_mode is not a recognized value
     """
@@ -143,11 +152,14 @@ def format_expressions(
     expressions_to_format = copy.deepcopy(all_expressions)  # The expressions that still need to be reformatted
 
     if perform_function_parsing:
-        _expand_functions.parse(expressions_to_format, functions, builtin_expressions)
+        _expand_functions.parse(
+            expressions_to_format, functions, builtin_expressions, "_fn" if function_temporaries else None
+        )
 
     # Create a dict of dependencies with dictionary comprehension using _find_dependencies
+    ignored_expressions = basis_expressions | builtin_expressions
     dependencies = {
-        key: find_dependencies(value, expressions_to_format.keys(), basis_expressions | builtin_expressions)
+        key: find_dependencies(value, expressions_to_format.keys(), ignored_expressions)
         for key, value in expressions_to_format.items()
     }
 
@@ -157,27 +169,21 @@ def format_expressions(
         if key == value:
             dependencies[key] = set()
 
-    # Check for circular dependencies. A ValueError will be raised if a circular dependency is found
-    check_for_cycles(
-        expressions_to_format.keys(), dependencies, basis_expressions | {key: key for key in builtin_expressions}
-    )
+    # Sort the expressions so that each expression comes after its dependencies, and group them into levels.
+    # A ValueError will be raised if a circular dependency is found
+    solving_order, solving_levels = sort_dependencies(expressions_to_format.keys(), dependencies, basis_expressions)
 
     # The basis and builtin expressions are already considered expanded.  This is done so that in the next step,
     # when these expressions appear as dependencies, they are not further expanded
     formatted_expressions: dict[str, str] = {key: key for key in basis_expressions | builtin_expressions}
-    solving_order = []
-
-    while expressions_to_format:  # There are still expressions that need to be expanded
-        for key in list(expressions_to_format):
-            if all(dep in formatted_expressions for dep in dependencies[key]):  # All deps for this key are expanded...
-                expression = expressions_to_format.pop(key)
-                for dep in sorted(dependencies[key], key=len, reverse=True):
-                    if perform_variable_parsing:
-                        #                                       ...so simply replace each dependency by its expansion
-                        expression = re.sub(r"\b%s\b" % dep, f"({formatted_expressions[dep]})", expression)
-                formatted_expressions[key] = expression
-                if key not in solving_order:
-                    solving_order.append(key)
+
+    for key in solving_order:  # All deps for this key are expanded...
+        expression = expressions_to_format[key]
+        if perform_variable_parsing:  # ...so simply replace each dependency by its expansion
+            expression = substitute_identifiers(
+                expression, {dep: f"({formatted_expressions[dep]})" for dep in dependencies[key]}
+            )
+        formatted_expressions[key] = expression
 
     # Bulitin expressions do not need to appear in formatted_expressions, so can now remove them
     for key in builtin_expressions:
@@ -186,178 +192,127 @@ def format_expressions(
 
     if formatting_mode == "numpy":
         # Convert all numpy expressions from "expr" to "np.expr"
-        for key, value in formatted_expressions.items():
-            for numpy_expr in numpy_expressions:
-                formatted_expressions[key] = re.sub(
-                    r"\b%s\b" % numpy_expr, f"np.{numpy_expr}", formatted_expressions[key]
-                )
+        prefixed_expressions = {numpy_expr: f"np.{numpy_expr}" for numpy_expr in numpy_expressions}
     elif formatting_mode == "math":
         # Convert all math expressions from "expr" to "math.expr"
-        for key, value in formatted_expressions.items():
-            for math_expr in math_expressions:
-                formatted_expressions[key] = re.sub(
-                    r"\b%s\b" % math_expr, f"math.{math_expr}", formatted_expressions[key]
-                )
-    elif formatting_mode != "numexpr":
+        prefixed_expressions = {math_expr: f"math.{math_expr}" for math_expr in math_expressions}
+    elif formatting_mode == "numexpr":
+        prefixed_expressions = {}
+    else:
         raise ValueError("Unrecognized formatting mode %r" % formatting_mode)
 
+    # Each expression is converted in a single pass, looking up its identifiers in prefixed_expressions
+    if prefixed_expressions:
+        for key, value in formatted_expressions.items():
+            formatted_expressions[key] = substitute_identifiers(value, prefixed_expressions)
+
     # Basis expressions and functions do not need to be solved
-    for key in basis_expressions | functions.keys():
-        if key in solving_order:
-            solving_order.remove(key)
+    not_solved = basis_expressions | functions.keys()
+    solving_order = [key for key in solving_order if key not in not_solved]
+    solving_levels = [[key for key in level if key not in not_solved] for level in solving_levels]
+    solving_levels = [level for level in solving_levels if level]
 
-    return formatted_expressions, dependencies, solving_order
+    return formatted_expressions, dependencies, solving_order, solving_levels
 
 
-def extract_variables(node: dict, extracted_type: str = "all", node_name: str = "") -> dict:
+def extract_components(node: dict) -> dict:
     """
-    Extract variables defined in node and all its sub-nodes. If node has a key "type" or "definition" it is assumed to
-    contain a variable definition.
-    In this case, if node["type"]==extracted_type, the key node_name will be added to the following dicts
+    Collect the model variables, initial values, and options defined in node and all its sub-nodes, in a single pass.
+    If a sub-node has a key "type" or "definition" it is assumed to contain a variable definition.
+    In this case, the name of the sub-node (its key in its parent node), node_name, will be added to the following dicts
     in the following way:
-        defs_dict[node_name] = node["definition"]
-        units_dict[node_name] = node["unit"]
-        desc_dict[node_name] = node["description"]
-        refs_dict[node_name] = node["reference"]
-
-    One exception is if extracted_type == "init", in this case, the following will be assigned:
-        defs_dict[node_name] = node["init"]
+        components["definition"][node_name] = sub_node["definition"]
+        components["unit"][node_name] = sub_node["unit"]
+        components["description"][node_name] = sub_node["description"]
+        components["reference"][node_name] = sub_node["reference"]
+    and if the sub-node has a key "type", node_name is appended to components["types"][sub_node["type"]].
 
-    If any of the above keys do not exist in node, default values will be used:
+    If any of the above keys do not exist in the sub-node, default values will be used:
         The default definition is node_name
         The default unit is "no_unit_defined"
         The default description is ""
         The default reference is ""
-    After this procedure, the function will continue recursively through all subnodes (i.e., values) in node.
+
+    If a sub-node has a key "init", components["init"][node_name] = sub_node["init"] (for setting initial values for
+    states). If the name of a sub-node is "Options" (case insensitive), all its sub-nodes are added to
+    components["options"].
     See docs/model_format.md for details on what the expected node structure.
 
     Example usage:
         For a given GreenLightInternal component described in a dict, extract the variables and their definitions:
-        >>> new_variables = extract_variables(model_component, extracted_type="all")
+        >>> components = extract_components(model_component)
+        >>> constants = components["types"].get("const", [])
+
+        >>> extract_components({"root": {
+        ...     "x": {"type": "state", "definition": "-x", "init": "1"},
+        ...     "c": {"type": "const", "definition": "2", "unit": "s"},
+        ...     "options": {"t_end": "86400"}}})
+        will return:
+        >>> {"definition": {"x": "-x", "c": "2"}, "unit": {"x": "no_unit_defined", "c": "s"},
+        ...  "description": {"x": "", "c": ""}, "reference": {"x": "", "c": ""},
+        ...  "types": {"state": ["x"], "const": ["c"]}, "init": {"x": "1"}, "options": {"t_end": "86400"}}
 
     :param node: dict containing a variable definitions or subnodes with their own variable definitions
-    :param extracted_type: If "all", all nodes will be included. If "initial value", the function will set
-        defs_dict[node_name] as node["init"] (for setting initial values for states). For other values, the function
-        will only consider nodes with node["type"]==extracted_type
-    :param node_name: A name for the node, to be used as the key for the return dicts
     :return A dict in the following format:
-        {"definition": defs_dict, "unit": units_dict, "description": desc_dict, "reference": refs_dict}
-    :raises: A ValueError is raised if a duplicate definition (two definitions for the same variable) is found
-
-    """
-    defs_dict = {}
-    units_dict = {}
-    desc_dict = {}
-    refs_dict = {}
-
-    if isinstance(node, dict):
-        if "type" in node or "definition" in node:  # The node represents a variable
-            if extracted_type == "all" or ("type" in node and node["type"] == extracted_type):
-                if "definition" in node:
-                    defs_dict[node_name] = node["definition"]
-                else:
-                    defs_dict[node_name] = node_name
-                if "unit" in node:
-                    units_dict[node_name] = node["unit"]
-                else:
-                    units_dict[node_name] = "no_unit_defined"
-                if "description" in node:
-                    desc_dict[node_name] = node["description"]
-                else:
-                    desc_dict[node_name] = ""
-                if "reference" in node:
-                    refs_dict[node_name] = node["reference"]
-                else:
-                    refs_dict[node_name] = ""
-        if extracted_type == "initial value" and "init" in node:
-            defs_dict[node_name] = node["init"]
-            if "unit" in node:
-                units_dict[node_name] = node["unit"]
-            else:
-                units_dict[node_name] = "no_unit_defined"
-            if "description" in node:
-                desc_dict[node_name] = node["description"]
-            else:
-                desc_dict[node_name] = "no_description"
-            if "reference" in node:
-                refs_dict[node_name] = node["reference"]
-            else:
-                refs_dict[node_name] = ""
-
-        # Recurse the function over all sub-nodes of the current node
-        for key, value in node.items():
-            sub_node = extract_variables(value, extracted_type, key)
-
-            # Add all keys from sub-nodes into the parent node, raising an error in case of overwrite
-            for sub_key, sub_value in sub_node["definition"].items():
-                if sub_key in defs_dict:
-                    raise ValueError(
-                        "Duplicate definition for variable %r: %r and %r" % (sub_key, defs_dict[sub_key], sub_value)
-                    )
-                if sub_key in units_dict and units_dict[sub_key] != sub_node["unit"][sub_key]:
-                    raise ValueError(
-                        "Duplicate unit definition for variable %r: %r and %r"
-                        % (sub_key, units_dict[sub_key], sub_node["unit"][sub_key])
-                    )
-                if sub_key in desc_dict and desc_dict[sub_key] != sub_node["description"][sub_key]:
-                    raise ValueError(
-                        "Duplicate description for variable %r: %r and %r"
-                        % (sub_key, desc_dict[sub_key], sub_node["description"][sub_key])
-                    )
-                if sub_key in refs_dict and refs_dict[sub_key] != sub_node["reference"][sub_key]:
-                    raise ValueError(
-                        "Duplicate reference for variable %r: %r and %r"
-                        % (sub_key, refs_dict[sub_key], sub_node["reference"][sub_key])
-                    )
-                else:
-                    defs_dict[sub_key] = sub_value
-                    units_dict[sub_key] = sub_node["unit"][sub_key]
-                    desc_dict[sub_key] = sub_node["description"][sub_key]
-                    refs_dict[sub_key] = sub_node["reference"][sub_key]
-
-    return {"definition": defs_dict, "unit": units_dict, "description": desc_dict, "reference": refs_dict}
-
-
-def extract_options(node: dict, node_name: str = "") -> dict:
+        {"definition": defs_dict, "unit": units_dict, "description": desc_dict, "reference": refs_dict,
+         "types": types_dict, "init": init_dict, "options": options_dict}
+        where the keys of defs_dict, units_dict, desc_dict, and refs_dict are the names of all variables, in the order
+        in which they appear in node, and types_dict has the variable types as keys, and lists of names as values
+    :raises: A ValueError is raised if a duplicate definition (two definitions for the same variable or initial value,
+        or two definitions of the same option) is found
     """
-    Extract options contained in an options node. A node is considered an options node if its name
-    (the key of the root node) is "Options" (case insensitive).
-    The method goes through the given node and searches for options nodes. For any options nodes found, their
-    subnodes are collected in the returned dict.
-    The method recurses through all sub-nodes of node to collect any options defined.
+    components = {
+        "definition": {},
+        "unit": {},
+        "description": {},
+        "reference": {},
+        "types": {},
+        "init": {},
+        "options": {},
+    }
+    _collect_components(node, "", "", components)
+    return components
 
-    Example usage:
-        >>> extract_options({"root": {
-        ...                     "sub_node_1": {"options": {"t_start": "0"}},
-        ...                     "sub_node_2": {"options": {"t_end": "86400"}}
-        ...                       }})
-        will return:
-        >>> {"t_start": "0", "t_end": "86400"}
 
-    :param node: A node of a dictionary to start searching for options nodes from
-    :param node_name: The name of the node given. If it is "options" (case-insensitive),
-        the node is considered an options node.
-    :return: A dict with all the options defined in node and its sub-nodes.
+def _collect_components(node: dict, node_name: str, parent_name: str, components: dict) -> None:
     """
-    options = {}
-
-    if isinstance(node, dict):
-        if node_name.strip().lower() == "options":
-            for key, value in node.items():
-                options[key] = value
-
-        # Recurse the function over all sub-nodes of the current node
+    Add the variable, initial value, or options defined by node to components (see extract_components),
+    and recurse through all sub-nodes of node
+    """
+    if not isinstance(node, dict):
+        return
+
+    if "type" in node or "definition" in node:  # The node represents a variable
+        definition = node.get("definition", node_name)
+        if node_name in components["definition"]:
+            raise ValueError(
+                "Duplicate definition for variable %r: %r and %r"
+                % (node_name, components["definition"][node_name], definition)
+            )
+        components["definition"][node_name] = definition
+        components["unit"][node_name] = node.get("unit", "no_unit_defined")
+        components["description"][node_name] = node.get("description", "")
+        components["reference"][node_name] = node.get("reference", "")
+        if "type" in node:
+            components["types"].setdefault(node["type"], []).append(node_name)
+
+    if "init" in node:
+        if node_name in components["init"]:
+            raise ValueError(
+                "Duplicate definition for variable %r: %r and %r"
+                % (node_name, components["init"][node_name], node["init"])
+            )
+        components["init"][node_name] = node["init"]
+
+    if node_name.strip().lower() == "options":
         for key, value in node.items():
-            sub_node_options = extract_options(value, key)
-
-            # Add all keys from sub-nodes into the parent node, raising an error in case of overwrite
-            for sub_key, sub_value in sub_node_options.items():
-                if sub_key in options:
-                    raise ValueError(
-                        "Duplicate definition for option %r in the same file.\nDefinition: %r\nNode name: %r"
-                        % (sub_key, sub_value, node_name)
-                    )
-                else:
-                    options[sub_key] = sub_value
-
-    return options
+            if key in components["options"]:
+                raise ValueError(
+                    "Duplicate definition for option %r in the same file.\nDefinition: %r\nNode name: %r"
+                    % (key, value, parent_name)
+                )
+            components["options"][key] = value
+
+    # Recurse over all sub-nodes of the current node
+    for key, value in node.items():
+        _collect_components(value, key, node_name, components)
@@ -17,18 +17,50 @@ Functions:
         object_pairs_hook function for using in json._load. Raises an error if the loaded JSON file contains
         a duplicate key
     - expressions_to_dy_str(
-        y_vars: dict[str, str], d_vars: Iterable[str], a_vars: dict[str, str] = [], a_order: Iterable[str] = []
+        y_vars: dict[str, str], d_vars: Iterable[str], a_vars: dict[str, str] = [], a_order: Iterable[str] = [],
+        p_vars: Iterable[str] = []
         ) -> list[str]
         Create a list of Python type expressions from variable definitions
+    - substitute_identifiers(expression: str, substitutions: dict[str, str]) -> str
+        Replace all identifiers (variable names) in an expression in a single pass
+    - find_identifiers(expression: str) -> frozenset[str]
+        Find all identifiers (variable and function names) that appear in an expression
     - find_dependencies(expression: str, variables: Iterable[str], ignore: Iterable[str]) -> set
         Find all variables that a given variable depends on
-    - check_for_cycles(expressions: Iterable[str], dependencies: dict, basis_expressions: Iterable[str]) -> None
-        Given variable expressions and their dependencies, check if there are any circular dependencies
+    - sort_dependencies(expressions: Iterable[str], dependencies: dict, basis_expressions: Iterable[str])
+        -> tuple[list[str], list[list[str]]]
+        Sort variable expressions so that they can be solved, and group them into levels of equal dependency depth
+    - find_state_dependencies(expressions: dict[str, str], states: Iterable[str], dependencies: dict) -> dict
+        For each state, find the states that its derivative depends on, directly or through auxiliary states
+    - find_required_variables(targets: Iterable[str], dependencies: dict) -> set
+        Find all variables that a set of target variables depends on, directly or through other variables
+    - columns_array(data: pd.DataFrame, columns: Iterable[str]) -> np.ndarray
+        The values of some columns of a DataFrame as a 2D array, without copying the DataFrame if possible
+    - uniform_step(time: np.ndarray) -> float | None
+        Find the step size of a time grid, if it is equally spaced
+    - find_rows(time: np.ndarray, t: np.ndarray, step: float | None = None) -> np.ndarray
+        For each time point in t, find the last row of time which is smaller than it
+    - interp_columns(t: np.ndarray, time: np.ndarray, values: np.ndarray, step: float | None = None) -> np.ndarray
+        Linearly interpolate all columns of a 2D array at once
+    - resample_columns(t: np.ndarray, time: np.ndarray, values: np.ndarray, linear: bool = True) -> np.ndarray
+        Resample all columns of a 2D array to a new time grid at once
+
+External dependencies:
+    - numpy: for working with numerical arrays
 """
 
+import functools
 import re
+from collections import deque
+from collections.abc import Set
 from typing import Any, Iterable
 
+import numpy as np
+
+# An identifier (e.g., a variable name) in a mathematical expression. Names following a "." (e.g., "exp" in "np.exp")
+# are attributes and not identifiers, names following a digit (e.g., "e5" in "1e5") are part of a number
+_IDENTIFIER_PATTERN = re.compile(r"(?<![\w.])[A-Za-z_]\w*")
+
 
 def flatten_input(input_prompt: str | dict | list[str | dict]) -> list[str | dict]:
     """
@@ -63,7 +95,7 @@ def is_replacement(mdl, new_variables, key, update_type) -> bool:
             - For descriptions, the default is ""
             - For references, the default is ""
     :param mdl: A GreenLightInternal object to be updated
-    :param new_variables: A dict of new variables, created by _parse_model.extract_variables()
+    :param new_variables: A dict of new variables, created by _parse_model.extract_components()
     :param key: Name of the new variable
     :param update_type: "definition", "unit", "description", or "reference"
     :return: True if updating with the provided values is considered a replacement
@@ -106,7 +138,7 @@ def is_update_to_perform(mdl, new_variables, key, update_type) -> bool:
         - The new key does already exist in mdl, AND the new value is NOT a default value
 
     :param mdl: A GreenLightInternal object to be updated
-    :param new_variables: A dict of new variables, created by _parse_model.extract_variables()
+    :param new_variables: A dict of new variables, created by _parse_model.extract_components()
     :param key: Name of the new variable
     :param update_type: "definition", "unit", "description", or "reference"
     :return: True if the update needs to be performed
@@ -149,14 +181,18 @@ def json_raise_on_duplicates(ordered_pairs: list[tuple[Any, Any]]) -> dict:
 
 
 def expressions_to_dy_str(
-    y_vars: dict[str, str], d_vars: Iterable[str], a_vars: dict[str, str] = [], a_order: Iterable[str] = []
+    y_vars: dict[str, str],
+    d_vars: Iterable[str],
+    a_vars: dict[str, str] = [],
+    a_order: Iterable[str] = [],
+    p_vars: Iterable[str] = [],
 ) -> list[str]:
     """
     Given a dict of expressions and a list of variable names, create a list of expressions starting with "dy[...]=",
     where the variable names in y_expressions are expressed as elements of an array y, and the variable names of d_vars
     are expressed as elements of array d.
     This function is meant to be used when y_expressions describe differential equations (dy) of states (y),
-    and these equations may include some inputs (d) or auxiliary states (a).
+    and these equations may include some inputs (d), auxiliary states (a), or parameters (p).
     The newly created array can be used to define functions that can then be used by ODE solvers.
 
     Example:
@@ -175,33 +211,60 @@ def expressions_to_dy_str(
         therefore a_var2 should appear before a_var1 in a_order.
     :param y_vars: A dict containing state variable, with their names as keys and definitions as values.
     :param d_vars: An Iterable[str] containing names of variables, for example model input variables.
+    :param p_vars: An Iterable[str] containing names of variables which are expressed as elements of an array p,
+        for example model constants (see options["parametrize_consts"]).
     :return: array_expressions: A list[str] of reformatted expressions as described above.
     """
-    array_expressions = []
     if type(a_vars) is dict:
         a_vars_keys = a_vars.keys()
     else:
         a_vars_keys = []
-    for i, (var_name) in enumerate(a_order):
-        array_expressions.append("a[" + str(i) + "] = " + a_vars[var_name])
-        for j, (y_var_name) in enumerate(y_vars.keys()):
-            array_expressions[-1] = re.sub(r"\b%s\b" % y_var_name, "y[" + str(j) + "]", array_expressions[-1])
-        for j, (a_var_name) in enumerate(a_vars.keys()):
-            array_expressions[-1] = re.sub(r"\b%s\b" % a_var_name, "a[" + str(j) + "]", array_expressions[-1])
-        for j, (d_var_name) in enumerate(d_vars):
-            array_expressions[-1] = re.sub(r"\b%s\b" % d_var_name, "d[" + str(j + 1) + "]", array_expressions[-1])
-    for i, (var_name, expression) in enumerate(y_vars.items()):
-        array_expressions.append("dy[" + str(i) + "] = " + expression)
-        for j, (y_var_name) in enumerate(y_vars.keys()):
-            array_expressions[-1] = re.sub(r"\b%s\b" % y_var_name, "y[" + str(j) + "]", array_expressions[-1])
-        for j, (a_var_name) in enumerate(a_vars_keys):
-            array_expressions[-1] = re.sub(r"\b%s\b" % a_var_name, "a[" + str(j) + "]", array_expressions[-1])
-        for j, (d_var_name) in enumerate(d_vars):
-            array_expressions[-1] = re.sub(r"\b%s\b" % d_var_name, "d[" + str(j + 1) + "]", array_expressions[-1])
+
+    # All names are substituted in a single pass over each expression. The mappings are merged so that states take
+    # precedence over auxiliary states, inputs, and parameters of the same name
+    substitutions = {p_var_name: "p[" + str(j) + "]" for j, p_var_name in enumerate(p_vars)}
+    substitutions |= {d_var_name: "d[" + str(j + 1) + "]" for j, d_var_name in enumerate(d_vars)}
+    substitutions |= {a_var_name: "a[" + str(j) + "]" for j, a_var_name in enumerate(a_vars_keys)}
+    substitutions |= {y_var_name: "y[" + str(j) + "]" for j, y_var_name in enumerate(y_vars.keys())}
+
+    array_expressions = []
+    for i, var_name in enumerate(a_order):
+        array_expressions.append("a[" + str(i) + "] = " + substitute_identifiers(a_vars[var_name], substitutions))
+    for i, expression in enumerate(y_vars.values()):
+        array_expressions.append("dy[" + str(i) + "] = " + substitute_identifiers(expression, substitutions))
 
     return array_expressions
 
 
+def substitute_identifiers(expression: str, substitutions: dict[str, str]) -> str:
+    """
+    Replace all identifiers in expression that appear in substitutions by their substituted value, in a single pass.
+    Identifiers that do not appear in substitutions are left as is.
+    Example: substitute_identifiers("var1 + np.exp(var2)", {"var1": "y[0]", "var2": "a[3]"}) returns
+        "y[0] + np.exp(a[3])"
+
+    :param expression: str containing some mathematical expression, including some variable names
+    :param substitutions: A dict where the keys are identifiers to be replaced and the values are their replacements
+    :return: The expression after the substitutions were made
+    """
+    return _IDENTIFIER_PATTERN.sub(lambda match: substitutions.get(match.group(0), match.group(0)), expression)
+
+
+@functools.lru_cache(maxsize=2**16)
+def find_identifiers(expression: str) -> frozenset[str]:
+    """
+    Find all identifiers (variable and function names) that appear in expression. Attributes (e.g., "exp" in "np.exp")
+    are not identifiers.
+    The results are cached, so the same expression is only tokenized once during loading, even if it is inspected
+    by several loading stages.
+    Example: find_identifiers("var1 + np.exp(var2*1e5)") returns frozenset({"var1", "np", "var2"})
+
+    :param expression: str containing some mathematical expression
+    :return: A frozenset of the identifiers in expression
+    """
+    return frozenset(_IDENTIFIER_PATTERN.findall(expression))
+
+
 def find_dependencies(expression: str, variables: Iterable[str], ignore: Iterable[str]) -> set:
     """
     Given a variable definition expression, this function allows to find all variables that the given variable
@@ -209,47 +272,270 @@ def find_dependencies(expression: str, variables: Iterable[str], ignore: Iterabl
     variables that are mentioned in expression. Names that are in ignore are excluded.
     :param expression: str containing some mathematical expression, including some variable names.
     :param variables: An Iterable[str] of variable names. A name included in variables is considered a dependency.
+        Passing a set or the keys of a dict avoids copying variables for every call
     :param ignore: An Iterable[str] of variable names that do not count as dependencies (for example, built-in variables
         or expressions like exp, sqrt)
     :return: A set of all dependencies (a subset of vars) listed in expression
     """
-    pattern = r"\b(?:{})\b".format("|".join(re.escape(var_name) for var_name in variables))
+    if not isinstance(variables, Set):
+        variables = set(variables)
 
-    dependencies = set(re.findall(pattern, expression))
-    for var_name in ignore:
-        if var_name in dependencies:
-            dependencies.remove(var_name)
+    dependencies = {name for name in find_identifiers(expression) if name in variables}
+    dependencies.difference_update(ignore)
 
     return dependencies
 
 
-def check_for_cycles(expressions: Iterable[str], dependencies: dict, basis_expressions: Iterable[str]) -> None:
+def sort_dependencies(
+    expressions: Iterable[str], dependencies: dict, basis_expressions: Iterable[str]
+) -> tuple[list[str], list[list[str]]]:
     """
-    Given variable expressions and their dependencies, check if there are any circular dependencies
-    (i.e., a depends on b which depends on a).
-    :param expressions: An Iterable[str] of expression names, which are a subset of dependencies.keys().
+    Sort variable expressions in an order that allows for solving them (no expression appears before all its
+    dependencies), and check for circular dependencies, in a single pass over the dependency graph.
+    The graph is traversed in topological order (Kahn's algorithm): a counter of unsorted dependencies is kept for
+    each expression, and an expression is sorted once its counter reaches zero.
+
+    The sorted order is the order in which the expressions are found when expressions is scanned repeatedly, each time
+    taking the expressions whose dependencies were already taken, so that it stays the same as in previous versions.
+    The expressions are also grouped into levels: the expressions in levels[0] have no dependencies, and the
+    expressions in levels[k] depend only on expressions in levels[0] to levels[k-1], with at least one in levels[k-1].
+    The expressions in each level can therefore be evaluated in parallel, and len(levels) is the depth of the graph.
+
+    Example:
+        >>> sort_dependencies(["v1", "v2", "v3"], {"v1": {"v2", "y1"}, "v2": set(), "v3": {"v1", "v2"}}, ["y1"])
+        (['v2', 'v1', 'v3'], [['v2'], ['v1'], ['v3']])
+
+    :param expressions: An Iterable[str] of expression names, which are a subset of dependencies.keys()
     :param dependencies: A dict of dependencies: dependencies[key] is a set containing the names of all variables
         that key depends on. This dict can be created with _find_dependencies.
-    :param basis_expressions: Expressions that are not considered to be a dependency. The function will not check for
-        circular dependencies which include these expressions.
-    :return: None
+    :param basis_expressions: Expressions that are not considered to be a dependency. Dependencies on these, and on
+        names not in expressions, are ignored
+    :return: A tuple of:
+        - order: A list of the names in expressions, sorted in a way that solving is possible
+        - levels: A list of lists of the names in expressions, grouped by their dependency depth.
+            The names in each level are in the same order as in expressions
     :raises: A ValueError if a circular dependency is found
     """
-    visited = set()
-    stack = set()
-
-    def _visit(exp, path):
-        if exp in stack:
-            raise ValueError(f"Circular dependency detected involving {exp}: {' -> '.join(path + [exp])}")
-        if exp not in visited:
-            stack.add(exp)
-            visited.add(exp)
-            path.append(exp)
-            for dep in dependencies[exp]:
-                if dep not in basis_expressions:
-                    _visit(dep, path)
-            path.pop()
-            stack.remove(exp)
-
-    for expr in expressions:
-        _visit(expr, [])
+    position = {name: i for i, name in enumerate(expressions)}
+    basis_expressions = set(basis_expressions)
+
+    dependents = {name: [] for name in position}  # The reverse graph: for each name, the names that depend on it
+    unsorted_deps = {}  # For each name, the number of its dependencies that were not sorted yet
+    for name in position:
+        deps = [dep for dep in dependencies[name] if dep in position and dep not in basis_expressions]
+        unsorted_deps[name] = len(deps)
+        for dep in deps:
+            dependents[dep].append(name)
+
+    # level[name]: the length of the longest chain of dependencies below name
+    # scan[name]: the scan over expressions in which name would be taken, see above. A dependency that comes after
+    #   name in expressions is only taken in the scan in which name is visited, so name is taken in the next scan
+    level = dict.fromkeys(position, 0)
+    scan = dict.fromkeys(position, 0)
+    ready = deque(name for name in position if unsorted_deps[name] == 0)
+    n_sorted = 0
+    while ready:
+        name = ready.popleft()
+        n_sorted += 1
+        for dependent in dependents[name]:
+            level[dependent] = max(level[dependent], level[name] + 1)
+            scan[dependent] = max(scan[dependent], scan[name] + (position[name] > position[dependent]))
+            unsorted_deps[dependent] -= 1
+            if unsorted_deps[dependent] == 0:
+                ready.append(dependent)
+
+    if n_sorted < len(position):
+        # Every remaining expression depends on another remaining expression. Follow these dependencies until
+        # an expression repeats, to report the cycle that was found
+        path = [next(name for name in position if unsorted_deps[name] > 0)]
+        while path.count(path[-1]) == 1:
+            remaining_deps = [
+                dep
+                for dep in dependencies[path[-1]]
+                if dep in position and dep not in basis_expressions and unsorted_deps[dep] > 0
+            ]
+            path.append(min(remaining_deps, key=position.get))
+        raise ValueError(
+            f"Circular dependency detected involving {path[-1]}: {' -> '.join(path[path.index(path[-1]):])}"
+        )
+
+    order = sorted(position, key=lambda name: (scan[name], position[name]))
+    levels = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for name in position:
+        levels[level[name]].append(name)
+
+    return order, levels
+
+
+def find_state_dependencies(expressions: dict[str, str], states: Iterable[str], dependencies: dict) -> dict:
+    """
+    For each state, find all states that the state's derivative depends on. A derivative may depend on a state directly
+    (the state's name appears in the expression), or indirectly, through a chain of auxiliary states.
+    For example, if states are ["y1", "y2"], expressions are {"y1": "a1 + y1", "y2": "5", "a1": "2*y2"},
+    and dependencies are {"y1": {"a1"}, "y2": set(), "a1": set()}, the returned dict is
+    {"y1": {"y1", "y2"}, "y2": set()}.
+    This is the structure (sparsity pattern) of the Jacobian of the system of ODEs described by the expressions.
+
+    :param expressions: A dict of variable names and their (formatted) mathematical expressions
+    :param states: An Iterable[str] of state names, a subset of expressions.keys()
+    :param dependencies: A dict of dependencies, as created by _parse_model.format_expressions. States are not
+        included in these dependencies, therefore direct references to states are found from the expressions themselves
+    :return: A dict with the states as keys. Each value is the set of states that the key's derivative depends on
+    """
+    states = list(states)
+    reached_states = {}  # For each visited variable, the set of states it depends on
+
+    def _reach(var_name):
+        if var_name not in reached_states:
+            reached = find_dependencies(expressions.get(var_name, ""), states, [])
+            for dep in dependencies.get(var_name, set()):
+                if dep not in states:
+                    reached = reached | _reach(dep)
+            reached_states[var_name] = reached
+        return reached_states[var_name]
+
+    return {state: _reach(state) for state in states}
+
+
+def find_required_variables(targets: Iterable[str], dependencies: dict) -> set:
+    """
+    Find all variables that the variables in targets depend on, directly or through a chain of other variables.
+    For example, if targets is ["y1"] and dependencies are {"y1": {"a1"}, "a1": {"c1"}, "c1": set(), "a2": {"c1"}},
+    the returned set is {"a1", "c1"}.
+    The targets themselves are included only if another target depends on them.
+
+    :param targets: An Iterable[str] of variable names, e.g., model states
+    :param dependencies: A dict of dependencies, as created by _parse_model.format_expressions
+    :return: A set of the names of all variables that targets depend on
+    """
+    required = set()
+    to_visit = [dep for target in targets for dep in dependencies.get(target, set())]
+    while to_visit:
+        var_name = to_visit.pop()
+        if var_name not in required:
+            required.add(var_name)
+            to_visit.extend(dependencies.get(var_name, set()))
+    return required
+
+
+def columns_array(data, columns: Iterable[str]) -> np.ndarray:
+    """
+    The values of the given columns of a DataFrame, in the given order, as a 2D float64 array.
+    Selecting columns of a DataFrame by a list copies them (unless pandas copy-on-write is used), so if columns are
+    all the columns of data, in their order, the values are taken from data directly. Data backed by a memory-mapped
+    file (see _input_files.read_input_array) then remains memory-mapped. Otherwise, the selected columns are copied
+
+    :param data: A DataFrame of numbers
+    :param columns: Names of columns of data
+    :return: A 2D array with one row per row of data and one column per name in columns
+    """
+    columns = list(columns)
+    if list(data.columns) == columns:
+        return np.asarray(data.to_numpy(), dtype=np.float64)
+    return data[columns].to_numpy(dtype=np.float64)
+
+
+def uniform_step(time: np.ndarray) -> float | None:
+    """
+    Find the step size of a time grid, if the grid is equally spaced. A grid is considered equally spaced if every time
+    point is within 1e-6 steps of its expected position, so that small rounding errors in the data are allowed
+
+    :param time: 1D array of increasing time points
+    :return: The step size, if time is equally spaced and has at least two points. Otherwise, None
+    """
+    time = np.asarray(time, dtype=np.float64)
+    if len(time) < 2:
+        return None
+    step = (time[-1] - time[0]) / (len(time) - 1)
+    if not step > 0:
+        return None
+    if np.any(np.abs(time - (time[0] + step * np.arange(len(time)))) > 1e-6 * step):
+        return None
+    return float(step)
+
+
+def find_rows(time: np.ndarray, t: np.ndarray, step: float | None = None) -> np.ndarray:
+    """
+    For each time point in t, find the last row of time which is strictly smaller than it,
+    i.e., np.searchsorted(time, t) - 1.
+    If time is equally spaced with step size step (see uniform_step), the rows are found by direct index arithmetic
+    instead of a binary search
+
+    :param time: 1D array of increasing time points
+    :param t: Time points to look up (a number or an array)
+    :param step: The step size of time, if it is equally spaced, or None
+    :return: Array of the same shape as t, with values between -1 (t <= time[0]) and len(time)-1 (t > time[-1])
+    """
+    time = np.asarray(time, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    if step is None:
+        return np.searchsorted(time, t) - 1
+
+    n = len(time)
+    rows = np.clip(np.ceil((t - time[0]) / step) - 1, -1, n - 1).astype(int)
+
+    # The time points may deviate slightly from the uniform grid, correct the rows by at most one position
+    rows = rows + ((rows + 1 < n) & (time[np.minimum(rows + 1, n - 1)] < t))
+    rows = rows - ((rows >= 0) & (time[np.maximum(rows, 0)] >= t))
+    return rows
+
+
+def interp_columns(t: np.ndarray, time: np.ndarray, values: np.ndarray, step: float | None = None) -> np.ndarray:
+    """
+    Linearly interpolate all columns of a 2D array at the time points t. This gives the same result as applying
+    np.interp(t, time, values[:, col]) to each column (computed in the same way, so also the same rounding), but the
+    rows are only looked up once for all columns. The only exception is at repeated time points, where the value of
+    the first of them is used, rather than the last
+
+    :param t: 1D array of time points in which to interpolate
+    :param time: 1D array of increasing time points, with one time point for each row of values
+    :param values: 2D array of values, with one row per time point
+    :param step: The step size of time, if it is equally spaced (see uniform_step), or None
+    :return: 2D array with one row for each time point in t and the same number of columns as values
+    """
+    time = np.asarray(time, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    if len(time) == 1:
+        return np.repeat(values, len(t), axis=0)
+
+    rows = np.clip(find_rows(time, t, step), 0, len(time) - 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = (values[rows + 1] - values[rows]) / (time[rows + 1] - time[rows])[:, np.newaxis]
+        result = slopes * (t - time[rows])[:, np.newaxis] + values[rows]
+
+        # As in np.interp: if the result is not finite (e.g., due to infinite values), interpolate from the next row
+        not_finite = np.isnan(result)
+        if not_finite.any():
+            from_next = slopes * (t - time[rows + 1])[:, np.newaxis] + values[rows + 1]
+            result[not_finite] = from_next[not_finite]
+            equal = np.isnan(result) & (values[rows] == values[rows + 1])
+            result[equal] = values[rows][equal]
+
+    # Time points of the data, and time points outside the data, use the values of the data as they are
+    at_next = t == time[rows + 1]
+    result[at_next] = values[rows + 1][at_next]
+    result[t <= time[0]] = values[0]
+    result[t >= time[-1]] = values[-1]
+    return result
+
+
+def resample_columns(t: np.ndarray, time: np.ndarray, values: np.ndarray, linear: bool = True) -> np.ndarray:
+    """
+    Resample all columns of a 2D array, given at the time points time, to the time points t, e.g., for combining data
+    from files with different time points. With linear interpolation, this is the same as interp_columns.
+    Otherwise, the values at the last time point at or before each time point in t are used, so that the values at
+    time points which appear in both time and t do not change. In both cases, the values at the first or last time
+    point are used for time points in t outside the range of time
+
+    :param t: 1D array of increasing time points to resample to
+    :param time: 1D array of increasing time points, with one time point for each row of values
+    :param values: 2D array of values, with one row per time point
+    :param linear: If True, use linear interpolation, otherwise use the values at the last time point at or before t
+    :return: 2D array with one row for each time point in t and the same number of columns as values
+    """
+    if linear:
+        return interp_columns(t, time, values)
+    values = np.asarray(values, dtype=np.float64)
+    rows = np.searchsorted(np.asarray(time, dtype=np.float64), np.asarray(t, dtype=np.float64), side="right") - 1
+    return values[np.clip(rows, 0, len(values) - 1)]
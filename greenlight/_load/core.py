@@ -29,18 +29,20 @@ External dependencies:
     - pandas: for representing data from input CSV files
 """
 
+import functools
 import importlib.resources as resources
 import json
 import logging
 import os
 from pathlib import Path, PurePath
+from typing import Iterable
 
 import numpy as np
 import pandas as pd
 
 from greenlight._greenlight_internal import GreenLightInternal
 
-from . import _parse_model, _utils
+from . import _cache, _cse, _differentiate, _fold_constants, _input_files, _json_cache, _parse_model, _utils
 
 
 def load_model(mdl: GreenLightInternal) -> None:
@@ -57,11 +59,21 @@ def load_model(mdl: GreenLightInternal) -> None:
         mdl.var_refs:           Same keys as mdl.variables, values are strings describing the references
                                 (publication, etc.) where the definition came from
         mdl.variables_formatted:Same keys as mdl.variables, values are strings with mathematical definitions,
-                                formatted based on values in mdl.options, ready to be solved
+                                formatted based on values in mdl.options, ready to be solved.
+                                If mdl.options["fold_constants"] is "True", variables that depend only on constants
+                                are replaced by their values
         mdl.dependencies:       Same keys as mdl.variables, values are sets such that for each key, the value is
                                 a set with names of all variables, that the key depends on in order to be calculated
         mdl.solving_order:      List of all variables of mdl, organized in an order that allows for solving
                                 (no variable appears before all its dependencies)
+        mdl.solving_levels:     The variables in mdl.solving_order, grouped into levels: each variable depends only on
+                                variables in earlier levels, so the variables in a level can be evaluated in parallel.
+                                The number of levels is the depth of the dependency graph (mdl.dependencies)
+        mdl.commands:           List of strings representing the model as Python commands
+        mdl.parameters:         If mdl.options["parametrize_consts"] is "True", list of the names of the model
+                                constants, in the order of the array p used in mdl.commands. Otherwise an empty list
+        mdl.jac_commands:       If mdl.options["jacobian"] is "analytic", list of strings representing the Jacobian of
+                                the model as Python commands. Otherwise an empty list
 
         mdl.consts:             A subset of mdl.variables, containing only model constants
         mdl.inputs:             A subset of mdl.variables, containing only model inputs
@@ -70,8 +82,11 @@ def load_model(mdl: GreenLightInternal) -> None:
         mdl.states:             A subset of mdl.variables, containing only model states
         mdl.init:               A dictionary with the same keys as mdl.states, with values holding the initial values
         mdl.input_data:         A pandas DataFrame holding data for the variables in mdl.inputs
+                                If mdl.options["trim_input_data"] is "True", only the rows needed for simulating
+                                from mdl.options["t_start"] to mdl.options["t_end"] are included
                                 If no input data is given, this DataFrame has a single column, "Time", with 2 rows,
                                 representing mdl.options["t_start"] and mdl.options["t_end"]
+        mdl.input_time_step:    The step size of mdl.input_data["Time"] if it is equally spaced, otherwise None
         mdl.full_sol:           A pandas DataFrame with a "Time" column, and a column for each model variable,
                                 except constants and functions. At this moment it is an "empty" solution, which will
                                 get populated after model solving
@@ -87,6 +102,8 @@ def load_model(mdl: GreenLightInternal) -> None:
     input_prompt = _utils.flatten_input(mdl.input_prompt)
 
     # Read input_prompt, one argument at a time
+    # The data of input data files is read after all arguments were read, when the simulated period is known
+    input_files = []
     print("\n")
     for input_arg in input_prompt:
         directory = ""
@@ -104,30 +121,23 @@ def load_model(mdl: GreenLightInternal) -> None:
                 else:  # Look at the directory relative to base_path
                     directory = os.path.join(mdl.base_path, directory)
 
-                _load_input_arg(mdl, file_name, directory)
+                _load_input_arg(mdl, file_name, directory, input_files)
             else:  # input_arg is not a file name
-                _load_input_arg(mdl, input_arg, directory)
+                _load_input_arg(mdl, input_arg, directory, input_files)
 
         elif isinstance(input_arg, dict):
-            _load_input_arg(mdl, input_arg)
+            _load_input_arg(mdl, input_arg, input_files=input_files)
 
         else:
             raise ValueError("Input argument %r is not a string or a dict" % (input_arg,))
 
-    # After loading all variables into mdl, format them according to the chosen options
-    mdl.variables_formatted, mdl.dependencies, mdl.solving_order = _parse_model.format_expressions(
-        mdl.variables,
-        mdl.states.keys(),
-        mdl.functions,
-        mdl.options["formatting_mode"],
-        mdl.options["expand_functions"].strip().lower() == "true",
-        mdl.options["expand_variables"].strip().lower() == "true",
-    )
+    _read_input_files(mdl, input_files)
 
     # If no input data was loaded, set the input_data attribute as a DataFrame with a single column, "Time",
     # with two rows: the t_start and the t_end options
     if mdl.input_data.empty:
         mdl.input_data["Time"] = [float(mdl.options["t_start"]), float(mdl.options["t_end"])]
+        mdl.input_time_step = _utils.uniform_step(mdl.input_data["Time"])
 
     # Set up the format for the model solution:
     # A DataFrame with a "Time" column and all model variables except constants and functions
@@ -139,21 +149,169 @@ def load_model(mdl: GreenLightInternal) -> None:
         full_sol_cols.extend(["Time"])
     mdl.full_sol = pd.DataFrame(columns=full_sol_cols)
 
-    # List of strings representing the defined dynamic model written as Python commands
-    if mdl.options["expand_variables"].strip().lower() == "true":
-        mdl.commands = _utils.expressions_to_dy_str(
-            {key: mdl.variables_formatted[key] for key in mdl.states}, mdl.inputs.keys()
+    # Compile the model: format its expressions and convert them to Python commands
+    # If options["cache_dir"] is set, a model compiled by a previous load is used if it is available, see _cache.py
+    cache_dir = mdl.options["cache_dir"].strip()
+    if not cache_dir or cache_dir.lower() == "none":
+        _compile_model(mdl)
+    elif not _cache.load_from_cache(mdl, cache_dir):
+        log_start = len(mdl.log)
+        _compile_model(mdl)
+        _cache.save_to_cache(mdl, cache_dir, mdl.log[log_start:].rstrip("\n"))
+
+
+def _compile_model(mdl: GreenLightInternal) -> None:
+    """
+    Compile a model whose definitions were read into mdl: format the expressions of the model variables, and convert
+    them to Python commands. This sets the attributes in _cache.CACHED_ATTRIBUTES, see load_model for their description
+
+    :param mdl: A GreenLightInternal object, after all arguments of its input_prompt were loaded
+    :return: None
+    """
+    # After loading all variables into mdl, format them according to the chosen options
+    mdl.variables_formatted, mdl.dependencies, mdl.solving_order, mdl.solving_levels = _parse_model.format_expressions(
+        mdl.variables,
+        mdl.states.keys(),
+        mdl.functions,
+        mdl.options["formatting_mode"],
+        mdl.options["expand_functions"].strip().lower() == "true",
+        mdl.options["expand_variables"].strip().lower() == "true",
+        mdl.options["function_temporaries"].strip().lower() == "true",
+    )
+
+    # If constants are parameters, they are given to the ODE function as elements of an array p, so that their values
+    # can be changed without loading the model again (see greenlight.GreenLight.solve)
+    parametrize = mdl.options["parametrize_consts"].strip().lower() == "true"
+    if parametrize and mdl.options["expand_variables"].strip().lower() == "true":
+        mdl.add_to_log(
+            "'parametrize_consts' is not supported with 'expand_variables', option ignored",
+            warn=mdl.options["warn_loading"].strip().lower() == "true",
         )
+        parametrize = False
+    mdl.parameters = _find_parameters(mdl) if parametrize else []
+
+    # Evaluate constants, and fold subexpressions that depend only on constants into numbers
+    # Parameters are not evaluated, since their values may change
+    folded_values = {}
+    if mdl.options["fold_constants"].strip().lower() == "true":
+        folded_values = _fold_model_constants(mdl, mdl.parameters)
+
+    # Expressions of the states, and of the auxiliary variables needed for computing them, in the order of computing
+    y_vars = {key: mdl.variables_formatted[key] for key in mdl.states}
+    if mdl.options["expand_variables"].strip().lower() == "true":
+        a_order = []
     else:
-        mdl.commands = _utils.expressions_to_dy_str(
-            {key: mdl.variables_formatted[key] for key in mdl.states},
-            mdl.inputs.keys(),
-            {key: mdl.variables_formatted[key] for key in mdl.solving_order if key not in mdl.inputs.keys()},
-            [key for key in mdl.solving_order if key not in mdl.inputs.keys()],
+        # Only the variables that the derivatives of the states depend on are computed by the ODE function.
+        # Variables that were evaluated by constant folding, and variables that are only needed for the output, are
+        # not needed for computing the states. The latter are computed after solving, see greenlight._solve.core
+        rhs_vars = _utils.find_required_variables(mdl.states.keys(), mdl.dependencies)
+        a_order = [
+            key
+            for key in mdl.solving_order
+            if key in rhs_vars
+            and key not in mdl.inputs.keys()
+            and key not in folded_values
+            and key not in mdl.parameters
+        ]
+        output_only = [key for key in mdl.solving_order if key in mdl.aux and key not in rhs_vars]
+        mdl.add_to_log(
+            f"{len(output_only)} of {len(mdl.aux)} auxiliary states are not needed for computing the states, "
+            f"these are only computed for the output after solving",
+            warn=False,
         )
+    a_vars = {key: mdl.variables_formatted[key] for key in a_order}
+    if mdl.options["cse"].strip().lower() == "true":
+        y_vars, a_vars, a_order = _eliminate_common_subexpressions(mdl, y_vars, a_vars, a_order)
+
+    # List of strings representing the defined dynamic model written as Python commands
+    mdl.commands = _utils.expressions_to_dy_str(y_vars, mdl.inputs.keys(), a_vars, a_order, mdl.parameters)
+
+    # List of strings representing the Jacobian of the dynamic model written as Python commands
+    if mdl.options["jacobian"].strip().lower() == "analytic":
+        prefix = {"numpy": "np.", "math": "math."}.get(mdl.options["formatting_mode"], "")
+        try:
+            mdl.jac_commands = _differentiate.expressions_to_jac_str(
+                y_vars, mdl.inputs.keys(), a_vars, a_order, prefix=prefix, p_vars=mdl.parameters
+            )
+        except ValueError as err:
+            mdl.jac_commands = []
+            mdl.add_to_log(
+                f"Could not create an analytic Jacobian, a finite difference approximation will be used instead: {err}",
+                warn=mdl.options["warn_loading"].strip().lower() == "true",
+            )
+
+
+def _find_parameters(mdl: GreenLightInternal) -> list[str]:
+    """
+    Find the model constants which depend only on other constants. Constants which depend on other variables,
+    e.g., on inputs that replaced constants by input data, are not parameters
+
+    :param mdl: A GreenLightInternal object, after its expressions were formatted (see _parse_model.format_expressions)
+    :return: A list of the names of the parameters, in solving order
+    """
+    parameters = []
+    for key in mdl.solving_order:
+        if key in mdl.consts and key not in mdl.inputs and all(dep in parameters for dep in mdl.dependencies[key]):
+            parameters.append(key)
+    return parameters
+
+
+def _fold_model_constants(mdl: GreenLightInternal, exclude: Iterable[str] = ()) -> dict:
+    """
+    Evaluate the model constants and the auxiliary states that depend only on constants, and fold subexpressions of
+    mdl.variables_formatted that depend only on constants into numbers, see greenlight._load._fold_constants.
+    mdl.variables_formatted is modified in place: the expressions of evaluated variables are replaced by their values,
+    so these values also appear in the model structure log (see greenlight._save.core._create_model_dict).
+    The number of evaluated variables and folded subexpressions is added to mdl.log
+
+    :param mdl: A GreenLightInternal object, after its expressions were formatted (see _parse_model.format_expressions)
+    :param exclude: Names of variables which should not be evaluated, e.g., parameters
+    :return: A dict of the evaluated variables, with the variable names as keys and their values as values
+    """
+    mdl.variables_formatted, folded_values, n_folded = _fold_constants.fold_constants(
+        mdl.variables_formatted,
+        [key for key in mdl.solving_order if key not in mdl.inputs.keys() and key not in exclude]
+        + list(mdl.states.keys()),
+        keep=mdl.states.keys(),
+    )
+    mdl.add_to_log(
+        f"Constant folding: {len(folded_values)} variables evaluated to numbers, "
+        f"{n_folded} constant subexpressions folded",
+        warn=False,
+    )
+    return folded_values
 
 
-def _load_input_arg(mdl: GreenLightInternal, input_arg: str | dict, input_dir: str = "") -> None:
+def _eliminate_common_subexpressions(
+    mdl: GreenLightInternal, y_vars: dict[str, str], a_vars: dict[str, str], a_order: list[str]
+) -> tuple[dict[str, str], dict[str, str], list[str]]:
+    """
+    Replace repeated subexpressions in the expressions of the states and the auxiliary variables by temporary
+    variables, see greenlight._load._cse. The temporary variables are added to the auxiliary variables.
+    The number of temporary variables and of removed operations is added to mdl.log
+
+    :param mdl: A GreenLightInternal object, used for logging
+    :param y_vars: A dict of the expressions of the states, with the state names as keys
+    :param a_vars: A dict of the expressions of the auxiliary variables, with the variable names as keys
+    :param a_order: The keys of a_vars, in an order that allows for solving
+    :return: y_vars, a_vars, and a_order, with the repeated subexpressions replaced
+    """
+    expressions, order, ops_before, ops_after = _cse.eliminate_common_subexpressions(
+        a_vars | y_vars, list(a_order) + list(y_vars.keys())
+    )
+    a_order = [key for key in order if key not in y_vars]
+    n_temps = len(a_order) - len(a_vars)
+    mdl.add_to_log(
+        f"Common subexpression elimination: {n_temps} repeated subexpressions replaced by temporary variables, "
+        f"operations per evaluation of the model reduced from {ops_before} to {ops_after}",
+        warn=False,
+    )
+    return {key: expressions[key] for key in y_vars}, {key: expressions[key] for key in a_order}, a_order
+
+
+def _load_input_arg(
+    mdl: GreenLightInternal, input_arg: str | dict, input_dir: str = "", input_files: list | None = None
+) -> None:
     """
     Load and parse a single input argument onto a GreenLightInternal object. The input argument either describes a model
     component in a JSON (or dict) type format or by a str which is a file path of a JSON or CSV file to be loaded.
@@ -167,7 +325,7 @@ def _load_input_arg(mdl: GreenLightInternal, input_arg: str | dict, input_dir: s
         mdl.var_refs: Updated with the references of any new or modified variables
 
         mdl.inputs: Updated with the names of any new input variables
-        mdl.input_data: Updated to include any added input data
+        mdl.input_data: Updated to include any added input data, if input_files is None
 
         mdl.consts: Updated with the definitions of any new or modified constants
         mdl.functions: Updated with the definitions of any new or modified functions
@@ -190,6 +348,8 @@ def _load_input_arg(mdl: GreenLightInternal, input_arg: str | dict, input_dir: s
         If input_arg is a location of a file, input_dir is a reference directory, i.e., the file should
             be located in os.path.join(input_dir, input_arg).
         If input_arg is not a location of a file, this should be ""
+    :param input_files: If given, input data files are only registered: their variables are added to mdl, and the
+        files are added to this list, to be read later by _read_input_files. Otherwise, their data is read immediately
     :return: None
     :raises: ValueError if the input argument is not a str or dict
     """
@@ -200,8 +360,8 @@ def _load_input_arg(mdl: GreenLightInternal, input_arg: str | dict, input_dir: s
     loaded_dict = {}
     if input_dir:  # input_arg is a str which is a file path
         _, extension = os.path.splitext(input_arg)
-        if extension == ".csv":
-            # Check if the CSV file is part of greenlight's packaged resources
+        if extension == ".csv" or extension in _input_files.TABLE_EXTENSIONS + _input_files.MAPPED_EXTENSIONS:
+            # Check if the data file is part of greenlight's packaged resources
             input_dir_path = PurePath(os.path.abspath(input_dir))
             resources_path = PurePath(resources.files("greenlight"))
             is_resource = input_dir_path == resources_path or resources_path in input_dir_path.parents
@@ -217,21 +377,22 @@ def _load_input_arg(mdl: GreenLightInternal, input_arg: str | dict, input_dir: s
                     if default_resource in str(resource_file):
                         # special case default argument but file not found - skip loading
                         return
-                    raise FileNotFoundError(f"Input CSV file {resource_file} not found.")
-                try:
-                    with resource_file.open("rb") as csv_file:
-                        loaded_df = pd.read_csv(csv_file, dtype=str, encoding="utf-8")
-                except UnicodeDecodeError:  # The file was probably written in Excel but contains Unicode
-                    with resource_file.open("rb") as csv_file:
-                        loaded_df = pd.read_csv(csv_file, dtype=str, encoding="Windows-1252")
+                    raise FileNotFoundError(f"Input data file {resource_file} not found.")
+                open_file = resource_file.open
+                file_path = str(resource_file)
             else:  # The file is not a package resource
-                if not os.path.exists(os.path.join(input_dir, input_arg)):
-                    raise FileNotFoundError(f"Input CSV file {os.path.join(input_dir, input_arg)} not found.")
-                try:
-                    loaded_df = pd.read_csv(os.path.join(input_dir, input_arg), dtype=str, encoding="utf-8")
-                except UnicodeDecodeError:  # The file was probably written in Excel but contains Unicode
-                    loaded_df = pd.read_csv(os.path.join(input_dir, input_arg), dtype=str, encoding="Windows-1252")
-            _add_input_data(mdl, loaded_df, input_arg)
+                file_path = os.path.join(input_dir, input_arg)
+                if not os.path.exists(file_path):
+                    raise FileNotFoundError(f"Input data file {file_path} not found.")
+                open_file = functools.partial(open, file_path)
+
+            # The variables of the file are added now, so that later arguments may modify them
+            _add_input_variables(mdl, _input_files.read_input_header(open_file, file_path, extension), input_arg)
+            input_file = (open_file, file_path, extension, input_arg)
+            if input_files is None:
+                _read_input_files(mdl, [input_file])
+            else:
+                input_files.append(input_file)
 
         elif extension == ".json":
             # Check if the JSON file is part of greenlight's packaged resources
@@ -247,12 +408,10 @@ def _load_input_arg(mdl: GreenLightInternal, input_arg: str | dict, input_dir: s
                         )
                     )
                 )
-                with resource_file.open("r", encoding="utf-8") as json_file:
-                    loaded_dict = json.load(json_file, object_pairs_hook=_utils.json_raise_on_duplicates)
+                loaded_dict = _json_cache.load_json(resource_file)
             else:
-                with open(os.path.join(input_dir, input_arg), "r", encoding="utf-8") as json_file:
-                    #  Load the JSON as a dict
-                    loaded_dict = json.load(json_file, object_pairs_hook=_utils.json_raise_on_duplicates)
+                #  Load the JSON as a (read-only) dict, parsed files are reused if they did not change
+                loaded_dict = _json_cache.load_json(os.path.join(input_dir, input_arg))
 
     elif isinstance(input_arg, str):  # input_arg is a str describing model structure in JSON format
         loaded_dict = json.loads(input_arg, object_pairs_hook=_utils.json_raise_on_duplicates)
@@ -281,7 +440,7 @@ def _load_input_arg(mdl: GreenLightInternal, input_arg: str | dict, input_dir: s
                 _, extension = os.path.splitext(line)
 
                 if extension != "":  # The line describes a file
-                    _load_input_arg(mdl, line, directory)
+                    _load_input_arg(mdl, line, directory, input_files)
                 else:  # The line describes a dict
                     _add_variables(mdl, line, input_arg)
             else:
@@ -317,13 +476,13 @@ def _add_variables(mdl: GreenLightInternal, model_component: dict, model_compone
         useful output in case the given model component overrides previously loaded model components
     :return: None
     :rtype: None
-    :raises: ValueError raised by parse_model.extract_variables if circular dependencies are found.
+    :raises: ValueError raised by parse_model.extract_components if duplicate definitions are found.
     """
     issue_warnings = mdl.options["warn_loading"].strip().lower() == "true"
 
     try:
         logger = logging.getLogger(__name__)
-        new_variables = _parse_model.extract_variables(model_component, extracted_type="all")
+        new_variables = _parse_model.extract_components(model_component)
     except ValueError as err:
         logger.error(
             "Error in %r: %r"
@@ -335,8 +494,9 @@ def _add_variables(mdl: GreenLightInternal, model_component: dict, model_compone
         raise
 
     # new_variables is a dict with the following format:
-    # {"definition": defs_dict, "unit": units_dict, "description": desc_dict, "reference": refs_dict}
-    # Each of these dicts have the same keys, which are the names of the new variables to add.
+    # {"definition": defs_dict, "unit": units_dict, "description": desc_dict, "reference": refs_dict,
+    #  "types": types_dict, "init": init_dict, "options": options_dict}
+    # The first four dicts have the same keys, which are the names of the new variables to add.
 
     # Add all variables, add a log record if any variable is overwritten
     for key in new_variables["definition"].keys():  # These are also the keys of unit, description, reference
@@ -372,12 +532,9 @@ def _add_variables(mdl: GreenLightInternal, model_component: dict, model_compone
                 elif update_type == "reference":
                     mdl.var_refs[key] = new_variables[update_type][key]
 
-    # Get options
-    options = _parse_model.extract_options(model_component)
-
     # Add all options to mdl.options
     # issue a warning before overwriting previous options
-    for key, value in options.items():
+    for key, value in new_variables["options"].items():
         if key in mdl.options and value != mdl.options[key]:
             mdl.add_to_log(
                 f"\nReplaced option {key} by definition from {model_component_name}.\n"
@@ -387,98 +544,106 @@ def _add_variables(mdl: GreenLightInternal, model_component: dict, model_compone
 
         mdl.options[key] = value
 
-    # Add constants to the dict of constants
-    new_consts = _parse_model.extract_variables(model_component, extracted_type="const")
-    mdl.consts.update({key: mdl.variables[key] for key in new_consts["definition"]})
-
-    # Add functions to the dict of functions
-    new_functions = _parse_model.extract_variables(model_component, extracted_type="function")
-    mdl.functions.update({key: mdl.variables[key] for key in new_functions["definition"]})
-
-    # Add auxiliary states to the dict of aux states
-    new_aux = _parse_model.extract_variables(model_component, extracted_type="aux")
-    mdl.aux.update({key: mdl.variables[key] for key in new_aux["definition"]})
-
-    # Add states to the dict of states
-    new_states = _parse_model.extract_variables(model_component, extracted_type="state")
-    mdl.states.update({key: mdl.variables[key] for key in new_states["definition"]})
+    # Add constants, functions, auxiliary states, and states to their dicts
+    new_types = new_variables["types"]
+    mdl.consts.update({key: mdl.variables[key] for key in new_types.get("const", [])})
+    mdl.functions.update({key: mdl.variables[key] for key in new_types.get("function", [])})
+    mdl.aux.update({key: mdl.variables[key] for key in new_types.get("aux", [])})
+    mdl.states.update({key: mdl.variables[key] for key in new_types.get("state", [])})
 
     # Inputs loaded from dicts or JSONs are considered aux, unless data is provided for them
-    new_inputs = _parse_model.extract_variables(model_component, extracted_type="input")
-    mdl.aux.update({key: mdl.variables[key] for key in new_inputs["definition"]})
+    mdl.aux.update({key: mdl.variables[key] for key in new_types.get("input", [])})
 
     # Add initial values to the dict of initial values
-    new_init = _parse_model.extract_variables(model_component, extracted_type="initial value")
-    mdl.init.update(new_init["definition"])
+    mdl.init.update(new_variables["init"])
 
 
-def _add_input_data(mdl: GreenLightInternal, input_df: pd.DataFrame, input_df_name: str) -> None:
+def _read_input_files(mdl: GreenLightInternal, input_files: list) -> None:
     """
-    Add input variables to a GreenLightInternal object, using data from a pandas DataFrame (typically loaded from a CSV file).
+    Read the data of input data files, whose variables were already added to mdl by _load_input_arg, and add it to
+    mdl.input_data. If mdl.options["trim_input_data"] is "True", only the rows of the data needed for simulating from
+    mdl.options["t_start"] to mdl.options["t_end"] are read (see _input_files.window_rows). The data of files that are
+    combined with data read before them is interpolated to the time points of the earlier data, so for these files the
+    rows needed for interpolating between the first and the last of these time points are read. If
+    mdl.options["input_time_grid"] is "union", the time points of these files are kept as well, so the rows needed for
+    simulating are read, as for the first file.
+
+    :param mdl: A GreenLightInternal object, after the variables of the files in input_files were added to it
+    :param input_files: List of tuples (open_file, file_path, extension, input_arg) describing input data files, in
+        the order in which they were loaded, see _load_input_arg
+    :return: None
+    """
+    trim = mdl.options["trim_input_data"].strip().lower() == "true"
+    union = mdl.options["input_time_grid"].strip().lower() == "union"
+    for open_file, file_path, extension, input_arg in input_files:
+        window, linear = None, mdl.options["interpolation"] == "linear"
+        if trim and not union and not mdl.input_data.empty and "Time" in mdl.input_data:
+            window, linear = (mdl.input_data["Time"].iloc[0], mdl.input_data["Time"].iloc[-1]), True
+        elif trim:
+            window = (float(mdl.options["t_start"]), float(mdl.options["t_end"]))
+
+        _, loaded_df = _input_files.read_input_file(open_file, file_path, extension, window, linear)
+        if window is not None:
+            mdl.add_to_log(
+                f"Read {len(loaded_df)} rows of input data from {input_arg}, "
+                f"needed for the time period from {window[0]} to {window[1]}",
+                warn=False,
+            )
+        _add_input_data(mdl, loaded_df, input_arg)
+
+
+def _add_input_variables(mdl: GreenLightInternal, header_df: pd.DataFrame, input_df_name: str) -> None:
+    """
+    Add input variables to a GreenLightInternal object, using the variable names and the header rows of input data
+    (typically loaded from a CSV file). The data itself is added by _add_input_data.
     The following attributes of mdl are modified:
-        mdl.variables: Each column name of input_df is added to the dict, with the column name as both key and value.
+        mdl.variables: Each column name of header_df is added to the dict, with the column name as both key and value.
             If the column name already existed in mdl.variables, its definition is updated so that it is equal to the
             variable name.
             This means that the variable will no longer be computed. Instead, the input data will be used.
         mdl.states: If a column name existed as a name of a state variable, this variable is removed from mdl.states.
             This variable will no longer be computed as a state. Instead, the input data will be used.
-        mdl.inputs: Each column name of input_df is added to the dict, with the column name as both key and value.
+        mdl.inputs: Each column name of header_df is added to the dict, with the column name as both key and value.
         mdl.var_units: For the added variables, if a description of a unit is found it is added,
             replacing any previous value.
         mdl.var_description: For the added variables, if a description of the variable is found it is added,
             replacing any previous value.
-        mdl.input_data: Updated to include the data in input_df. If a variable already existed in mdl.input_data,
-            it is replaced. If mdl.input_data was not empty before calling this function, the Time values of
-            mdl.input_data and those of input_df are combined by interpolation so that mdl.input_data contains
-            the same Time values for all variables
 
     :param mdl: A GreenLightInternal object to which model data will be added
-    :param input_df: A pandas DataFrame containing input data. Typically loaded from a CSV file with filename
-        input_df_name. The columns of the DataFrame are used as  variables names. If the DataFrame contains
-        non-numerical rows, the following assumptions are made:
-            If there is one non-numerical row, it is assumed to describe the units of the variables
-            If there are more than one non-numerical rows, it is assumed that the first row contains descriptions of
+    :param header_df: A pandas DataFrame whose columns are the names of the input variables, and whose rows are the
+        non-numerical rows of the input data (see _input_files.read_input_header). The following assumptions are made:
+            If there is one row, it is assumed to describe the units of the variables
+            If there are more than one rows, it is assumed that the first row contains descriptions of
             the variables, and that the second describes the units of the variables
-        The actual data will be loaded from the first row containing only numeric values.
-    :param input_df_name: The name of the file where input_df was loaded from. This is used to provide useful logs in
+    :param input_df_name: The name of the file where header_df was loaded from. This is used to provide useful logs in
         case the data overrides previously loaded model components.
     :return: None
     """
 
     issue_warnings = mdl.options["warn_loading"].strip().lower() == "true"
-
-    # Find the first numeric row in input_df
-    def is_numeric_row(row):
-        # Convert each element to a number; return True if all are numeric, else False
-        return row.apply(lambda x: pd.to_numeric(x, errors="coerce")).notna().all()
-
-    first_num_row = len(input_df)
-    for row_num in range(len(input_df)):
-        if is_numeric_row(input_df.iloc[row_num]):
-            first_num_row = row_num
-            break
+    first_num_row = len(header_df)
 
     def replace_attribute(attribute, row_index):
         if attribute == "unit":
-            if column in mdl.var_units and mdl.var_units[column] != input_df.loc[row_index, column]:
+            if column in mdl.var_units and mdl.var_units[column] != header_df.loc[row_index, column]:
                 mdl.add_to_log(
                     f"Replaced unit for input variable {column}:\n"
                     f"Previous unit: {mdl.var_units[column]}\n"
-                    f"New unit: {input_df.loc[row_index, column]}",
+                    f"New unit: {header_df.loc[row_index, column]}",
                     warn=issue_warnings,
                 )
-            mdl.var_units[column] = input_df.loc[row_index, column]
+            mdl.var_units[column] = header_df.loc[row_index, column]
         elif attribute == "description":
-            if column in mdl.var_descriptions and mdl.var_descriptions[column] != input_df.loc[row_index, column]:
+            if column in mdl.var_descriptions and mdl.var_descriptions[column] != header_df.loc[row_index, column]:
                 mdl.add_to_log(
                     f"Replaced description for input variable {column}: \n"
                     f"Previous description: {mdl.var_descriptions[column]}\n"
-                    f"New description: {input_df.loc[row_index, column]}",
+                    f"New description: {header_df.loc[row_index, column]}",
                     warn=issue_warnings,
                 )
-            mdl.var_descriptions[column] = input_df.loc[row_index, column]
+            mdl.var_descriptions[column] = header_df.loc[row_index, column]
 
-    for column in input_df:
+    for column in header_df:
         if column in mdl.variables:
             mdl.add_to_log(f"\nReplaced variable {column} by input values from {input_df_name}.", warn=issue_warnings)
         if column in mdl.states:
@@ -497,30 +662,70 @@ def _add_input_data(mdl: GreenLightInternal, input_df: pd.DataFrame, input_df_na
             replace_attribute("description", 0)
             replace_attribute("unit", 1)
 
-    numeric_input = input_df[first_num_row:]
-    numeric_input = numeric_input.apply(pd.to_numeric, errors="coerce")
-    numeric_input.reset_index(drop=True, inplace=True)
-
-    if "Time" not in numeric_input:
+    if "Time" not in header_df:
         mdl.add_to_log(
             f"No Time column in input file {input_df_name}. The data will not be used for simulation",
             warn=issue_warnings,
         )
 
+
+def _add_input_data(mdl: GreenLightInternal, numeric_input: pd.DataFrame, input_df_name: str) -> None:
+    """
+    Add input data to a GreenLightInternal object, after its variables were added by _add_input_variables.
+    The following attributes of mdl are modified:
+        mdl.input_data: Updated to include the data in numeric_input. If a variable already existed in mdl.input_data,
+            it is replaced. If mdl.input_data was not empty before calling this function, the Time values of
+            mdl.input_data and those of numeric_input are combined by interpolation so that mdl.input_data contains
+            the same Time values for all variables: those of mdl.input_data, or, if mdl.options["input_time_grid"] is
+            "union", those of both (see _utils.resample_columns)
+        mdl.input_time_step: The step size of mdl.input_data["Time"] if it is equally spaced, otherwise None
+
+    :param mdl: A GreenLightInternal object to which model data will be added
+    :param numeric_input: A pandas DataFrame containing the numeric input data, with the variable names as columns.
+        Typically loaded from a CSV file with filename input_df_name (see _input_files.read_input_file)
+    :param input_df_name: The name of the file where numeric_input was loaded from. This is used to provide useful
+        logs in case the data overrides previously loaded input data.
+    :return: None
+    """
+    issue_warnings = mdl.options["warn_loading"].strip().lower() == "true"
+
     if mdl.input_data.empty or "Time" not in mdl.input_data:
         # There's not any input data yet, or the existing data has no Time, it cannot be used, so just use the new data
         mdl.input_data = numeric_input
     elif "Time" in numeric_input:
-        # Both the new and the old data have Time values, interpolate the new values based on the existing Time
-        for col in numeric_input:
-            if col != "Time":
-                if col in mdl.input_data:
-                    mdl.add_to_log(
-                        f"\nReplaced existing input {col} by input values from {input_df_name}.", warn=issue_warnings
-                    )
-                if mdl.options["interpolation"] == "linear":
-                    mdl.input_data[col] = np.interp(mdl.input_data["Time"], numeric_input["Time"], numeric_input[col])
-                else:  # Default is "left"
-                    rows = mdl.input_data["Time"].searchsorted(numeric_input["Time"])
-                    rows = np.clip(rows, 0, mdl.input_data.shape[0] - 1)
-                    mdl.input_data[col] = numeric_input[rows, col].reset_index(drop=True)
+        # Both the new and the old data have Time values, resample the new values (all columns at once) to the Time
+        # values of the existing data. If options["input_time_grid"] is "union", the Time values of both are combined,
+        # and the existing data is resampled as well
+        linear = mdl.options["interpolation"] == "linear"
+        new_cols = [col for col in numeric_input if col != "Time"]
+        for col in new_cols:
+            if col in mdl.input_data:
+                mdl.add_to_log(
+                    f"\nReplaced existing input {col} by input values from {input_df_name}.", warn=issue_warnings
+                )
+
+        new_time = numeric_input["Time"].to_numpy(dtype=np.float64)
+        time = mdl.input_data["Time"].to_numpy(dtype=np.float64)
+        if mdl.options["input_time_grid"].strip().lower() == "union":
+            grid = np.union1d(time, new_time)
+            if len(grid) > len(time):
+                old_cols = [col for col in mdl.input_data if col != "Time"]
+                old_values = mdl.input_data[old_cols].to_numpy(dtype=np.float64)
+                mdl.input_data = pd.DataFrame(_utils.resample_columns(grid, time, old_values, linear), columns=old_cols)
+                mdl.input_data.insert(0, "Time", grid)
+                mdl.add_to_log(
+                    f"Time values of input data combined with those of {input_df_name}: "
+                    f"{len(time)} time points increased to {len(grid)}",
+                    warn=False,
+                )
+                time = grid
+
+        if new_cols:
+            new_values = numeric_input[new_cols].to_numpy(dtype=np.float64)
+            mdl.input_data[new_cols] = _utils.resample_columns(time, new_time, new_values, linear)
+
+    # If the time points of the input data are equally spaced, interpolation can use direct index arithmetic
+    if "Time" in mdl.input_data:
+        mdl.input_time_step = _utils.uniform_step(mdl.input_data["Time"])
+        if mdl.input_time_step is not None:
+            mdl.add_to_log(f"Input data is equally spaced with time step {mdl.input_time_step}", warn=False)
@@ -28,6 +28,7 @@ import numpy as np
 import pandas as pd
 
 from greenlight._greenlight_internal import GreenLightInternal
+from greenlight._load import _utils
 
 
 def save_sim(mdl: GreenLightInternal) -> None:
@@ -69,6 +70,20 @@ def save_sim(mdl: GreenLightInternal) -> None:
     interpolated_time_stamps = np.arange(time_stamps.iloc[0], time_stamps.iloc[-1], output_step)
     interpolated_sol = pd.DataFrame(columns=mdl.full_sol.columns)
 
+    # The rows of the solution are looked up once for all columns. If the solution is equally spaced in time
+    # (e.g., if options["t_eval"] was used), the rows are found by direct index arithmetic
+    sol_time = time_stamps.to_numpy(dtype=np.float64)
+    sol_step = _utils.uniform_step(sol_time)
+    value_cols = [col for col in mdl.full_sol.columns if col != "Time"]
+    value_col_index = {col: index for index, col in enumerate(value_cols)}
+    sol_values = mdl.full_sol[value_cols].to_numpy(dtype=np.float64)
+    if mdl.options["interpolation"] == "linear":
+        interpolated_values = _utils.interp_columns(interpolated_time_stamps, sol_time, sol_values, sol_step)
+    else:  # Default is "left"
+        rows = _utils.find_rows(sol_time, interpolated_time_stamps, sol_step) + 1
+        rows = np.clip(rows, 0, mdl.full_sol.shape[0] - 1)
+        interpolated_values = sol_values[rows]
+
     units_df = pd.DataFrame(columns=mdl.full_sol.columns, dtype="object")
     desc_df = pd.DataFrame(columns=mdl.full_sol.columns, dtype="object")
 
@@ -76,12 +91,7 @@ def save_sim(mdl: GreenLightInternal) -> None:
         if col == "Time":
             interpolated_sol[col] = interpolated_time_stamps
         else:
-            if mdl.options["interpolation"] == "linear":
-                interpolated_sol[col] = np.interp(interpolated_time_stamps, mdl.full_sol["Time"], mdl.full_sol[col])
-            else:  # Default is "left"
-                rows = mdl.full_sol["Time"].searchsorted(interpolated_time_stamps)
-                rows = np.clip(rows, 0, mdl.full_sol.shape[0] - 1)
-                interpolated_sol[col] = mdl.full_sol.loc[rows, col].reset_index(drop=True)
+            interpolated_sol[col] = interpolated_values[:, value_col_index[col]]
         if col in mdl.var_units:
             units_df.loc[0, col] = mdl.var_units[col]
         else:
@@ -119,7 +129,8 @@ def _create_model_dict(mdl: GreenLightInternal) -> dict:
         - Each key has a value that is a dict with the following keys and values:
             - "definition": The variable definition (mdl.variables[key] if it exists, otherwise "")
             - "formatted definition": The formatted variable definition (mdl.variables_formatted[key] if it exists,
-                otherwise "")
+                otherwise ""). If mdl.options["fold_constants"] is "True", this is the value of variables that were
+                evaluated while loading, e.g., constants
             - "type": The variable type ("function", "state", "input", "const", or "aux")
             - "unit": The variable unit (mdl.var_units[key] if it exists, otherwise "no unit defined")
             - "description": The variable description (mdl.var_descriptions[key] if it exists, otherwise "")
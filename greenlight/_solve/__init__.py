@@ -16,6 +16,10 @@ Modules:
     - _solve_ivp: Defines the class SolveIvp which inherits Solve and solves using scipy.integrate.solve_ivp
     - _solve_ivp_from_str: Defines class SolveIvpFromStr which inherits Solve and solves by defining a new
         Python function and then uses scipy.integrate.solve_ivp
+    - _scalar_code: Functions for converting model commands to commands operating on Python floats
+    - _input_interpolator: Defines the class InputInterpolator for reading input data at the solver's time points
+    - _trajectory_recorder: Defines the class TrajectoryRecorder for recording model variables during solving
+    - _jac_sparsity: Functions for finding the sparsity pattern of the Jacobian of the model ODEs
 """
 
 from .core import solve_model
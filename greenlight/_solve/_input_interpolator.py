@@ -0,0 +1,156 @@
+"""
+GreenLight/greenlight/_solve/_input_interpolator.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+Defines the class InputInterpolator, used for reading model input data at the time points requested by the solver.
+The data is held in contiguous float64 arrays. Since solvers typically request time points which are close to each
+other, the interpolator remembers the last interval it used, so that a request in the same or the next interval is
+resolved without searching the data. If the time points of the data are equally spaced, the interval is found by
+direct index arithmetic. Results are written into a preallocated buffer.
+Memory-mapped data (see greenlight._load._input_files.read_input_array) is used in place rather than copied, so that
+only the rows around the requested time points are read from disk.
+
+Public functions:
+    InputInterpolator(
+        time: numpy.ndarray, values: numpy.ndarray, mode: str = "linear", columns: list = None, step: float = None
+    )
+        Create an interpolator for values given at time points time
+    InputInterpolator.__call__(t: float) -> numpy.ndarray
+        Interpolate all columns of the data at time t
+
+External dependencies:
+    - numpy: for storing and interpolating the data
+"""
+
+import math
+import mmap
+from bisect import bisect_left
+from typing import List, Optional
+
+import numpy as np
+
+
+class InputInterpolator:
+    def __init__(
+        self,
+        time: np.ndarray,
+        values: np.ndarray,
+        mode: str = "linear",
+        columns: Optional[List[str]] = None,
+        step: Optional[float] = None,
+    ):
+        """
+        Create an interpolator for data given at the time points time
+
+        :param time: 1D array of increasing time points
+        :param values: 2D array with one row per time point, and one column per input variable
+        :param mode: Interpolation mode. If "linear", use linear interpolation, as numpy.interp for each column
+                     (except exactly at repeated time points, where the value of the first of them is used).
+                     Otherwise, "left" interpolation is used: the values at the last time point before t (strictly
+                     smaller than t) are returned.
+                     In both cases, if t is outside the range of time, the nearest values are used.
+        :param columns: Optional names of the columns of values, stored as self.columns
+        :param step: The step size of time, if it is equally spaced (see greenlight._load._utils.uniform_step),
+                     otherwise None
+        """
+        self.mapped = _is_memory_mapped(values)
+        if self.mapped:  # Use the data in place, nothing is computed for all time points in advance
+            self.time = np.asarray(time, dtype=np.float64)
+            self.values = np.asarray(values, dtype=np.float64).reshape(len(self.time), -1)
+        else:
+            self.time = np.ascontiguousarray(time, dtype=np.float64)
+            self.values = np.ascontiguousarray(values, dtype=np.float64).reshape(len(self.time), -1)
+        self.linear = mode == "linear"
+        self.columns = columns
+        self.buffer = np.empty(self.values.shape[1])
+
+        # Comparing Python floats is faster than indexing a NumPy array
+        self._time_list = self.time if self.mapped else self.time.tolist()
+        self._n = len(self._time_list)
+        self._hint = 0  # Index j of the last interval used, with time[j] < t <= time[j+1]
+        self._step = step
+        self._slopes = None
+        self._slopes_row = -1  # For memory-mapped data, the interval of the slopes in self._row_slopes
+        self._row_slopes = np.empty(self.values.shape[1])
+        if self.linear and self._n > 1 and not self.mapped:
+            with np.errstate(divide="ignore", invalid="ignore"):  # Repeated time points are never used for slopes
+                self._slopes = np.diff(self.values, axis=0) / np.diff(self.time)[:, np.newaxis]
+
+    def _interval(self, t: float) -> int:
+        """
+        Find the index j such that time[j] < t <= time[j+1]. Returns -1 if t <= time[0] and n-1 if t > time[-1]
+        (where n is the number of time points)
+
+        :param t: Time point
+        :return: Index of the interval containing t
+        """
+        time = self._time_list
+        if self._step is not None:
+            # Equally spaced time points: compute the interval, and correct it in case of small deviations in the data
+            j = min(max(math.ceil((t - time[0]) / self._step) - 1, -1), self._n - 1)
+            if j + 1 < self._n and time[j + 1] < t:
+                j = j + 1
+            elif j >= 0 and time[j] >= t:
+                j = j - 1
+            return j
+
+        j = self._hint
+        if time[j] < t <= time[j + 1]:
+            return j
+        if j + 2 < self._n and time[j + 1] < t <= time[j + 2]:
+            self._hint = j + 1
+            return j + 1
+        j = bisect_left(time, t) - 1
+        self._hint = min(max(j, 0), self._n - 2)
+        return j
+
+    def _interval_slopes(self, j: int) -> np.ndarray:
+        """
+        Compute the slopes of all columns in the interval time[j] < t <= time[j+1], used for memory-mapped data instead
+        of computing the slopes of all intervals in advance. The slopes of the last interval are kept, since solvers
+        typically request several time points in the same interval
+
+        :param j: Index of the interval
+        :return: 1D array with the slopes of all columns in the interval
+        """
+        if j != self._slopes_row:
+            np.subtract(self.values[j + 1], self.values[j], out=self._row_slopes)
+            self._row_slopes /= self._time_list[j + 1] - self._time_list[j]
+            self._slopes_row = j
+        return self._row_slopes
+
+    def __call__(self, t: float) -> np.ndarray:
+        """
+        Interpolate all columns of the data at time t. The result is written into self.buffer, which is returned.
+        The buffer is overwritten by the next call, copy it if the values need to be kept
+
+        :param t: Time point
+        :return: 1D array with the values of all columns at time t
+        """
+        if self._n == 1:
+            self.buffer[:] = self.values[0]
+            return self.buffer
+
+        j = self._interval(t)
+        if j < 0:
+            self.buffer[:] = self.values[0]
+        elif j >= self._n - 1:
+            self.buffer[:] = self.values[-1]
+        elif self.linear:
+            slopes = self._interval_slopes(j) if self._slopes is None else self._slopes[j]
+            np.multiply(slopes, t - self._time_list[j], out=self.buffer)
+            self.buffer += self.values[j]
+        else:
+            self.buffer[:] = self.values[j]
+        return self.buffer
+
+
+def _is_memory_mapped(array) -> bool:
+    """Check if array is a view of a memory-mapped file, e.g., a numpy.memmap or an array created from one"""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, "base", None)
+    return False
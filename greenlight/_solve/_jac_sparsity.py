@@ -0,0 +1,120 @@
+"""
+GreenLight/greenlight/_solve/_jac_sparsity.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+Functions for describing the structure (sparsity pattern) of the Jacobian of the ODEs defined in a GreenLightInternal
+instance. Implicit solvers (BDF, Radau, LSODA) approximate the Jacobian by finite differences. If the sparsity pattern
+is known, columns of the Jacobian that do not share any rows can be perturbed together, so that a full Jacobian costs
+one ODE function evaluation per group of columns instead of one evaluation per state.
+
+Public functions:
+    jac_sparsity(mdl: GreenLightInternal) -> scipy.sparse.csc_matrix
+        Create the sparsity pattern of the Jacobian of the ODEs of mdl
+    column_groups(sparsity: scipy.sparse.csc_matrix) -> numpy.ndarray
+        Greedily group the columns of a sparsity pattern so that columns in the same group share no rows
+    sparsity_solver_options(mdl: GreenLightInternal) -> dict
+        Create the keyword arguments passing the sparsity pattern of mdl to scipy.integrate.solve_ivp
+
+External dependencies:
+    - numpy: for working with numerical arrays
+    - scipy: for representing sparse matrices
+"""
+
+import numpy as np
+from scipy.sparse import csc_matrix
+
+from greenlight._greenlight_internal import GreenLightInternal
+from greenlight._load._utils import find_state_dependencies
+
+
+def jac_sparsity(mdl: GreenLightInternal) -> csc_matrix:
+    """
+    Create the sparsity pattern of the Jacobian of the ODEs of mdl. Element [i, j] is nonzero if the derivative of
+    the i-th state in mdl.states depends, directly or through auxiliary states, on the j-th state.
+    The diagonal is always included, as required by the implicit solvers.
+
+    :param mdl: A GreenLightInternal instance with a loaded model (see greenlight._load.load_model)
+    :return: A sparse matrix of shape (len(mdl.states), len(mdl.states)) with ones in the nonzero elements
+    """
+    state_index = {state: i for i, state in enumerate(mdl.states)}
+    state_deps = find_state_dependencies(mdl.variables_formatted, state_index.keys(), mdl.dependencies)
+
+    rows = []
+    cols = []
+    for state, i in state_index.items():
+        for dep in state_deps[state] | {state}:
+            rows.append(i)
+            cols.append(state_index[dep])
+
+    return csc_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(state_index), len(state_index)))
+
+
+def column_groups(sparsity: csc_matrix) -> np.ndarray:
+    """
+    Greedily group the columns of a sparsity pattern so that no two columns in the same group have a nonzero in the
+    same row. All columns in a group can be perturbed together when approximating the Jacobian by finite differences.
+
+    :param sparsity: A sparse matrix describing a sparsity pattern, e.g., as created by jac_sparsity
+    :return: An array with one element per column, holding the index of the group of the column
+    """
+    dense = sparsity.toarray() != 0
+    groups = np.empty(dense.shape[1], dtype=int)
+    group_rows = []  # For each group, the rows that are already occupied by its columns
+
+    for col in range(dense.shape[1]):
+        for group, occupied in enumerate(group_rows):
+            if not np.any(occupied & dense[:, col]):
+                occupied |= dense[:, col]
+                groups[col] = group
+                break
+        else:  # No existing group fits this column, create a new group
+            group_rows.append(dense[:, col].copy())
+            groups[col] = len(group_rows) - 1
+
+    return groups
+
+
+def sparsity_solver_options(mdl: GreenLightInternal) -> dict:
+    """
+    Create the keyword arguments for scipy.integrate.solve_ivp that describe the sparsity pattern of the Jacobian of
+    mdl, depending on the solver in mdl.options["solver"]:
+        - "BDF" and "Radau": the sparsity pattern is passed as jac_sparsity
+        - "LSODA": LSODA does not accept a sparsity pattern, but it accepts a banded structure. The lower and upper
+            bandwidths of the pattern are passed as lband and uband, if they are narrower than the full matrix
+        - Other (explicit) solvers do not use a Jacobian, an empty dict is returned
+    If mdl.options["jac_sparsity"] is not "true" (case insensitive), an empty dict is returned.
+    Statistics of the sparsity pattern and its column grouping are added to mdl.log
+
+    :param mdl: A GreenLightInternal instance with a loaded model (see greenlight._load.load_model)
+    :return: A dict of keyword arguments to be passed to scipy.integrate.solve_ivp
+    """
+    solver = mdl.options["solver"]
+    if mdl.options["jac_sparsity"].strip().lower() != "true" or solver not in ["BDF", "Radau", "LSODA"]:
+        return {}
+
+    sparsity = jac_sparsity(mdl)
+    n_states = sparsity.shape[0]
+    if n_states == 0:
+        return {}
+    n_groups = int(column_groups(sparsity).max()) + 1
+    mdl.add_to_log(
+        f"Jacobian sparsity pattern: {n_states} states, {sparsity.nnz} nonzero elements "
+        f"({100 * sparsity.nnz / n_states**2:.1f}% dense). "
+        f"Columns grouped into {n_groups} groups: a finite difference Jacobian requires {n_groups} "
+        f"function evaluations instead of {n_states}",
+        warn=False,
+    )
+
+    if solver == "LSODA":
+        rows, cols = sparsity.nonzero()
+        lband = int(max(np.max(rows - cols), 0))
+        uband = int(max(np.max(cols - rows), 0))
+        if lband + uband + 1 >= n_states:
+            mdl.add_to_log("Jacobian is not banded, sparsity pattern not passed to LSODA", warn=False)
+            return {}
+        mdl.add_to_log(f"Jacobian passed to LSODA as banded: lband={lband}, uband={uband}", warn=False)
+        return {"lband": lband, "uband": uband}
+
+    return {"jac_sparsity": sparsity}
@@ -0,0 +1,217 @@
+"""
+GreenLight/greenlight/_solve/_scalar_code.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+Functions for converting model commands (see greenlight._load._utils.expressions_to_dy_str), which operate on the
+NumPy arrays y, a, d, dy, and p, into commands which operate on plain Python floats.
+Evaluating NumPy functions (e.g., np.exp) on single numbers, and reading single elements of NumPy arrays, is
+considerably slower than using the math package on Python floats. The converted commands are therefore used for
+evaluating the ODEs for a single state vector, see mdl.options["rhs_mode"] in docs/simulation_options.md
+
+The converted commands use local variables instead of array elements: y[i] becomes y_i, a[i] becomes a_i, etc.
+NumPy functions are replaced by functions from the math package, or by the functions in SCALAR_FUNCTIONS.
+As opposed to NumPy, these raise an exception (ArithmeticError, ValueError) for invalid operations such as
+division by zero or the logarithm of a negative number. The caller is expected to fall back to the NumPy version
+of the commands in this case.
+
+Public functions:
+    scalar_commands(commands: list[str]) -> tuple[list[str], list[str]]
+        Convert model commands operating on NumPy arrays into commands operating on Python floats
+
+Public attributes:
+    SCALAR_FUNCTIONS: dict
+        Functions used by the converted commands, which should be available in the namespace where they are executed
+
+External dependencies:
+    - None
+"""
+
+import ast
+import math
+
+# Array names in the model commands which are converted to local variables
+_ARRAYS = ("y", "a", "d", "dy", "p")
+
+# NumPy functions, and the functions from the math package that replace them
+_MATH_FUNCTIONS = {
+    "exp": "exp",
+    "expm1": "expm1",
+    "log": "log",
+    "log10": "log10",
+    "log2": "log2",
+    "log1p": "log1p",
+    "sqrt": "sqrt",
+    "sin": "sin",
+    "cos": "cos",
+    "tan": "tan",
+    "arcsin": "asin",
+    "arccos": "acos",
+    "arctan": "atan",
+    "arctan2": "atan2",
+    "sinh": "sinh",
+    "cosh": "cosh",
+    "tanh": "tanh",
+    "arcsinh": "asinh",
+    "arccosh": "acosh",
+    "arctanh": "atanh",
+    "floor": "floor",
+    "ceil": "ceil",
+    "fabs": "fabs",
+    "radians": "radians",
+    "degrees": "degrees",
+    "hypot": "hypot",
+    "power": "pow",
+}
+
+
+def _maximum(x1, x2):
+    return x1 if (x1 >= x2 or x1 != x1) else x2  # NaN propagates, as with np.maximum
+
+
+def _minimum(x1, x2):
+    return x1 if (x1 <= x2 or x1 != x1) else x2  # NaN propagates, as with np.minimum
+
+
+def _where(condition, x, y):
+    return x if condition else y
+
+
+def _sign(x):
+    return (x > 0) - (x < 0) if x == x else x
+
+
+def _mod(x1, x2):
+    return x1 % x2
+
+
+def _logical_and(x1, x2):
+    return bool(x1) and bool(x2)
+
+
+def _logical_or(x1, x2):
+    return bool(x1) or bool(x2)
+
+
+def _logical_not(x):
+    return not x
+
+
+# NumPy functions without an equivalent in the math package, and the functions that replace them
+SCALAR_FUNCTIONS = {
+    "_maximum": _maximum,
+    "_minimum": _minimum,
+    "_where": _where,
+    "_sign": _sign,
+    "_mod": _mod,
+    "_logical_and": _logical_and,
+    "_logical_or": _logical_or,
+    "_logical_not": _logical_not,
+    "_abs": abs,
+    "math": math,
+}
+
+_SCALAR_NAMES = {
+    "maximum": "_maximum",
+    "minimum": "_minimum",
+    "where": "_where",
+    "sign": "_sign",
+    "mod": "_mod",
+    "remainder": "_mod",
+    "logical_and": "_logical_and",
+    "logical_or": "_logical_or",
+    "logical_not": "_logical_not",
+    "abs": "_abs",
+    "absolute": "_abs",
+}
+
+
+class _ScalarTransformer(ast.NodeTransformer):
+    """
+    Convert an expression operating on NumPy arrays to one operating on local Python floats.
+    Array names which are read before they are assigned are collected in self.read_before_assigned
+    """
+
+    def __init__(self, assigned: set):
+        self.assigned = assigned
+        self.read_before_assigned = []
+
+    def visit_Subscript(self, node):
+        if (
+            isinstance(node.value, ast.Name)
+            and node.value.id in _ARRAYS
+            and isinstance(node.slice, ast.Constant)
+            and isinstance(node.slice.value, int)
+        ):
+            name = f"{node.value.id}_{node.slice.value}"
+            if isinstance(node.ctx, ast.Load) and node.value.id in ("a", "dy") and name not in self.assigned:
+                self.read_before_assigned.append(name)
+            return ast.copy_location(ast.Name(id=name, ctx=node.ctx), node)
+        return self.generic_visit(node)
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        func = node.func
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in ("np", "math"):
+            if func.attr in _SCALAR_NAMES:
+                node.func = ast.Name(id=_SCALAR_NAMES[func.attr], ctx=ast.Load())
+            elif func.attr in _MATH_FUNCTIONS:
+                node.func = ast.Attribute(value=ast.Name(id="math", ctx=ast.Load()), attr=_MATH_FUNCTIONS[func.attr])
+            # Other functions are kept as they are, and work on Python floats as well
+        return node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            exponent = node.right
+            if isinstance(exponent, ast.UnaryOp) and isinstance(exponent.op, (ast.USub, ast.UAdd)):
+                exponent = exponent.operand
+            if isinstance(exponent, ast.Constant) and float(exponent.value).is_integer():
+                return node  # Integer powers of floats are always real
+            # A negative number to a fractional power is a complex number in Python, math.pow raises an error instead
+            return ast.copy_location(
+                ast.Call(
+                    func=ast.Attribute(value=ast.Name(id="math", ctx=ast.Load()), attr="pow"),
+                    args=[node.left, node.right],
+                    keywords=[],
+                ),
+                node,
+            )
+        return node
+
+
+def scalar_commands(commands: list[str]) -> tuple[list[str], list[str]]:
+    """
+    Convert model commands operating on NumPy arrays into commands operating on Python floats.
+    Elements of the arrays y, a, d, dy, and p (e.g., a[3]) are replaced by local variables (a_3), and NumPy functions are
+    replaced by their scalar equivalents, see the module docstring.
+
+    In the NumPy version of the commands, a and dy are arrays of zeros before the commands are executed. Elements which
+    are read before they are assigned therefore need to be initialized, these initializations are returned separately.
+
+    Example:
+        >>> scalar_commands(["a[0] = np.exp(y[0]) * a[1]", "a[1] = d[1]", "dy[0] = a[0]**0.5"])
+        (['a_1 = 0.0'], ['a_0 = math.exp(y_0) * a_1', 'a_1 = d_1', 'dy_0 = math.pow(a_0, 0.5)'])
+
+    :param commands: Python commands in the form of greenlight._load._utils.expressions_to_dy_str
+    :return: A tuple of two lists of Python commands: initializations of local variables, and the converted commands
+    """
+    assigned = set()
+    initializations = []
+    converted = []
+    for command in commands:
+        tree = ast.parse(command)
+        transformer = _ScalarTransformer(assigned)
+        tree = transformer.visit(tree)
+        for name in transformer.read_before_assigned:
+            if name not in assigned:
+                initializations.append(f"{name} = 0.0")
+                assigned.add(name)
+        for statement in tree.body:
+            if isinstance(statement, ast.Assign):
+                for target in statement.targets:
+                    if isinstance(target, ast.Name):
+                        assigned.add(target.id)
+        converted.append(ast.unparse(ast.fix_missing_locations(tree)))
+    return initializations, converted
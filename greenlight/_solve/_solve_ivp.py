@@ -11,20 +11,27 @@ This class is used for solving a GreenLightInternal mdl if mdl.options["solving_
 Public functions:
     SolveIvp._solve(mdl: GreenLightInternal) -> None:
         Implements greenlight._solve._solver.Solve using scipy.integrate.solve_ivp
+    SolveIvp._compile(mdl: GreenLightInternal, config: SolverConfig) -> Tuple[list, list]:
+        Compile the expressions of the model variables once, before solving
 """
 
 import logging
 import sys
 import warnings
-from typing import Tuple
+from types import CodeType
+from typing import List, Tuple, Union
 
 import numexpr as ne
 import numpy as np
 from scipy.integrate import solve_ivp
 
 from greenlight._greenlight_internal import GreenLightInternal
+from greenlight._load._utils import columns_array
 
-from ._solver import Solver
+from ._input_interpolator import InputInterpolator
+from ._jac_sparsity import sparsity_solver_options
+from ._solver import Solver, SolverConfig
+from ._trajectory_recorder import TrajectoryRecorder
 
 
 class SolveIvp(Solver):
@@ -42,6 +49,9 @@ class SolveIvp(Solver):
         warnings if large numbers are clipped (if mdl.options["clip_large_nums"] is "True") and if NaNs are replaced
         by zeros (if mdl.options["nans_to_zeros"] is "True").
 
+        The options in mdl.options are resolved into a SolverConfig, and the model expressions are compiled,
+        once before solving. The ODE function called by the solver at each time step then only evaluates them.
+
         Note: it has been found that in some cases, some RuntimeWarnings are not caught by this solver, and therefore
         not added to the simulation log. Switching solver from "BDF" to "LSODA" seems to help with this.
 
@@ -51,13 +61,15 @@ class SolveIvp(Solver):
         :raise: An Exception if the interpretation of a variable failed
         :return: None
         """
+        config = SolverConfig.from_options(mdl.options)
+
         # Workspace where computations occur
         computation_space = {}
 
         # Import required packages to computation_space
-        if mdl.options["formatting_mode"] == "numpy":
+        if config.formatting_mode == "numpy":
             exec("import numpy as np", computation_space)
-        if mdl.options["formatting_mode"] == "math":
+        if config.formatting_mode == "math":
             exec("import math", computation_space)
 
         # load the initial values
@@ -70,29 +82,29 @@ class SolveIvp(Solver):
             for key in mdl.functions.keys():
                 exec(f"def {key}: return {mdl.variables_formatted[key]}", computation_space)
 
-        # Set up the arguments for solve_ivp
-
-        # If mdl.options["t_eval"] is "None", use None. Otherwise, use time points from mdl.options["t_start"]
-        # to mdl.options["t_end"], with steps mdl.options["output_step"]
-        if mdl.options["t_eval"] == "None":
-            t_eval = None
-        else:
-            t_eval = np.arange(
-                float(mdl.options["t_start"]), float(mdl.options["t_end"]), float(mdl.options["output_step"])
-            )
+        # Compile the model expressions
+        aux_code, states_code = SolveIvp._compile(mdl, config)
+
+        # Interpolator of the input data
+        # All columns are used in their order, so memory-mapped input data is not copied
+        input_array = columns_array(mdl.input_data, mdl.input_data.columns)
+        interpolator = InputInterpolator(
+            input_array[:, 0],
+            input_array,
+            config.interpolation,
+            list(mdl.input_data.columns),
+            mdl.input_time_step,
+        )
 
-        # If mdl.options["first_step"] was defined as a number, use that one, if not, use None
-        try:
-            first_step = float(mdl.options["first_step"])
-        except ValueError:  # string could not be converted to float
-            first_step = None
+        # Recorder of the values of all model variables, converted to mdl.full_sol after solving
+        recorder = TrajectoryRecorder(mdl.full_sol.columns)
 
         warning_log = []
 
         # Create a function wrapper which includes the ODEs but also logs warnings
         # Note: some warnings raised will not be caught and logged, this is a limitation of solve_ivp
         def warn_logging_wrapper(fun):
-            issue_warnings = mdl.options["warn_runtime"].strip().lower() == "true"
+            issue_warnings = config.warn_runtime
 
             def wrapped(t, y, *args):
                 with np.errstate(all="warn"):  # Try to force NumPy to issue warnings
@@ -120,28 +132,67 @@ class SolveIvp(Solver):
         # Solve the ODEs, catching and logging warnings in the process
         sol = solve_ivp(
             wrapped_ode,
-            [float(mdl.options["t_start"]), float(mdl.options["t_end"])],
-            y0,
-            mdl.options["solver"],
-            t_eval=t_eval,
-            first_step=first_step,
-            max_step=float(mdl.options["max_step"]),
-            atol=float(mdl.options["atol"]),
-            rtol=float(mdl.options["rtol"]),
-            args=[mdl, computation_space, [float(mdl.options["t_start"]), float(mdl.options["t_end"])]],
+            y0=y0,
+            **config.solve_ivp_kwargs(),
+            **sparsity_solver_options(mdl),
+            args=[mdl, computation_space, interpolator, aux_code, states_code, recorder, config],
         )
 
-        if mdl.options["log_runtime_warnings"].strip().lower() == "true":
+        if config.log_runtime_warnings:
             # Add the logged warnings to mdl
             mdl.add_to_log("\n".join(set(warning_log)), warn=False)
 
         mdl.states_sol = sol
-        if "Time" in mdl.full_sol:
-            mdl.full_sol = mdl.full_sol.sort_values(by="Time")
+        if not config.expand_variables:
+            mdl.full_sol = recorder.to_dataframe()
+
+    @staticmethod
+    def _compile(
+        mdl: GreenLightInternal, config: SolverConfig
+    ) -> Tuple[List[Tuple[str, Union[CodeType, str]]], List[Tuple[str, Union[CodeType, str]]]]:
+        """
+        Compile the expressions of the variables of mdl that need to be calculated at every time step.
+        If config.formatting_mode is "numexpr", the expressions are kept as strings, which numexpr compiles and caches
+        on their first evaluation. Otherwise, they are compiled to Python code objects which can be passed to eval.
+
+        :param mdl: A GreenLightInternal instance which contains model definitions and is ready to be solved
+        :param config: The solver configuration, see SolverConfig
+        :raise: An Exception if the compilation of a variable failed
+        :return: Two lists of (variable name, compiled expression) tuples:
+            - The auxiliary states to calculate, in solving order. Empty if config.expand_variables is True
+            - The model states, in the order of mdl.states
+        """
+
+        def compile_var(var_name: str) -> Union[CodeType, str]:
+            expression = mdl.variables_formatted[var_name]
+            if config.formatting_mode == "numexpr":
+                return expression
+            try:
+                return compile(expression, "<string>", "eval")
+            except Exception:
+                logger = logging.getLogger(__name__)
+                logger.error("Failed to interpret definition for %r: %r" % (var_name, expression))
+                raise
+
+        aux_code = []
+        if not config.expand_variables:
+            skip = mdl.states.keys() | mdl.input_data.columns
+            aux_code = [(var_name, compile_var(var_name)) for var_name in mdl.solving_order if var_name not in skip]
+        states_code = [(var_name, compile_var(var_name)) for var_name in mdl.states]
+
+        return aux_code, states_code
 
     @staticmethod
     def _differentiate(
-        t: float, y: np.ndarray, mdl: GreenLightInternal, computation_space: dict, t_span: Tuple[float, float]
+        t: float,
+        y: np.ndarray,
+        mdl: GreenLightInternal,
+        computation_space: dict,
+        interpolator: InputInterpolator,
+        aux_code: List[Tuple[str, Union[CodeType, str]]],
+        states_code: List[Tuple[str, Union[CodeType, str]]],
+        recorder: TrajectoryRecorder,
+        config: SolverConfig,
     ) -> np.ndarray:
         """
         Differential equation for the GreenLightInternal mdl. Given a time t and a vector of state values y,
@@ -149,130 +200,100 @@ class SolveIvp(Solver):
         scipy.integrate.solve_ivp
 
         If mdl.options["expand_variables"] is "false", all model variables are directly calculated.
-        Their values are stored in a pandas DataFrame as mdl.full_sol. This DataFrame is not sorted by time.
+        Their values at time t are recorded in recorder, which holds a column for each column of mdl.full_sol.
 
         The following attributes of mdl are modified:
-            - mdl.full_sol: If mdl.options["expand_variables"].strip().lower() == "false", a row is added to mdl.full_sol.
-                containing the values of all model variables (all values in mdl.solving_order) at time t
             - mdl.log: Modified to include numerical corrections performed: clipping of large values or replacing NaNs
 
         :param t: Time point in the simulation
         :param y: Value of the state vectors at time t
-        :param mdl: GreenLightInternal instance describing the definitions of the states y, with mdl.options containing options for
-                    differentiation
+        :param mdl: GreenLightInternal instance describing the definitions of the states y
         :param computation_space: dict of local variables where computation occurs (used as local_dict argument for exec)
-        :param t_span: A list of two floats, the start time and end time of the full simulation.
-                        Used to display the progress in solving
+        :param interpolator: Interpolator of mdl.input_data, with the column names of mdl.input_data
+        :param aux_code: The compiled expressions of the auxiliary states, see SolveIvp._compile
+        :param states_code: The compiled expressions of the states, see SolveIvp._compile
+        :param recorder: Recorder of the values of all model variables. If mdl.options["expand_variables"] is "false",
+                        the values at time t are recorded, replacing previously recorded values at time t
+        :param config: The options for differentiation, see SolverConfig. config.t_span is used to display
+                        the progress in solving
         :return dy: The rate of change of the states y at time point t
         """
         # Get data from input data array
-        if mdl.options["interpolation"] == "linear":  # Use linear interpolation
-            # Multi-column version of np.interp
-            # Based on answer of user Daniel F on stackoverflow
-            # https://stackoverflow.com/questions/43772218/fastest-way-to-use-numpy-interp-on-a-2-d-array/43775224#43775224
-            input_row = (mdl.input_data[mdl.input_data.columns[0]]).searchsorted(t) - 1
-            if input_row <= 0:
-                interp_row = mdl.input_data.iloc[0]
-            elif input_row >= mdl.input_data.shape[0] - 1:
-                interp_row = mdl.input_data.iloc[-1]
-            else:
-                delta = (t - mdl.input_data.iloc[input_row, 0]) / (
-                    mdl.input_data.iloc[input_row + 1, 0] - mdl.input_data.iloc[input_row, 0]
-                )
-                interp_row = (1 - delta) * mdl.input_data.iloc[input_row] + delta * mdl.input_data.iloc[input_row + 1]
-            computation_space = computation_space | interp_row.to_dict()
-        else:  # Default value is "left", find the nearest value to the left
-            input_row = (mdl.input_data[mdl.input_data.columns[0]]).searchsorted(t) - 1
-            input_row = np.clip(input_row, 0, mdl.input_data.shape[0] - 1)
-            computation_space = computation_space | mdl.input_data.loc[input_row].to_dict()
+        computation_space.update(zip(interpolator.columns, interpolator(t).tolist()))
 
         # Load state values from y
-        for i, (var_name, value) in enumerate(mdl.states.items()):
-            if mdl.options["clip_large_nums"].strip().lower() == "true":
-                y[i] = np.clip(y[i], -1e38, 1e38)
-
+        if config.clip_large_nums:
+            y = np.clip(y, -1e38, 1e38)
+        for i, var_name in enumerate(mdl.states):
             computation_space[var_name] = y[i]
 
-        # If variables were not expanded, calculate them and add them to mdl.full_sol
-        if mdl.options["expand_variables"].strip().lower() == "false":
-            for var_name in mdl.solving_order:
-                if var_name not in mdl.states.keys() | mdl.input_data.columns:
-                    expression = mdl.variables_formatted[var_name]
-                    try:
-                        logger = logging.getLogger(__name__)
-                        if mdl.options["formatting_mode"] == "numexpr":
-                            computation_space[var_name] = ne.evaluate(
-                                expression,
-                                local_dict=computation_space,
-                            )
-                        else:
-                            exec(compile(var_name + " = " + expression, "<string>", "exec"), computation_space)
-                    except Exception:
-                        logger.error(
-                            "Failed to interpret definition for %r: %r"
-                            % (
-                                var_name,
-                                mdl.variables_formatted[var_name],
-                            )
+        issue_warnings = config.warn_runtime
+
+        # If variables were not expanded, calculate them and record them
+        if not config.expand_variables:
+            for var_name, code in aux_code:
+                try:
+                    if config.formatting_mode == "numexpr":
+                        computation_space[var_name] = ne.evaluate(code, local_dict=computation_space)
+                    else:
+                        computation_space[var_name] = eval(code, computation_space)
+                except Exception:
+                    logger = logging.getLogger(__name__)
+                    logger.error(
+                        "Failed to interpret definition for %r: %r"
+                        % (
+                            var_name,
+                            mdl.variables_formatted[var_name],
+                        )
+                    )
+                    raise
+
+                # Replaces NaNs and infs by calculable values
+                # This helps the solver continue working and reduces computational errors
+                if config.nans_to_zeros:
+                    if np.isnan(computation_space[var_name]):
+                        mdl.add_to_log(f"{var_name} is NaN at time {t}; replaced with 0", warn=issue_warnings)
+                        computation_space[var_name] = 0
+                    elif np.isposinf(computation_space[var_name]):
+                        mdl.add_to_log(f"{var_name} is +inf at time {t}; replaced with 1e38", warn=issue_warnings)
+                        computation_space[var_name] = 1e38
+                    elif np.isneginf(computation_space[var_name]):
+                        mdl.add_to_log(f"{var_name} is -inf at time {t}; replaced with -1e38", warn=issue_warnings)
+                        computation_space[var_name] = -1e38
+
+                # Replace large values with values within the range -1e38 to 1e38
+                # This helps the solver continue working and reduces computational errors
+                if config.clip_large_nums:
+                    if computation_space[var_name] > 1e38:
+                        mdl.add_to_log(
+                            f"{var_name} is greater than 1e38 at time {t}; replaced with 1e38", warn=issue_warnings
+                        )
+                        computation_space[var_name] = 1e38
+                    if computation_space[var_name] < -1e38:
+                        mdl.add_to_log(
+                            f"{var_name} is smaller than -1e38 at time {t}; replaced with -1e38",
+                            warn=issue_warnings,
                         )
-                        raise
-
-                    # Replaces NaNs and infs by calculable values
-                    # This helps the solver continue working and reduces computational errors
-                    issue_warnings = mdl.options["warn_runtime"].strip().lower() == "true"
-                    if mdl.options["nans_to_zeros"].strip().lower() == "true":
-                        if np.isnan(computation_space[var_name]):
-                            mdl.add_to_log(f"{var_name} is NaN at time {t}; replaced with 0", warn=issue_warnings)
-                            computation_space[var_name] = 0
-                        elif np.isposinf(computation_space[var_name]):
-                            mdl.add_to_log(f"{var_name} is +inf at time {t}; replaced with 1e38", warn=issue_warnings)
-                            computation_space[var_name] = 1e38
-                        elif np.isneginf(computation_space[var_name]):
-                            mdl.add_to_log(f"{var_name} is -inf at time {t}; replaced with -1e38", warn=issue_warnings)
-                            computation_space[var_name] = -1e38
-
-                    # Replace large values with values within the range -1e38 to 1e38
-                    # This helps the solver continue working and reduces computational errors
-                    if mdl.options["clip_large_nums"].strip().lower() == "true":
-                        if computation_space[var_name] > 1e38:
-                            mdl.add_to_log(
-                                f"{var_name} is greater than 1e38 at time {t}; replaced with 1e38", warn=issue_warnings
-                            )
-                            computation_space[var_name] = 1e38
-                        if computation_space[var_name] < -1e38:
-                            mdl.add_to_log(
-                                f"{var_name} is smaller than -1e38 at time {t}; replaced with -1e38",
-                                warn=issue_warnings,
-                            )
-                            computation_space[var_name] = -1e38
-
-            sol_t = np.empty(len(mdl.full_sol.columns))  # the solution at time point t
-            for i, col_name in enumerate(mdl.full_sol.columns):
+                        computation_space[var_name] = -1e38
+
+            sol_t = np.empty(len(recorder.columns))  # the solution at time point t
+            for i, col_name in enumerate(recorder.columns):
                 if col_name == "Time":
                     sol_t[i] = t
                 else:
                     sol_t[i] = computation_space[col_name]
-
-            row = mdl.full_sol.index[mdl.full_sol["Time"] == t].tolist()
-            if row:  # the time t has been computed before, replace it
-                mdl.full_sol.loc[row[0]] = sol_t
-            else:  # add a new row
-                mdl.full_sol.loc[len(mdl.full_sol.index)] = sol_t
+            recorder.record(t, sol_t)
 
         # Calculate the values of the change of states and set them as dy
         dy = np.empty(len(mdl.states))
-        for i, (var_name, value) in enumerate(mdl.states.items()):
-            expression = mdl.variables_formatted[var_name]
+        for i, (var_name, code) in enumerate(states_code):
             try:
-                logger = logging.getLogger(__name__)
-                if mdl.options["formatting_mode"] == "numexpr":
-                    computation_space["dy"] = ne.evaluate(
-                        expression,
-                        local_dict=computation_space,
-                    )
+                if config.formatting_mode == "numexpr":
+                    dy_i = ne.evaluate(code, local_dict=computation_space)
                 else:
-                    exec(compile("dy = " + expression, "<string>", "exec"), computation_space)
+                    dy_i = eval(code, computation_space)
             except Exception:
+                logger = logging.getLogger(__name__)
                 logger.error(
                     "Failed to interpret definition for %r: %r"
                     % (
@@ -283,21 +304,22 @@ class SolveIvp(Solver):
                 raise
 
             # Replace NaNs and Infs by calculable values
-            if np.isnan(computation_space["dy"]) and mdl.options["nans_to_zeros"].strip().lower() == "true":
+            if np.isnan(dy_i) and config.nans_to_zeros:
                 mdl.add_to_log(f"Derivative of {var_name} is NaN at time {t}. Replaced with 0", warn=issue_warnings)
-                computation_space["dy"] = 0
-            elif np.isposinf(computation_space["dy"]) and mdl.options["clip_large_nums"].strip().lower() == "true":
+                dy_i = 0
+            elif np.isposinf(dy_i) and config.clip_large_nums:
                 mdl.add_to_log(f"Derivative of {var_name} is inf at time {t}. Replaced with 1e38", warn=issue_warnings)
-                computation_space["dy"] = 1e38
-            elif np.isneginf(computation_space["dy"]) and mdl.options["clip_large_nums"].strip().lower() == "true":
+                dy_i = 1e38
+            elif np.isneginf(dy_i) and config.clip_large_nums:
                 mdl.add_to_log(
                     f"Derivative of {var_name} is -inf at time {t}. Replaced with -1e38", warn=issue_warnings
                 )
-                computation_space["dy"] = -1e38
+                dy_i = -1e38
 
-            dy[i] = computation_space["dy"]
+            dy[i] = dy_i
 
         # Print out progress. Thanks Simon Luzara from stackoverflow: https://stackoverflow.com/a/72363754
+        t_span = config.t_span
         print(
             "\rRunning: "
             + str(format(np.minimum(100, ((t - t_span[0]) / (t_span[1] - t_span[0])) * 100), ".2f"))
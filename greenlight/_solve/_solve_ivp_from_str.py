@@ -15,14 +15,25 @@ Public functions:
         and using scipy.integrate.solve_ivp
 """
 
+import hashlib
+import importlib.util
+import math
+import os
+import sys
+import types
 import warnings
 
+import numexpr as ne
 import numpy as np
 from scipy.integrate import solve_ivp
 
 from greenlight._greenlight_internal import GreenLightInternal
+from greenlight._load._utils import columns_array
 
-from ._solver import Solver
+from . import _scalar_code
+from ._input_interpolator import InputInterpolator
+from ._jac_sparsity import sparsity_solver_options
+from ._solver import Solver, SolverConfig
 
 
 class SolveIvpFromStr(Solver):
@@ -35,8 +46,23 @@ class SolveIvpFromStr(Solver):
         This method is used if mdl.options["solving_method"] == "solve_ivp_from_str"
 
         Implements Solver._solve and follows all its requirements (see docs for Solver._solve)
-        Currently this method is not supported with mdl.options["expand_variables"] == "True" (case insensitive)
-        If it is True, a ValueError is raised.
+        If mdl.options["rhs_mode"] is "scalar", the Python function operates on Python floats rather than on NumPy
+        arrays, see _scalar_code.py.
+
+        If mdl.options["vectorized"] is "True", the Python function accepts states of shape (n_states, k), and
+        scipy.integrate.solve_ivp is told so, allowing implicit solvers to evaluate several columns of a finite difference
+        Jacobian in one call.
+
+        If mdl.parameters is not empty (mdl.options["parametrize_consts"] is "True"), the model constants are given to
+        the Python function as an array p, holding the values of mdl.variables_formatted for mdl.parameters. Changing
+        these values (e.g., by greenlight.GreenLight.solve(params)) therefore does not require loading the model again.
+        The compiled Python functions are stored in mdl.compiled_code, and reused if the model is solved again.
+        If mdl.options["rhs_module"] is "True", the Python functions are written to a module in
+        mdl.options["cache_dir"] and imported from there.
+
+        If mdl.jac_commands is not empty (mdl.options["jacobian"] is "analytic"), a second Python function is created
+        from mdl.jac_commands, computing the Jacobian of the ODEs. This function is given to implicit solvers
+        (BDF, Radau, LSODA) as the jac argument of scipy.integrate.solve_ivp.
 
         Note that as opposed to _solve_ivp.py, the method here does not issue warnings if large numbers are clipped
         (if mdl.options["clip_large_nums"] is "True") or if NaNs are replaced by zeros
@@ -46,8 +72,7 @@ class SolveIvpFromStr(Solver):
         not added to the simulation log. Switching solver from "BDF" to "LSODA" seems to help with this somewhat.
 
         :param mdl: A GreenLightInternal instance which contains model definitions and options and is ready to be solved.
-        :raise: ValueError if mdl.options["expand_variables"] is not true,
-                An Exception if the solving failed for any other reason
+        :raise: An Exception if the solving failed for any reason
         :return: None
         """
         # Workspace where computations occur
@@ -63,55 +88,37 @@ class SolveIvpFromStr(Solver):
         for index, (key, value) in enumerate(mdl.states.items()):
             y0[index] = mdl.init[key]
 
-        # "expand_variables" is currently not supported with solve_ivp_from_str -
-        # it creates errors and hasn't been thoroughly tested
-        if mdl.options["expand_variables"].strip().lower() == "true":
-            raise ValueError("'expand_variables' is not supported with 'solve_ivp_from_str'")
+        # Interpolator for the input data, with the first column being "Time"
+        # The columns are only reordered if needed, so that memory-mapped input data is not copied
+        input_cols = ["Time"] + [input_var_name for input_var_name in mdl.inputs.keys() if input_var_name != "Time"]
+        input_array = columns_array(mdl.input_data, input_cols)
+        interpolator = InputInterpolator(
+            input_array[:, 0], input_array, mdl.options["interpolation"], step=mdl.input_time_step
+        )
 
-        # Convert mdl.input_data from DataFrame to 2D numpy array
-        input_array = []
-        if "Time" in mdl.input_data.keys():  # If there is any input data, there should also be a "Time" column
-            input_array = mdl.input_data["Time"].to_numpy().reshape(-1, 1)
-        for j, (input_var_name) in enumerate(mdl.inputs.keys()):
-            if input_var_name != "Time":
-                input_array = np.hstack((input_array, mdl.input_data[input_var_name].to_numpy().reshape(-1, 1)))
+        # Values of the parameters, given to the Python function as the array p
+        p = _parameter_values(mdl)
 
         # Dummy function to allow the script to run compiling
-        def dy_from_str(t, y, d_matrix, t_span):
+        def dy_from_str(t, y, interpolator, t_span, p):
             return 0
 
         # Create a string in the form of a Python script defining a function
         # This is the function that will be used as an argument for scipy.integrate.solve_ivp
-        func_str = "def dy_from_str(t, y, d_matrix, t_span):\n"
+        func_str = "def dy_from_str(t, y, interpolator, t_span, p):\n"
         func_str = func_str + "\tdy = np.zeros(y.shape)\n"
 
-        if mdl.options["interpolation"] == "linear":  # Use linear interpolation
-            # Multi-column version of np.interp
-            # Thanks user Daniel F on stackoverflow
-            # https://stackoverflow.com/questions/43772218/fastest-way-to-use-numpy-interp-on-a-2-d-array/43775224#43775224
-            def multi_interp2(x, xp, fp):
-                j = np.searchsorted(xp, x) - 1
-                if j <= 0:
-                    return fp[0, :]
-                elif j >= xp.shape[0] - 1:
-                    return fp[-1, :]
-                else:
-                    d = (x - xp[j]) / (xp[j + 1] - xp[j])
-                    return (1 - d) * fp[j, :] + d * fp[j + 1, :]
-
-            computation_space["multi_interp2"] = multi_interp2
-            func_str = func_str + "\td = np.concatenate(([t], multi_interp2(t, d_matrix[:,0], d_matrix[:,1:])))\n"
-        else:  # Default is interpolate left
-            func_str = func_str + (
-                "\trow = np.searchsorted(d_matrix[:,0], t)-1\n"
-                + "\trow = np.clip(row, 0, d_matrix.shape[0]-1)\n"
-                + "\td = d_matrix[row,:]\n"
-            )
+        # Lines of the Python function that read the input data at time t into the array d
+        interp_str = "\td = interpolator(t)\n"
+        if mdl.options["interpolation"] == "linear":  # With linear interpolation, d[0] is the time t
+            interp_str = interp_str + "\td[0] = t\n"
+        func_str = func_str + interp_str
 
         # Use the model commands stored in mdl.commands to define the Python function
-        func_str = func_str + (
-            "\ta = np.zeros(" + str(len(mdl.solving_order)) + ")\n" + "\t" + "\n\t".join(mdl.commands) + "\n"
-        )
+        # The array a holds the auxiliary variables, including temporary variables added by options["cse"]
+        n_aux = sum(command.startswith("a[") for command in mdl.commands)
+        a_init_str = "\ta = np.zeros(" + str(n_aux) + ")\n"
+        func_str = func_str + a_init_str + "\t" + "\n\t".join(mdl.commands) + "\n"
 
         # Replace NaNs and inf's by calculable values -
         # This helps the solver continue working and reduces computational errors
@@ -143,24 +150,101 @@ class SolveIvpFromStr(Solver):
         mdl.add_to_log("Model definitions converted to Python function:", warn=False)
         mdl.add_to_log(func_str, warn=False)
 
-        exec(func_str, computation_space)
+        _define_functions(mdl, func_str, computation_space)
+        single_function = computation_space["dy_from_str"]
+
+        # If rhs_mode is "scalar", define a second version of the function which operates on Python floats instead of
+        # NumPy arrays, see _scalar_code.py. If this version encounters an invalid operation (e.g., division by zero),
+        # it raises an error instead of returning inf or NaN, and the NumPy version is used for that call instead
+        scalar_fallbacks = []  # Time points in which the NumPy version was used instead of the scalar version
+        if mdl.options["rhs_mode"].strip().lower() == "scalar":
+            initializations, commands = _scalar_code.scalar_commands(mdl.commands)
+            n_states = len(mdl.states)
+            scalar_str = "def dy_from_str_scalar(t, y, interpolator, t_span, p):\n"
+            scalar_str = scalar_str + "\td = interpolator(t).tolist()\n"
+            if mdl.options["interpolation"] == "linear":
+                scalar_str = scalar_str + "\td[0] = t\n"
+            scalar_str = scalar_str + "\t" + "".join(f"y_{i}, " for i in range(n_states)) + "= y.tolist()\n"
+            scalar_str = scalar_str + "\t" + "".join(f"d_{i}, " for i in range(input_array.shape[1])) + "= d\n"
+            if len(p):
+                scalar_str = scalar_str + "\t" + "".join(f"p_{i}, " for i in range(len(p))) + "= p.tolist()\n"
+            scalar_str = scalar_str + "".join("\t" + line + "\n" for line in initializations + commands)
+            assigned = {command.split("=")[0].strip() for command in commands}
+            dy_values = [f"dy_{i}" if f"dy_{i}" in assigned else "0.0" for i in range(n_states)]
+            scalar_str = scalar_str + "\tdy = np.array([" + ", ".join(dy_values) + "])\n"
+            if mdl.options["nans_to_zeros"].strip().lower() == "true":
+                scalar_str = scalar_str + "\n\ty[np.isnan(y)] = 0"
+                scalar_str = scalar_str + "\n\tdy[np.isnan(dy)] = 0"
+            if mdl.options["clip_large_nums"].strip().lower() == "true":
+                scalar_str = scalar_str + "\n\tdy = np.clip(dy, -1e38, 1e38)"
+            scalar_str = scalar_str + (
+                "\n\tprint("
+                + "'\\rRunning: ' "
+                + " + str(format(min(100, ((t - t_span[0]) / (t_span[1] - t_span[0])) * 100), '.2f'))"
+                + "+'%', end='',)\n"
+            )
+            scalar_str = scalar_str + "\n\treturn dy"
+
+            mdl.add_to_log("Model definitions converted to scalar Python function:", warn=False)
+            mdl.add_to_log(scalar_str, warn=False)
+
+            computation_space.update(_scalar_code.SCALAR_FUNCTIONS)
+            _define_functions(mdl, scalar_str, computation_space)
+
+            def dy_scalar(t, y, interpolator, t_span, p):
+                try:
+                    return computation_space["dy_from_str_scalar"](t, y, interpolator, t_span, p)
+                except (ArithmeticError, ValueError):  # Invalid operations, other errors are not caught
+                    scalar_fallbacks.append(t)
+                    return computation_space["dy_from_str"](t, y, interpolator, t_span, p)
+
+            single_function = dy_scalar
+
+        # If vectorized is used, define a second version of the function which accepts y of shape (n_states, k), and
+        # computes a and dy for all k columns at once. The input data d is read at the single time point t and
+        # broadcasts over the columns. scipy.integrate.solve_ivp then calls the ODE function with k > 1 only when
+        # approximating the Jacobian, single columns are computed by the original function, which is faster
+        vectorized = mdl.options["vectorized"].strip().lower() == "true"
+        if vectorized and mdl.options["formatting_mode"] == "math":
+            mdl.add_to_log("'vectorized' is not supported with formatting_mode 'math', option ignored")
+            vectorized = False
+        if vectorized:
+            vectorized_str = func_str.replace("def dy_from_str(", "def dy_from_str_vectorized(", 1).replace(
+                a_init_str, "\ta = np.zeros((" + str(n_aux) + ",) + y.shape[1:])\n", 1
+            )
+            _define_functions(mdl, vectorized_str, computation_space)
 
-        # Set up the arguments for solve_ivp
+            def dy_dispatch(t, y, interpolator, t_span, p):
+                if y.shape[1] == 1:
+                    return single_function(t, y[:, 0], interpolator, t_span, p)[:, np.newaxis]
+                return computation_space["dy_from_str_vectorized"](t, y, interpolator, t_span, p)
 
-        # If mdl.options["t_eval"] is "None", use None. Otherwise, use time points from mdl.options["t_start"]
-        # to mdl.options["t_end"], with steps mdl.options["output_step"]
-        if mdl.options["t_eval"] == "None":
-            t_eval = None
+            ode_function = dy_dispatch
         else:
-            t_eval = np.arange(
-                float(mdl.options["t_start"]), float(mdl.options["t_end"]), float(mdl.options["output_step"])
-            )
+            ode_function = single_function
+
+        # If an analytic Jacobian was created (see docs/simulation_options.md), define a Python function for it
+        if mdl.jac_commands:
+            aux_commands = [command for command in mdl.commands if command.startswith("a[")]
+            n_states = len(mdl.states)
+            jac_str = "def jac_from_str(t, y, interpolator, t_span, p):\n" + interp_str
+            jac_str = jac_str + (a_init_str + "\t" + "\n\t".join(aux_commands) + "\n")
+            jac_str = jac_str + "\tg = np.zeros(" + str(sum(c.startswith("g[") for c in mdl.jac_commands)) + ")\n"
+            jac_str = jac_str + f"\tjac = np.zeros(({n_states}, {n_states}))\n"
+            jac_str = jac_str + "\t" + "\n\t".join(mdl.jac_commands) + "\n"
+            if mdl.options["nans_to_zeros"].strip().lower() == "true":
+                jac_str = jac_str + "\n\tjac[np.isnan(jac)] = 0"
+            if mdl.options["clip_large_nums"].strip().lower() == "true":
+                jac_str = jac_str + "\n\tjac = np.clip(jac, -1e38, 1e38)"
+            jac_str = jac_str + "\n\treturn jac"
+
+            mdl.add_to_log("Model Jacobian converted to Python function:", warn=False)
+            mdl.add_to_log(jac_str, warn=False)
+
+            _define_functions(mdl, jac_str, computation_space)
 
-        # If mdl.options["first_step"] was defined as a number, use that one, if not, use None
-        try:
-            first_step = float(mdl.options["first_step"])
-        except ValueError:  # string could not be converted to float
-            first_step = None
+        # Set up the arguments for solve_ivp
+        config = SolverConfig.from_options(mdl.options)
 
         warning_log = []
 
@@ -188,24 +272,134 @@ class SolveIvpFromStr(Solver):
 
             return wrapped
 
-        wrapped_ode = warn_logging_wrapper(computation_space["dy_from_str"])
+        wrapped_ode = warn_logging_wrapper(ode_function)
+
+        # Information about the Jacobian for implicit solvers: the analytic Jacobian if available,
+        # otherwise its sparsity pattern
+        if mdl.jac_commands and mdl.options["solver"] in ["BDF", "Radau", "LSODA"]:
+            jac_options = {"jac": warn_logging_wrapper(computation_space["jac_from_str"])}
+        else:
+            jac_options = sparsity_solver_options(mdl)
 
         # Solve the ODEs, catching and logging warnings in the process
         sol = solve_ivp(
             wrapped_ode,
-            [float(mdl.options["t_start"]), float(mdl.options["t_end"])],
-            y0,
-            mdl.options["solver"],
-            t_eval=t_eval,
-            first_step=first_step,
-            max_step=float(mdl.options["max_step"]),
-            atol=float(mdl.options["atol"]),
-            rtol=float(mdl.options["rtol"]),
-            args=[input_array, [float(mdl.options["t_start"]), float(mdl.options["t_end"])]],
+            y0=y0,
+            **config.solve_ivp_kwargs(),
+            vectorized=vectorized,
+            **jac_options,
+            args=[interpolator, list(config.t_span), p],
         )
 
+        if scalar_fallbacks:
+            mdl.add_to_log(
+                f"The scalar ODE function encountered invalid operations in {len(scalar_fallbacks)} calls, "
+                f"the NumPy version was used for these calls",
+                warn=False,
+            )
+
         if mdl.options["log_runtime_warnings"].strip().lower() == "true":
             # Add the logged warnings to mdl
             mdl.add_to_log("\n".join(set(warning_log)), warn=False)
 
         mdl.states_sol = sol
+
+
+def _parameter_values(mdl: GreenLightInternal) -> np.ndarray:
+    """
+    Evaluate the parameters of mdl (see mdl.parameters), based on their expressions in mdl.variables_formatted.
+    Parameters may depend on other parameters, which appear before them in mdl.parameters
+
+    :param mdl: A GreenLightInternal instance with a loaded model
+    :return: An array with the values of mdl.parameters, in the same order
+    """
+    namespace = {"np": np, "math": math}
+    for key in mdl.parameters:
+        if mdl.options["formatting_mode"] == "numexpr":
+            namespace[key] = ne.evaluate(mdl.variables_formatted[key], local_dict=namespace)
+        else:
+            namespace[key] = eval(mdl.variables_formatted[key], namespace)
+    return np.array([namespace[key] for key in mdl.parameters], dtype=np.float64)
+
+
+def _define_functions(mdl: GreenLightInternal, source: str, computation_space: dict) -> None:
+    """
+    Define the Python functions in source in computation_space. The source code is compiled once, and the compiled
+    code is stored in mdl.compiled_code for reuse when the model is solved again (e.g., with different parameters).
+    If mdl.options["rhs_module"] is "True", the source code is written to a module in mdl.options["cache_dir"] and
+    imported, see _import_module
+
+    :param mdl: A GreenLightInternal instance
+    :param source: Python source code defining functions
+    :param computation_space: Namespace in which the functions are defined
+    :return: None
+    """
+    if source not in mdl.compiled_code:
+        cache_dir = mdl.options["cache_dir"].strip()
+        if mdl.options["rhs_module"].strip().lower() != "true":
+            mdl.compiled_code[source] = compile(source, "<string>", "exec")
+        elif not cache_dir or cache_dir.lower() == "none":
+            mdl.add_to_log("'rhs_module' requires 'cache_dir' to be set, option ignored", warn=False)
+            mdl.compiled_code[source] = compile(source, "<string>", "exec")
+        else:
+            mdl.compiled_code[source] = _import_module(mdl, source, os.path.expanduser(cache_dir))
+
+    compiled = mdl.compiled_code[source]
+    if isinstance(compiled, types.ModuleType):
+        computation_space.update(
+            {
+                name: value
+                for name, value in vars(compiled).items()
+                if getattr(value, "__module__", None) == compiled.__name__
+            }
+        )
+    else:
+        exec(compiled, computation_space)
+
+
+def _import_module(mdl: GreenLightInternal, source: str, cache_dir: str) -> types.ModuleType:
+    """
+    Write source to a module in cache_dir named greenlight_rhs_<hash>.py, where <hash> is a hash of its content,
+    and import it. Python stores the compiled module in cache_dir/__pycache__, so that later runs (also in other
+    processes) do not need to compile it again. Tracebacks of errors in the functions point to the module file.
+    The module is added to sys.modules under its name, other processes can import it by name after adding
+    cache_dir to sys.path
+
+    :param mdl: A GreenLightInternal instance, used for logging
+    :param source: Python source code defining functions
+    :param cache_dir: Directory where the module is written, created if it does not exist
+    :return: The imported module
+    """
+    content = _MODULE_HEADER + source + "\n"
+    module_name = "greenlight_rhs_" + hashlib.sha256(content.encode()).hexdigest()[:16]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    file_name = os.path.join(cache_dir, module_name + ".py")
+    if not os.path.isfile(file_name):
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_file_name = f"{file_name}.{os.getpid()}.tmp"
+        with open(temp_file_name, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(temp_file_name, file_name)
+
+    spec = importlib.util.spec_from_file_location(module_name, file_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules[module_name] = module
+    mdl.add_to_log(f"Python function imported from module {file_name}", warn=False)
+    return module
+
+
+# First lines of modules created by _import_module, providing the names used by the generated functions
+_MODULE_HEADER = """\"\"\"Python functions generated by greenlight._solve._solve_ivp_from_str from a model definition\"\"\"
+
+import math
+
+import numpy as np
+
+from greenlight._solve._scalar_code import SCALAR_FUNCTIONS
+
+globals().update(SCALAR_FUNCTIONS)
+
+"""
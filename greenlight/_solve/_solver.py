@@ -9,16 +9,102 @@ Defines an abstract class Solver for solving a model (i.e., running the simulati
 Public functions:
     Solver._solve(mdl: GreenLightInternal) -> None: (abstract)
         Run the simulation for a GreenLightInternal mdl and store the solution in mdl.full_sol as a pandas DataFrame
+    SolverConfig.from_options(options: dict) -> SolverConfig:
+        Resolve the string values in a GreenLightInternal options dict into an immutable, typed solver configuration
 
 Exceptions:
     An Exception is raised if the solving failed
 """
 
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
 
 from greenlight._greenlight_internal import GreenLightInternal
 
 
+@dataclass(frozen=True)
+class SolverConfig:
+    """
+    The options of a GreenLightInternal instance that are relevant for solving, converted from strings to their
+    typed values. The options are resolved once before solving, so that functions called by the solver at every time
+    step do not need to parse strings. See docs/simulation_options.md for the meaning of each option
+    """
+
+    t_span: Tuple[float, float]  # options["t_start"], options["t_end"]
+    t_eval: Optional[Tuple[float, ...]]  # None, or time points from options["t_start"], "t_end", and "output_step"
+    solver: str
+    first_step: Optional[float]
+    max_step: float
+    atol: float
+    rtol: float
+    interpolation: str
+    formatting_mode: str
+    expand_variables: bool
+    clip_large_nums: bool
+    nans_to_zeros: bool
+    warn_runtime: bool
+    log_runtime_warnings: bool
+
+    @classmethod
+    def from_options(cls, options: dict) -> "SolverConfig":
+        """
+        Create a SolverConfig from a GreenLightInternal options dict
+
+        :param options: A dict of options, in the format of GreenLightInternal.options
+        :return: A SolverConfig holding the typed values of the options
+        """
+        t_span = (float(options["t_start"]), float(options["t_end"]))
+
+        # If options["t_eval"] is "None", use None. Otherwise, use time points from options["t_start"]
+        # to options["t_end"], with steps options["output_step"]
+        if options["t_eval"] == "None":
+            t_eval = None
+        else:
+            t_eval = tuple(np.arange(t_span[0], t_span[1], float(options["output_step"])).tolist())
+
+        # If options["first_step"] was defined as a number, use that one, if not, use None
+        try:
+            first_step = float(options["first_step"])
+        except ValueError:  # string could not be converted to float
+            first_step = None
+
+        return cls(
+            t_span=t_span,
+            t_eval=t_eval,
+            solver=options["solver"],
+            first_step=first_step,
+            max_step=float(options["max_step"]),
+            atol=float(options["atol"]),
+            rtol=float(options["rtol"]),
+            interpolation=options["interpolation"],
+            formatting_mode=options["formatting_mode"],
+            expand_variables=options["expand_variables"].strip().lower() == "true",
+            clip_large_nums=options["clip_large_nums"].strip().lower() == "true",
+            nans_to_zeros=options["nans_to_zeros"].strip().lower() == "true",
+            warn_runtime=options["warn_runtime"].strip().lower() == "true",
+            log_runtime_warnings=options["log_runtime_warnings"].strip().lower() == "true",
+        )
+
+    def solve_ivp_kwargs(self) -> dict:
+        """
+        The keyword arguments for scipy.integrate.solve_ivp that are defined by this configuration
+
+        :return: A dict of keyword arguments to be passed to scipy.integrate.solve_ivp
+        """
+        return {
+            "t_span": list(self.t_span),
+            "method": self.solver,
+            "t_eval": None if self.t_eval is None else np.array(self.t_eval),
+            "first_step": self.first_step,
+            "max_step": self.max_step,
+            "atol": self.atol,
+            "rtol": self.rtol,
+        }
+
+
 class Solver(ABC):
     @staticmethod
     @abstractmethod
@@ -47,6 +133,8 @@ class Solver(ABC):
                 solver can freely choose the first step size.
             - mdl.options["interpolation"]: if it is "linear", linear interpolation should be used for interpolating
                 model input data. Otherwise, "nearest neighbour" to the left should be used.
+            - mdl.options["jac_sparsity"]: if "true" (case insensitive), the sparsity pattern of the Jacobian of the
+                ODEs should be passed to implicit solvers, see _jac_sparsity.sparsity_solver_options
             - mdl.options["clip_large_nums"]: if "true" (case insensitive), values should be clipped
                 to the range of [-1e38, 1e38]. This may help prevent computation errors.
             - mdl.options["nans_to_zeros"]: : if "true" (case insensitive), any NaN encountered during solving should
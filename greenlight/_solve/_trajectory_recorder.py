@@ -0,0 +1,75 @@
+"""
+GreenLight/greenlight/_solve/_trajectory_recorder.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+Defines the class TrajectoryRecorder, used for recording the values of model variables at the time points in which
+a solver evaluates the ODEs. Values are stored in a preallocated NumPy array which grows as needed, so that recording
+a time point costs amortized constant time. The recording is converted to a pandas DataFrame once, after solving.
+
+Public functions:
+    TrajectoryRecorder(columns: list, initial_rows: int = 1024)
+        Create an empty recorder for the given columns, one of which should be "Time"
+    TrajectoryRecorder.record(t: float, values: numpy.ndarray) -> None
+        Record the values of all columns at time t, replacing any values previously recorded at time t
+    TrajectoryRecorder.to_dataframe() -> pandas.DataFrame
+        Convert the recorded values to a DataFrame sorted by time
+
+External dependencies:
+    - numpy: for storing the recorded values
+    - pandas: for converting the recorded values to a DataFrame
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+class TrajectoryRecorder:
+    def __init__(self, columns: List[str], initial_rows: int = 1024):
+        """
+        Create an empty recorder
+
+        :param columns: The names of the recorded columns, in the order in which values are given to record.
+                        One of the columns should be "Time"
+        :param initial_rows: Number of rows to preallocate. The storage is doubled whenever it is full
+        """
+        self.columns = list(columns)
+        self._time_col = self.columns.index("Time")
+        self._data = np.empty((max(initial_rows, 1), len(self.columns)))
+        self._n_rows = 0
+        self._row_of_time = {}  # Maps each recorded time point to its row in self._data
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    def record(self, t: float, values: np.ndarray) -> None:
+        """
+        Record the values of all columns at time t. If values were previously recorded at time t, they are replaced
+
+        :param t: The time point of the values
+        :param values: Array with one value per column, in the order of self.columns. The value in the "Time"
+                        column should be t
+        :return: None
+        """
+        row = self._row_of_time.get(t)
+        if row is None:  # a new time point, add a new row
+            if self._n_rows == self._data.shape[0]:
+                self._data = np.concatenate((self._data, np.empty_like(self._data)))
+            row = self._n_rows
+            self._row_of_time[t] = row
+            self._n_rows += 1
+        self._data[row] = values
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Convert the recorded values to a DataFrame with the columns self.columns, and one row per recorded time point,
+        sorted by time
+
+        :return: A DataFrame of the recorded values
+        """
+        data = self._data[: self._n_rows]
+        data = data[np.argsort(data[:, self._time_col], kind="stable")]
+        return pd.DataFrame(data, columns=self.columns)
@@ -7,7 +7,7 @@ https://github.com/davkat1/GreenLight
 Functions for solving a model (i.e., running the simulation) defined in a GreenLightModel instance.
 
 Public functions:
-    solve_model(mdl: GreenLightModel) -> None:
+    solve_model(mdl: GreenLightModel, params: dict | None = None) -> None:
         Run the simulation for a GreenLightModel mdl and store the solution in mdl.full_sol
 
 Example usage:
@@ -34,11 +34,12 @@ import numpy as np
 import pandas as pd
 
 from greenlight._greenlight_internal import GreenLightInternal
+from greenlight._load import _utils
 
 from . import _solve_ivp, _solve_ivp_from_str
 
 
-def solve_model(mdl: GreenLightInternal) -> None:
+def solve_model(mdl: GreenLightInternal, params: dict | None = None) -> None:
     """
     Solve the GreenLightInternal mdl based on the model definitions and options set in it
     (typically using greenlight.load_model). After running this function, the following attributes of mdl are modified:
@@ -64,25 +65,39 @@ def solve_model(mdl: GreenLightInternal) -> None:
         In order to supress all warnings manually, use warnings.filterwarnings("ignore")
 
     :param mdl: A GreenLightInternal instance with model definitions and options as set by greenlight._load.load_model()
-    :raise: An Exception if the solving failed for whatever reason
+    :param params: Optional dict of new values for model parameters, with the parameter names as keys.
+        Parameters are model constants, if mdl.options["parametrize_consts"] was "True" when loading the model
+        (see mdl.parameters). The new values are used, also for constants that depend on them, only in this solve:
+        the values of the parameters in mdl.variables_formatted are restored once the solution is computed, so
+        solving again without params uses the values of the loaded model. The model does not need to be loaded again
+    :raise: A ValueError if a key of params is not a parameter of mdl,
+            An Exception if the solving failed for whatever reason
     :return: None
     """
+    # Definitions of the parameters that are replaced by params, restored after solving
+    defaults = _set_parameters(mdl, params) if params else {}
+
+    # Clear the solution of a previous run, if the model is solved again
+    mdl.full_sol = mdl.full_sol.iloc[0:0]
 
     start_time = time.time()
     mdl.add_to_log(
         f"Simulation started at time (ISO format): {datetime.datetime.now().isoformat()}", warn=False, to_print=True
     )
 
-    if mdl.options["solving_method"] == "solve_ivp":
-        _solve_ivp.SolveIvp.solve(mdl)
-    elif mdl.options["solving_method"] == "solve_ivp_from_str":
-        _solve_ivp_from_str.SolveIvpFromStr.solve(mdl)
-    else:
-        raise ValueError(f"solving method {mdl.options['solving_method']} not found")
+    try:
+        if mdl.options["solving_method"] == "solve_ivp":
+            _solve_ivp.SolveIvp.solve(mdl)
+        elif mdl.options["solving_method"] == "solve_ivp_from_str":
+            _solve_ivp_from_str.SolveIvpFromStr.solve(mdl)
+        else:
+            raise ValueError(f"solving method {mdl.options['solving_method']} not found")
 
-    # If auxiliary states were not directly calculated, do it now
-    if mdl.full_sol["Time"].empty:
-        _compute_full_solution(mdl)
+        # If auxiliary states were not directly calculated, do it now
+        if mdl.full_sol["Time"].empty:
+            _compute_full_solution(mdl)
+    finally:
+        mdl.variables_formatted.update(defaults)
 
     # Enforce a column order
     col_order = (
@@ -111,6 +126,31 @@ def solve_model(mdl: GreenLightInternal) -> None:
     mdl.add_to_log(f"Elapsed time: {end_time - start_time} seconds", warn=False, to_print=True)
 
 
+def _set_parameters(mdl: GreenLightInternal, params: dict) -> dict:
+    """
+    Set new values for parameters of mdl, by replacing their expressions in mdl.variables_formatted.
+    The new values are added to mdl.log. All keys of params are checked before any expression is replaced
+
+    :param mdl: A GreenLightInternal object with a loaded model
+    :param params: A dict with parameter names as keys and their new values as values
+    :raise: A ValueError if a key of params is not in mdl.parameters
+    :return: A dict with the replaced expressions of mdl.variables_formatted, with the parameter names as keys
+    """
+    for key in params:
+        if key not in mdl.parameters:
+            raise ValueError(
+                f"{key!r} is not a parameter of the model. Model constants are parameters if "
+                f"options['parametrize_consts'] is 'True' when loading the model"
+            )
+
+    defaults = {}
+    for key, value in params.items():
+        defaults[key] = mdl.variables_formatted[key]
+        mdl.add_to_log(f"Parameter {key} set to {value} for this solve (default: {defaults[key]})", warn=False)
+        mdl.variables_formatted[key] = repr(float(value))
+    return defaults
+
+
 def _compute_full_solution(mdl: GreenLightInternal) -> None:
     """
     Depending on the solver and solver settings used, after simulation it could be that only state
@@ -139,19 +179,20 @@ def _compute_full_solution(mdl: GreenLightInternal) -> None:
         full_sol[f"{key}"] = mdl.states_sol.y[index]
 
     # Get data from input data file - interpolated to time points states_sol.t
-    for col_idx in range(1, len(mdl.input_data.columns)):
-        var_name = mdl.input_data.columns[col_idx]
-        if mdl.options["interpolation"] == "linear":
-            # Linear interpolation is used if set in the options,
-            full_sol[var_name] = np.interp(
-                mdl.states_sol.t,
-                mdl.input_data[mdl.input_data.columns[0]],
-                mdl.input_data[mdl.input_data.columns[col_idx]],
-            )
-        else:  # Default value is "left", find the nearest value to the left
-            input_rows = (mdl.input_data[mdl.input_data.columns[0]]).searchsorted(mdl.states_sol.t) - 1
-            input_rows = np.clip(input_rows, 0, len(mdl.input_data) - 1)
-            full_sol[var_name] = mdl.input_data.loc[input_rows, var_name].to_numpy()
+    # The rows of the input data are looked up once for all columns. All columns are taken at once, so that
+    # memory-mapped input data is not copied
+    input_array = _utils.columns_array(mdl.input_data, mdl.input_data.columns)
+    input_time = input_array[:, 0]
+    input_values = input_array[:, 1:]
+    if mdl.options["interpolation"] == "linear":
+        # Linear interpolation is used if set in the options,
+        input_sol = _utils.interp_columns(mdl.states_sol.t, input_time, input_values, mdl.input_time_step)
+    else:  # Default value is "left", find the nearest value to the left
+        input_rows = _utils.find_rows(input_time, mdl.states_sol.t, mdl.input_time_step)
+        input_rows = np.clip(input_rows, 0, len(mdl.input_data) - 1)
+        input_sol = input_values[input_rows]
+    for col_idx, var_name in enumerate(mdl.input_data.columns[1:]):
+        full_sol[var_name] = input_sol[:, col_idx]
 
     if mdl.options["formatting_mode"] == "numpy":
         exec("import numpy as np", full_sol)
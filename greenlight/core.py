@@ -39,7 +39,13 @@ class GreenLight(GreenLightInternal):
         variables_formatted (dict[str, str]): The model variables after being loaded and formatted
         dependencies (dict[str, str]): For each variable, a list of the variables that this variable depends on
         solving_order (list): All model variables, ordered in a way they can be solved sequentially
+        solving_levels (list[list[str]]): The variables of solving_order, grouped into levels that can be solved
+            in parallel: each variable depends only on variables in earlier levels
         commands (list[str]): Representation of the defined dynamic model as Python commands
+        jac_commands (list[str]): Representation of the Jacobian of the dynamic model as Python commands,
+            if options["jacobian"] is "analytic"
+        parameters (list[str]): Names of the model constants given to the ODE function as an array of parameters,
+            if options["parametrize_consts"] is "True"
 
         consts (dict[str, str]): A subset of variables, containing the model constants
         inputs (dict[str, str]): A subset of variables, containing the model inputs
@@ -47,11 +53,15 @@ class GreenLight(GreenLightInternal):
         aux (dict[str, str]): A subset of variables, containing model auxiliary states
         states (dict[str, str]): A subset of variables, containing the model states
         init (dict[str, str]): A dict with the same keys sa states, and with values containing the initial values
-        input_data (pandas.DataFrame):  Input data provided to the model for each variable in inputs
+        input_data (pandas.DataFrame):  Input data provided to the model for each variable in inputs. May be a read-only
+            view of a memory-mapped .npy file, see greenlight._load._input_files.read_input_array
+        input_time_step (float | None): The step size of input_data["Time"] if it is equally spaced, otherwise None
 
         start_time (datetime.datetime): The start time in the simulated model run
         states_sol (numpy.array): Solution of the states trajectories
         full_sol (pandas.DataFrame): Time trajectories of all model variables, after solving
+        compiled_code (dict): Compiled Python functions (or modules, if options["rhs_module"] is "True") created while
+            solving, with their source code as keys. Reused when the model is solved again
 
         options (dict[str, str]): A dictionary containing options related to model formatting and solving,
             see docs/simulation_options.md
@@ -61,8 +71,9 @@ class GreenLight(GreenLightInternal):
             Constructor for the GreenLight class
         load(self):
             Load the model structure (as defined according to input_prompt) onto a GreenLightInternal instance
-        solve(self):
-            Perform the simulation (i.e., solve the ODEs) as defined after using load()
+        solve(self, params: dict = None):
+            Perform the simulation (i.e., solve the ODEs) as defined after using load(), optionally with new values
+            for model parameters
         save(self):
             After running the model, save calculated values and any other logs to files, based on the location specified by output_path
         run(self):
@@ -139,15 +150,21 @@ class GreenLight(GreenLightInternal):
         """
         load_model(self)
 
-    def solve(self) -> None:
+    def solve(self, params: dict | None = None) -> None:
         """
         Solve a GreenLight model based on the model definitions and options set in it (typically using GreenLight.load())
         After running this function, the model variables are calculated and stored in the object.
         See greenlight._solve for more information
 
+        If the model was loaded with options["parametrize_consts"] set to "True", new values for the model constants
+        can be given in params, e.g., mdl.solve(params={"tSpDay": 20.0}). The model is then solved again with the new
+        values, without loading it again. The new values apply only to this solve: calling mdl.solve() again without
+        params uses the values of the loaded model.
+
+        :param params: Optional dict of new values for model constants, with the constant names as keys
         :return: None
         """
-        solve_model(self)
+        solve_model(self, params)
 
     def save(self) -> None:
         """
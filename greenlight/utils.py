@@ -10,11 +10,17 @@ Public functions:
     copy_builtin_models(target_folder: str = "") -> None
         Copies the built-in model files that come in the greenlight package to a user-provided location.
         This allows users to create a local version of the files and manipulate or adjust them according to their needs.
+    convert_input_data(csv_file: str, output_file: str) -> None
+        Converts an input data CSV file to a binary file (.npz, .parquet, .feather, or .npy), which GreenLight
+        loads faster, without parsing text.
 
 Example usage:
     >>> from greenlight import copy_builtin_models
     >>> copy_builtin_models()
         Copies all built-in model files to the current working directory, in a sub-directory called "models"
+    >>> from greenlight import convert_input_data
+    >>> convert_input_data("weather.csv", "weather.npz")
+        Converts weather.csv to weather.npz, which can be used anywhere weather.csv was used
 
 External dependencies:
     - shutil for copying files
@@ -22,12 +28,15 @@ External dependencies:
     - importlib.resources for accessing the package resources
     - datetime.datetime for recording the time of copying
     - inspect for recording the name of the calling function
+    - pandas for reading CSV files
+    - pyarrow (optional) for writing .parquet and .feather files
 
 Author:
     David Katzin, Wageningen University & Research, david.katzin@wur.nl
 September 2025
 """
 
+import functools
 import importlib
 import importlib.resources as resources
 import inspect
@@ -36,6 +45,10 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 
+import pandas as pd
+
+from greenlight._load import _input_files
+
 
 def copy_builtin_models(target_folder: str = "") -> None:
     """
@@ -113,3 +126,44 @@ def copy_builtin_models(target_folder: str = "") -> None:
     )
 
     print(f"GreenLight built-in model files copied to {os.path.abspath(target_path)}")
+
+
+def convert_input_data(csv_file: str, output_file: str) -> None:
+    """
+    Convert a CSV file with input data (see "Input CSV files" in docs/model_format.md) to a binary columnar file.
+    The format of the new file is chosen by the extension of output_file: ".npz" (NumPy), ".parquet" (Apache Parquet),
+    ".feather" (Apache Arrow), or ".npy" (NumPy, memory-mapped when loaded). The ".parquet" and ".feather" formats
+    require the pyarrow package.
+    The units and descriptions in the header rows of the CSV file are stored in the metadata of the new file
+    (for ".npy" files, in a JSON file named output_file + ".json").
+    The new file can then be used in the same places as the CSV file (e.g., in input prompts and in
+    "processing_order" lists), and is loaded without parsing text.
+
+    :param csv_file: Location of the CSV file to convert
+    :param output_file: Location of the file to create
+    :return: None
+    :raises: ValueError if the extension of output_file is not supported
+             ImportError if pyarrow is needed for writing the file but not installed
+    """
+    open_file = functools.partial(open, csv_file)
+    try:
+        header_df, data = _input_files.read_input_csv(open_file, encoding="utf-8")
+    except UnicodeDecodeError:  # The file was probably written in Excel but contains Unicode
+        header_df, data = _input_files.read_input_csv(open_file, encoding="Windows-1252")
+
+    # Header rows are interpreted as when loading the CSV file, see greenlight._load.core._add_input_data
+    units, descriptions = {}, {}
+    if len(header_df) == 1:
+        units = header_df.iloc[0]
+    elif len(header_df) > 1:
+        descriptions = header_df.iloc[0]
+        units = header_df.iloc[1]
+
+    _input_files.write_input_table(
+        output_file,
+        data,
+        units={column: str(unit) for column, unit in dict(units).items() if not pd.isna(unit)},
+        descriptions={
+            column: str(description) for column, description in dict(descriptions).items() if not pd.isna(description)
+        },
+    )
@@ -0,0 +1,71 @@
+"""
+GreenLight/scripts/benchmark_rhs.py
+Copyright (c) 2025 David Katzin, Wageningen Research Foundation
+SPDX-License-Identifier: BSD-3-Clause-Clear
+https://github.com/davkat1/GreenLight
+
+Benchmark the ODE function (right-hand side) generated by the "solve_ivp_from_str" solving method, comparing
+options["rhs_mode"] "array" (NumPy formatting, the default) and "scalar" (see docs/simulation_options.md).
+
+The Katzin 2021 model (main_katzin_2021.json) is solved with each of the modes, and the running time, the number of
+evaluations of the ODE function, and the time per evaluation are printed. The final states of the modes are compared
+to verify that they give the same solution (up to the tolerances of the solver).
+
+Usage:
+    python scripts/benchmark_rhs.py [input_data.csv] [n_days]
+By default the test weather data of the Katzin 2021 model is used, and 2 days are simulated.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+"""Set up directories"""
+if "__file__" in locals():  # Running this from script
+    project_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+else:
+    project_dir = os.getcwd()  # Most likely the active directory is the project directory
+sys.path.append(project_dir)
+
+from greenlight import GreenLight  # noqa: E402
+
+base_path = os.path.join(project_dir, "greenlight", "models")
+model_def = os.path.join("katzin_2021", "definition", "main_katzin_2021.json")
+input_data = os.path.join("katzin_2021", "input_data", "test_data", "Bleiswijk_from_20091020.csv")
+if len(sys.argv) > 1:
+    input_data = os.path.abspath(sys.argv[1])
+n_days = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+modes = {
+    "array": {"formatting_mode": "numpy", "rhs_mode": "array"},
+    "scalar": {"formatting_mode": "numpy", "rhs_mode": "scalar"},
+}
+
+"""Run the benchmark"""
+final_states = {}
+for mode, mode_options in modes.items():
+    options = {"options": {"t_end": str(n_days * 24 * 3600), "solving_method": "solve_ivp_from_str"} | mode_options}
+    mdl = GreenLight(base_path=base_path, input_prompt=[model_def, input_data, options])
+
+    with contextlib.redirect_stdout(io.StringIO()):  # Silence the progress messages
+        mdl.load()
+        start_time = time.perf_counter()
+        mdl.solve()
+        solve_time = time.perf_counter() - start_time
+
+    n_evaluations = mdl.states_sol.nfev
+    final_states[mode] = mdl.states_sol.y[:, -1]
+    print(
+        f"rhs_mode {mode!r}: solved in {solve_time:.2f} seconds, {n_evaluations} evaluations of the ODE function, "
+        f"{1e6 * solve_time / n_evaluations:.0f} microseconds per evaluation"
+    )
+
+reference = final_states["array"]
+for mode, final_state in final_states.items():
+    if mode != "array":
+        max_diff = np.max(np.abs(final_state - reference) / (np.abs(reference) + 1e-6))
+        print(f"Maximum relative difference of final states between {mode!r} and 'array': {max_diff:.2e}")
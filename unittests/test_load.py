@@ -0,0 +1,1009 @@
+"""
+Unit tests for the GreenLight load package.
+"""
+
+import ast
+import importlib.resources
+import json
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import greenlight
+from greenlight._load import (
+    _cache,
+    _cse,
+    _differentiate,
+    _expand_functions,
+    _fold_constants,
+    _input_files,
+    _json_cache,
+    _parse_model,
+)
+from greenlight._load import _utils as _load_utils
+from greenlight._solve._input_interpolator import InputInterpolator
+
+
+def _names(expression):
+    """The names used in an expression"""
+    return {node.id for node in ast.walk(ast.parse(expression, mode="eval")) if isinstance(node, ast.Name)}
+
+
+def _evaluate_commands(commands, y):
+    """Evaluate the commands of a model without inputs and parameters, and return the derivatives of the states"""
+    namespace = {
+        "np": np,
+        "y": np.asarray(y, dtype=float),
+        "dy": np.zeros(len(y)),
+        "a": np.zeros(sum(command.startswith("a[") for command in commands)),
+    }
+    for command in commands:
+        exec(command, namespace)
+    return namespace["dy"]
+
+
+class TestCommonSubexpressionElimination(unittest.TestCase):
+    """Test cases for the common subexpression elimination of model expressions."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.model = {
+            "y1": {"type": "state", "definition": "np.exp(a1 + k1) * k1 - np.exp(a1 + k1) / (1 + y2**2)", "init": "1"},
+            "y2": {"type": "state", "definition": "(1 + y2**2) * a2 - (a1 if y1 > 0 else -a1)", "init": "0.5"},
+            "a1": {"type": "aux", "definition": "np.sqrt(y1**2 + 1) * k2"},
+            "a2": {"type": "aux", "definition": "np.sqrt(y1**2 + 1) + y1 * y2"},
+            "k1": {"type": "const", "definition": "0.3"},
+            "k2": {"type": "const", "definition": "2"},
+        }
+
+    def test_repeated_subexpressions_are_defined_before_use(self):
+        """Test that repeated subexpressions are replaced by temporaries, each defined before its first use."""
+        expressions = {
+            "v1": "np.exp(x + 1) * 2 + (y * z + 1) / (y * z + 1)",
+            "v2": "3 + np.exp(x + 1)",
+            "v3": "v1 * np.sqrt(y * z + 1)",
+        }
+        new_expressions, order, ops_before, ops_after = _cse.eliminate_common_subexpressions(expressions, expressions)
+
+        temps = [name for name in order if name.startswith("_cse")]
+        self.assertEqual(temps, [f"_cse{i}" for i in range(len(temps))])
+        self.assertIn("np.exp(x + 1)", new_expressions.values())
+        self.assertIn("y * z + 1", new_expressions.values())
+        self.assertEqual([name for name in order if not name.startswith("_cse")], ["v1", "v2", "v3"])
+        for position, name in enumerate(order):
+            for used in _names(new_expressions[name]):
+                if used.startswith("_cse"):
+                    self.assertLess(order.index(used), position, f"{used} is used by {name} before it is defined")
+        self.assertLess(ops_after, ops_before)
+
+    def test_conditional_branches_are_not_hoisted(self):
+        """Test that subexpressions inside the branches of IfExp and BoolOp nodes are not replaced by temporaries."""
+        expressions = {
+            "v1": "np.log(x) if x > 0 else 0",
+            "v2": "x > 0 and np.log(x) > 1",
+            "v3": "np.log(x) * 2",
+            "v4": "np.log(x) + 1",
+        }
+        new_expressions, order, _, _ = _cse.eliminate_common_subexpressions(expressions, expressions)
+
+        self.assertEqual(new_expressions["_cse0"], "np.log(x)")
+        self.assertEqual(new_expressions["v1"], expressions["v1"])
+        self.assertEqual(new_expressions["v2"], expressions["v2"])
+        self.assertEqual(new_expressions["v3"], "_cse0 * 2")
+        self.assertEqual(order, ["v1", "v2", "_cse0", "v3", "v4"])
+
+    def test_model_commands_are_unchanged(self):
+        """Test that the commands of a model give the same derivatives with and without common subexpression
+        elimination."""
+        commands = {}
+        for cse in ["True", "False"]:
+            mdl = greenlight.GreenLight(input_prompt=[self.model, {"options": {"cse": cse}}])
+            mdl.load()
+            commands[cse] = mdl.commands
+        self.assertGreater(len(commands["True"]), len(commands["False"]))
+
+        for y in [[1, 0.5], [-0.3, 2], [0, 0]]:
+            np.testing.assert_allclose(
+                _evaluate_commands(commands["True"], y), _evaluate_commands(commands["False"], y), rtol=1e-14
+            )
+
+
+class TestConstantFolding(unittest.TestCase):
+    """Test cases for the constant folding of model expressions."""
+
+    def test_constant_subexpressions_become_literals(self):
+        """Test that constants and subexpressions depending only on constants are replaced by their values."""
+        expressions = {
+            "c1": "2",
+            "c2": "-c1 * np.log(100)",
+            "c3": "np.pi / 2",
+            "v": "c2 * x + (1 + c1) * np.exp(c3 - c3)",
+            "w": "x ** (1 / c1) if c1 > 1 else 0",
+        }
+        folded, values, n_folded = _fold_constants.fold_constants(expressions, expressions)
+
+        self.assertEqual(values, {"c1": 2, "c2": -2 * np.log(100), "c3": np.pi / 2})
+        self.assertEqual(folded["c2"], repr(float(-2 * np.log(100))))
+        self.assertEqual(folded["v"], f"{-2 * float(np.log(100))!r} * x + 3.0")
+        self.assertEqual(folded["w"], "x ** 0.5 if True else 0")
+        self.assertGreater(n_folded, 0)
+
+    def test_states_and_inputs_are_not_evaluated(self):
+        """Test that states (in keep) and inputs (not in order) are never evaluated, even if their expressions are
+        constant."""
+        expressions = {"c": "3", "y": "2 * c", "d": "", "v": "y + d * (c + 1)"}
+        folded, values, _ = _fold_constants.fold_constants(expressions, ["c", "y", "v"], keep=["y"])
+
+        self.assertEqual(folded["y"], "6")
+        self.assertEqual(folded["v"], "y + d * 4")
+        self.assertEqual(values, {"c": 3})
+
+    def test_parameters_are_not_folded(self):
+        """Test that with options["parametrize_consts"], model constants and the variables depending on them are
+        not evaluated, while other constant subexpressions are still folded."""
+        model = {
+            "y": {"type": "state", "definition": "a1 * y + a2 * np.exp(-y) - 2 * 3", "init": "1"},
+            "a1": {"type": "aux", "definition": "k1 * np.log(100)"},
+            "a2": {"type": "aux", "definition": "a1 + y * (1 + 1)"},
+            "k1": {"type": "const", "definition": "2"},
+        }
+        formatted = {}
+        for parametrize in ["True", "False"]:
+            mdl = greenlight.GreenLight(input_prompt=[model, {"options": {"parametrize_consts": parametrize}}])
+            mdl.load()
+            formatted[parametrize] = mdl.variables_formatted
+
+        self.assertEqual(formatted["True"]["a1"], f"k1 * {float(np.log(100))!r}")
+        self.assertEqual(formatted["True"]["a2"], "a1 + y * 2")
+        self.assertEqual(formatted["True"]["y"], "a1 * y + a2 * np.exp(-y) - 6")
+        self.assertEqual(formatted["False"]["a1"], repr(float(2 * np.log(100))))
+        self.assertEqual(formatted["False"]["a2"], f"{2 * float(np.log(100))!r} + y * 2")
+
+
+class TestFunctionExpansion(unittest.TestCase):
+    """Test cases for the expansion of model functions."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.functions = {"f(a, b)": "a * b", "g(x)": "f(x, x + 1) / x", "h(a, b)": "a - b ** 2"}
+
+    def _expand(self, expressions, functions=None, temp_prefix=None):
+        """Expand the function calls in expressions, and return the expanded expressions"""
+        functions = self.functions if functions is None else functions
+        expressions = expressions | dict.fromkeys(functions, "")
+        _expand_functions.parse(expressions, functions, ["exp"], temp_prefix)
+        return expressions
+
+    def test_nested_calls(self):
+        """Test that calls inside function definitions and inside arguments are expanded."""
+        expanded = self._expand({"v1": "g(y - 2)", "v2": "np.exp(f(g(y), 2))"})
+
+        self.assertEqual(expanded["v1"], "(y - 2) * (y - 2 + 1) / (y - 2)")
+        self.assertEqual(expanded["v2"], "np.exp(y * (y + 1) / y * 2)")
+
+    def test_operator_precedence(self):
+        """Test that substituted arguments keep their precedence, so the expansion has the same value as the call."""
+        expressions = {"v1": "f(y + 1, z - 2)", "v2": "h(-y, -z) ** 0.5", "v3": "f(h(y, z), 1 / z)", "v4": "g(y ** z)"}
+        expanded = self._expand(expressions)
+
+        self.assertEqual(expanded["v1"], "(y + 1) * (z - 2)")
+        self.assertEqual(expanded["v2"], "(-y - (-z) ** 2) ** 0.5")
+        namespace = {
+            "f": lambda a, b: a * b,
+            "g": lambda x: (x * (x + 1)) / x,
+            "h": lambda a, b: a - b**2,
+            "y": 1.5,
+            "z": -3.0,
+        }
+        for key, expression in expressions.items():
+            self.assertEqual(eval(expanded[key], namespace), eval(expression, namespace), key)
+
+    def test_invalid_calls(self):
+        """Test that a ValueError is raised for a wrong number of arguments, an undefined function, and a recursive
+        definition."""
+        with self.assertRaisesRegex(ValueError, "mismatch in number of arguments"):
+            self._expand({"v": "f(y)"})
+        with self.assertRaisesRegex(ValueError, "No definition found"):
+            self._expand({"v": "k(y)"})
+        with self.assertRaisesRegex(ValueError, "defined recursively"):
+            self._expand({"v": "r1(y)"}, {"r1(a)": "r2(a) + 1", "r2(a)": "r1(a * 2)"})
+
+    def test_function_temporaries(self):
+        """Test that arguments used more than once in a function definition are stored as temporary variables."""
+        expanded = self._expand(
+            {"var1": "func1(x, y + z)", "var2": "func1(2, y + z) + func1(y, x)"}, {"func1(a,b)": "a * b + b"}, "_fn"
+        )
+
+        self.assertEqual(
+            expanded, {"var1": "x * _fn0 + _fn0", "var2": "2 * _fn0 + _fn0 + (y * x + x)", "_fn0": "y + z"}
+        )
+
+    def test_katzin_2021_expansion(self):
+        """Test that the expanded expressions of the Katzin 2021 model have the same syntax trees as those expanded by
+        the previous, string-based implementation, stored in data/katzin_2021_expanded_functions.json."""
+        base_path = os.path.join(os.path.dirname(greenlight.__file__), "models", "katzin_2021", "definition")
+        mdl = greenlight.GreenLight(base_path=base_path, input_prompt="main_katzin_2021.json")
+        mdl.load()
+        expanded = _parse_model.format_expressions(
+            dict(mdl.variables), mdl.states.keys(), mdl.functions, "numpy", True, False
+        )[0]
+
+        reference_file = os.path.join(os.path.dirname(__file__), "data", "katzin_2021_expanded_functions.json")
+        with open(reference_file, encoding="utf-8") as file:
+            reference = json.load(file)
+        for key, expression in reference.items():
+            self.assertEqual(
+                ast.dump(ast.parse(expanded[key], mode="eval")),
+                ast.dump(ast.parse(expression.strip(), mode="eval")),
+                key,
+            )
+
+
+class TestDifferentiation(unittest.TestCase):
+    """Test cases for the symbolic differentiation used for the analytic Jacobian."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.points = [(0.4, 1.7), (1.3, 0.6), (2.7, 2.2)]
+
+    def _assert_matches_finite_difference(self, expression, prefix="np."):
+        """Check that the derivative of expression by x equals a central finite difference at self.points"""
+        derivative = _differentiate.differentiate(expression, "x", prefix)
+        for x, y in self.points:
+            namespace = {"np": np, "math": math, "y": y}
+            step = 1e-6 * max(1, abs(x))
+            finite_difference = (
+                eval(expression, namespace | {"x": x + step}) - eval(expression, namespace | {"x": x - step})
+            ) / (2 * step)
+            self.assertAlmostEqual(
+                eval(derivative, namespace | {"x": x}),
+                finite_difference,
+                delta=1e-6 * max(1, abs(finite_difference)),
+                msg=f"d/dx {expression} = {derivative} at x={x}, y={y}",
+            )
+
+    def test_arithmetic(self):
+        """Test the derivatives of the arithmetic operators."""
+        for expression in ["3 * x * y - x / y + 2", "-x / (1 + x * y)", "+x * (y - x) - 1 / x", "x % 0.25 + y % x"]:
+            self._assert_matches_finite_difference(expression)
+
+    def test_pow(self):
+        """Test the derivatives of powers with integer, fractional, and variable exponents."""
+        for expression in ["x ** 3", "x ** 2.5", "x ** (1 / 3)", "x ** -0.5", "x ** y", "y ** x", "x ** x", "2 ** x"]:
+            self._assert_matches_finite_difference(expression)
+
+    def test_functions(self):
+        """Test the derivatives of builtin functions, with and without their prefix."""
+        for expression in [
+            "np.exp(2 * x) / x",
+            "np.log(x * y)",
+            "math.log(x) + math.exp(-x)",
+            "np.sqrt(x + y ** 2)",
+            "np.log10(x) + np.log1p(x) + np.expm1(x)",
+            "np.sin(x) * np.cos(y * x) + np.tan(x / 3)",
+            "np.tanh(x) + np.sinh(x) - np.cosh(x)",
+            "np.arctan(x) + np.arcsin(x / 3) + np.arccos(x / 4)",
+            "np.arctan2(x, y) + np.arcsinh(x) + np.arccosh(x + 1) + np.arctanh(x / 3)",
+            "abs(x - 1) + np.abs(y - x) + np.radians(x)",
+            "np.floor(x) + x",
+        ]:
+            self._assert_matches_finite_difference(expression)
+        self.assertEqual(
+            _differentiate.differentiate("np.log(x) + np.sqrt(x)", "x", "math."), "1 / x + 1 / (2 * np.sqrt(x))"
+        )
+        self.assertEqual(_differentiate.differentiate("x ** x", "x", "math."), "x ** x * (math.log(x) + x / x)")
+
+    def test_conditionals(self):
+        """Test the derivatives of conditional expressions, which are differentiated in each branch."""
+        for expression in [
+            "x ** 2 if x > 1 else np.sin(x)",
+            "np.where(x > 1, x ** 2, 3 * y)",
+            "(x > 1) * x ** 3 + (x <= 1) * np.exp(x)",
+            "x * (x > 1 and y > 1)",
+        ]:
+            self._assert_matches_finite_difference(expression)
+        self.assertEqual(_differentiate.differentiate("x if y > 1 else 2", "y"), "0")
+
+    def test_unsupported_expression(self):
+        """Test that a ValueError is raised for expressions that cannot be differentiated, and that a model containing
+        them falls back to a finite difference Jacobian."""
+        for expression in ["x // 2", "np.maximum(x, 1)", "np.erf(x)", "x +"]:
+            with self.assertRaises(ValueError):
+                _differentiate.differentiate(expression, "x")
+
+        model = {"y": {"type": "state", "definition": "-y // 2 + np.exp(y)", "init": "1"}}
+        mdl = greenlight.GreenLight(input_prompt=[model, {"options": {"jacobian": "analytic"}}])
+        mdl.load()
+        self.assertEqual(mdl.jac_commands, [])
+        self.assertIn("a finite difference approximation will be used instead", mdl.log)
+
+
+def _interpolate(time, values, mode, t_points):
+    """Interpolate values at each of t_points, as done while solving"""
+    interpolator = InputInterpolator(np.asarray(time, dtype=float), np.asarray(values, dtype=float), mode)
+    return np.array([interpolator(t).copy() for t in t_points])
+
+
+class TestInputWindow(unittest.TestCase):
+    """Test cases for reading only the rows of input data needed for the simulated time window."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.time = np.array([0, 300, 600, 900, 1200, 1500, 2100, 2400], dtype=float)
+        self.values = rng.random((len(self.time), 2))
+        self.windows = [
+            (400, 900),  # Window end on a time point
+            (300, 1200),  # Window start and end on time points
+            (650, 700),  # Window between two time points
+            (0, 2400),  # All data
+            (-600, 100),  # Window starts before the data
+            (2000, 3000),  # Window ends after the data
+            (-500, -100),  # Window before the data
+            (2500, 3000),  # Window after the data
+        ]
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def _t_points(self, window):
+        """Time points within window, including its edges and the time points of the data"""
+        inside = self.time[(self.time >= window[0]) & (self.time <= window[1])]
+        return np.concatenate((np.linspace(window[0], window[1], 41), inside))
+
+    def _write_csv(self, header):
+        """Write self.time and self.values to a CSV file, after the given header rows, and return its path"""
+        csv_file = os.path.join(self.temp_dir, "input.csv")
+        with open(csv_file, "w", encoding="utf-8") as file:
+            file.write("Time,d1,d2\n" + header)
+            for t, row in zip(self.time.tolist(), self.values.tolist()):
+                file.write(f"{t},{row[0]},{row[1]}\n")
+        return csv_file
+
+    def _read_csv(self, csv_file, window, linear):
+        """Read csv_file, and return the header, the data, and the number of times it was read as text"""
+        with mock.patch.object(_input_files, "split_input_header", wraps=_input_files.split_input_header) as spy:
+            header_df, data = _input_files.read_input_file(
+                lambda mode: open(csv_file, mode), csv_file, ".csv", window, linear
+            )
+        return header_df, data, spy.call_count
+
+    def test_window_rows(self):
+        """Test that interpolating the rows in the window gives the same values within the window as interpolating all
+        rows."""
+        for mode in ["linear", "left"]:
+            for window in self.windows:
+                rows = _input_files.window_rows(self.time, window, mode == "linear")
+                self.assertGreater(rows.stop, rows.start, f"{mode}, {window}")
+                t_points = self._t_points(window)
+                np.testing.assert_array_equal(
+                    _interpolate(self.time[rows], self.values[rows], mode, t_points),
+                    _interpolate(self.time, self.values, mode, t_points),
+                    err_msg=f"{mode}, {window}",
+                )
+
+    def test_window_rows_on_time_points(self):
+        """Test the rows selected for windows whose edges are time points of the data."""
+        self.assertEqual(_input_files.window_rows(self.time, (300, 900)), slice(0, 4))
+        self.assertEqual(_input_files.window_rows(self.time, (300, 900), linear=False), slice(0, 3))
+        self.assertEqual(_input_files.window_rows(self.time, (0, 2400)), slice(0, 8))
+        self.assertEqual(_input_files.window_rows(self.time, (2500, 3000)), slice(7, 8))
+        self.assertEqual(_input_files.window_rows(self.time, (-500, -100), linear=False), slice(0, 1))
+        self.assertEqual(_input_files.window_rows(self.time, None), slice(0, 8))
+
+    def test_windowed_csv(self):
+        """Test that a CSV file read for a window gives the rows of the window, without reading the file as text."""
+        csv_file = self._write_csv(",Description 1,Description 2\ns,W,W\n")
+        full_header, full_data, _ = self._read_csv(csv_file, None, True)
+        for mode in ["linear", "left"]:
+            for window in self.windows:
+                header_df, data, text_reads = self._read_csv(csv_file, window, mode == "linear")
+                rows = _input_files.window_rows(self.time, window, mode == "linear")
+                self.assertEqual(text_reads, 1, "Only the first lines are read as text")
+                self.assertTrue(header_df.equals(full_header))
+                np.testing.assert_array_equal(data.to_numpy(), full_data.to_numpy()[rows])
+                t_points = self._t_points(window)
+                np.testing.assert_array_equal(
+                    _interpolate(data["Time"], data[["d1", "d2"]], mode, t_points),
+                    _interpolate(self.time, self.values, mode, t_points),
+                    err_msg=f"{mode}, {window}",
+                )
+
+    def test_windowed_csv_fallback(self):
+        """Test that a CSV file whose lines are not its rows (here, a header value with a line break) is read as text
+        when read for a window, and still gives the rows of the window."""
+        csv_file = self._write_csv(',"Description\n1",Description 2\ns,W,W\n')
+        _, full_data, _ = self._read_csv(csv_file, None, True)
+        for mode in ["linear", "left"]:
+            for window in [(400, 900), (-600, 100), (2500, 3000)]:
+                header_df, data, text_reads = self._read_csv(csv_file, window, mode == "linear")
+                rows = _input_files.window_rows(self.time, window, mode == "linear")
+                self.assertEqual(text_reads, 2, "The file is read as text after the check of the rows failed")
+                self.assertEqual(header_df.loc[0, "d1"], "Description\n1")
+                np.testing.assert_array_equal(data["Time"].to_numpy(dtype=float), self.time[rows])
+                t_points = self._t_points(window)
+                np.testing.assert_array_equal(
+                    _interpolate(data["Time"], data[["d1", "d2"]], mode, t_points),
+                    _interpolate(full_data["Time"], full_data[["d1", "d2"]], mode, t_points),
+                    err_msg=f"{mode}, {window}",
+                )
+
+
+class TestCombineInputData(unittest.TestCase):
+    """Test cases for combining the data of several input data files."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(1)
+        # A coarse first file, and a second file with a finer, irregular time grid which shares some time points
+        self.first = pd.DataFrame({"Time": np.arange(0, 86400 + 1, 3600.0)})
+        self.first["d1"] = rng.standard_normal(len(self.first))
+        self.second = pd.DataFrame({"Time": np.sort(rng.choice(np.arange(0, 86400 + 1, 60.0), 300, replace=False))})
+        self.second["d2"] = rng.standard_normal(len(self.second))
+        self.first.to_csv(os.path.join(self.temp_dir, "first.csv"), index=False)
+        self.second.to_csv(os.path.join(self.temp_dir, "second.csv"), index=False)
+        self.t_points = np.sort(np.concatenate((rng.uniform(0, 86400, 2000), self.first["Time"], self.second["Time"])))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def _load(self, interpolation, input_time_grid):
+        """Load all the input data of both files, and return it"""
+        options = {"interpolation": interpolation, "input_time_grid": input_time_grid, "trim_input_data": "False"}
+        mdl = greenlight.GreenLight(
+            base_path=self.temp_dir, input_prompt=["first.csv", "second.csv", {"options": options}]
+        )
+        mdl.load()
+        return mdl.input_data
+
+    def test_resample_columns_linear(self):
+        """Test that linear resampling gives the same values as np.interp for each column."""
+        time, values = self.second["Time"].to_numpy(), np.column_stack((self.second["d2"], -self.second["d2"]))
+        t_points = np.concatenate(([-100.0], self.t_points, [90000.0]))
+        resampled = _load_utils.resample_columns(t_points, time, values)
+        for col in range(2):
+            np.testing.assert_array_equal(resampled[:, col], np.interp(t_points, time, values[:, col]))
+
+    def test_resample_columns_left(self):
+        """Test that left resampling uses the values at the last time point at or before each time point."""
+        time, values = np.array([0.0, 10, 20, 30]), np.array([[1.0, -1], [2, -2], [3, -3], [4, -4]])
+        resampled = _load_utils.resample_columns(np.array([-5.0, 0, 5, 10, 29.9, 30, 40]), time, values, linear=False)
+        np.testing.assert_array_equal(resampled[:, 0], [1, 1, 1, 2, 3, 4, 4])
+        np.testing.assert_array_equal(resampled[:, 1], -resampled[:, 0])
+
+    def test_combine_left(self):
+        """Test that files are combined with left interpolation, using the values of the second file at the last time
+        point at or before each time point of the first file."""
+        input_data = self._load("left", "first")
+
+        np.testing.assert_array_equal(input_data["Time"], self.first["Time"])
+        np.testing.assert_array_equal(input_data["d1"], self.first["d1"])
+        rows = np.searchsorted(self.second["Time"], self.first["Time"], side="right") - 1
+        np.testing.assert_array_equal(input_data["d2"], self.second["d2"].to_numpy()[np.clip(rows, 0, None)])
+
+    def test_combine_union(self):
+        """Test that with input_time_grid "union", the combined data interpolates to the data of each file, so no
+        data of the finer second file is lost, while with "first" it is."""
+        for mode in ["linear", "left"]:
+            input_data = self._load(mode, "union")
+            self.assertEqual(len(input_data), len(np.union1d(self.first["Time"], self.second["Time"])))
+            combined = _interpolate(input_data["Time"], input_data[["d1", "d2"]], mode, self.t_points)
+            for col, data in [(0, self.first), (1, self.second)]:
+                expected = _interpolate(data["Time"], data.iloc[:, 1:], mode, self.t_points)[:, 0]
+                np.testing.assert_allclose(combined[:, col], expected, rtol=0, atol=1e-14, err_msg=mode)
+
+            input_data = self._load(mode, "first")
+            combined = _interpolate(input_data["Time"], input_data[["d2"]], mode, self.t_points)[:, 0]
+            expected = _interpolate(self.second["Time"], self.second[["d2"]], mode, self.t_points)[:, 0]
+            self.assertGreater(np.max(np.abs(combined - expected)), 0.1)
+
+
+class TestModelCache(unittest.TestCase):
+    """Test cases for the on-disk cache of compiled models."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.model = {
+            "y1": {"type": "state", "definition": "np.exp(-a1) * k1 - y2 * a1", "init": "1"},
+            "y2": {"type": "state", "definition": "a1 ** 2 - np.sqrt(1 + y2 ** 2) * k2", "init": "0.5"},
+            "a1": {"type": "aux", "definition": "np.sqrt(1 + y2 ** 2) + y1 * k2"},
+            "k1": {"type": "const", "definition": "0.3"},
+            "k2": {"type": "const", "definition": "2"},
+        }
+        self.options = {"jacobian": "analytic", "cache_dir": self.temp_dir}
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def _load(self, **options):
+        """Load self.model with self.options, updated by options, and return the loaded GreenLight object"""
+        mdl = greenlight.GreenLight(input_prompt=[self.model, {"options": self.options | options}])
+        mdl.load()
+        return mdl
+
+    def _assert_same_compiled_model(self, mdl, expected):
+        for name in _cache.CACHED_ATTRIBUTES:
+            self.assertEqual(getattr(mdl, name), getattr(expected, name), name)
+
+    def test_warm_load(self):
+        """Test that a model loaded from the cache has the same compiled attributes as a model compiled without it."""
+        cold = self._load(cache_dir="None")
+        first = self._load()
+        self.assertIn("Compiled model saved to cache file", first.log)
+        warm = self._load()
+        self.assertIn("Compiled model loaded from cache file", warm.log)
+
+        self.assertTrue(warm.jac_commands)
+        self._assert_same_compiled_model(first, cold)
+        self._assert_same_compiled_model(warm, cold)
+
+    def test_cache_key(self):
+        """Test that the cache key changes with the model definitions, the options in KEY_OPTIONS, and the format of
+        the cache files, but not with other options."""
+        mdl = self._load()
+        key = _cache.cache_key(mdl)
+
+        mdl.options["t_end"] = "1000"
+        self.assertEqual(_cache.cache_key(mdl), key)
+        for option in _cache.KEY_OPTIONS:
+            value = mdl.options[option]
+            mdl.options[option] = value + "_changed"
+            self.assertNotEqual(_cache.cache_key(mdl), key, option)
+            mdl.options[option] = value
+        with mock.patch.object(_cache, "_CACHE_FORMAT", _cache._CACHE_FORMAT + 1):
+            self.assertNotEqual(_cache.cache_key(mdl), key)
+        self.assertEqual(_cache.cache_key(mdl), key)
+
+        self.model["k1"]["definition"] = "0.4"
+        self.assertNotEqual(_cache.cache_key(self._load()), key)
+        self.model["k1"]["definition"] = "0.3"
+        self.model["k1"]["type"] = "aux"
+        self.assertNotEqual(_cache.cache_key(self._load()), key)
+
+    def test_corrupt_cache_file(self):
+        """Test that a corrupt cache file is logged and the model is compiled again, instead of raising an error."""
+        cold = self._load(cache_dir="None")
+        cache_file = _cache._cache_file(self.temp_dir, _cache.cache_key(self._load()))
+        with open(cache_file, "rb") as file:
+            data = file.read()
+
+        for corrupt_data in [
+            b"",
+            b"not a pickle",
+            data[: len(data) // 2],  # Truncated file
+            data[:1] + b"\x09" + data[2:],  # Unsupported protocol
+            b"cnonexistent_module\nname\n.",  # Missing module
+            pickle.dumps([1, 2]),
+            pickle.dumps({"commands": []}),
+        ]:
+            with open(cache_file, "wb") as file:
+                file.write(corrupt_data)
+            mdl = self._load()
+            self.assertIn("Could not read compiled model from cache file", mdl.log)
+            self.assertIn("Compiled model saved to cache file", mdl.log)
+            self._assert_same_compiled_model(mdl, cold)
+            self.assertIn("Compiled model loaded from cache file", self._load().log)
+
+
+class TestSortDependencies(unittest.TestCase):
+    """Test cases for sorting expressions by their dependencies."""
+
+    def test_linear_chain(self):
+        """Test that a chain is sorted from its end, with one expression per level, whatever the order of the
+        expressions."""
+        dependencies = {"a": {"b"}, "b": {"c"}, "c": {"y"}, "y": set()}
+        for expressions in (["a", "b", "c"], ["c", "b", "a"], ["b", "a", "c"]):
+            order, levels = _load_utils.sort_dependencies(expressions, dependencies, ["y"])
+            self.assertEqual(order, ["c", "b", "a"])
+            self.assertEqual(levels, [["c"], ["b"], ["a"]])
+
+    def test_independent_levels(self):
+        """Test that independent expressions share a level, keep the order of expressions within it, and that the
+        order is that of repeated scans over the expressions."""
+        dependencies = {
+            "v1": {"v2", "y1"},
+            "v2": set(),
+            "v3": {"v1", "v2"},
+            "v4": {"d1"},
+            "v5": {"v4", "v2"},
+            "v6": {"v3"},
+        }
+        expressions = ["v1", "v2", "v3", "v4", "v5", "v6"]
+        order, levels = _load_utils.sort_dependencies(expressions, dependencies, ["y1", "d1"])
+        # v5 is taken in the first scan, after v4, and v3 and v6 in the second scan, after v1
+        self.assertEqual(order, ["v2", "v4", "v5", "v1", "v3", "v6"])
+        self.assertEqual(levels, [["v2", "v4"], ["v1", "v5"], ["v3"], ["v6"]])
+
+        # Dependencies on names not in expressions are ignored, like those on basis expressions
+        self.assertEqual(_load_utils.sort_dependencies(expressions, dependencies, [])[0], order)
+        self.assertEqual(_load_utils.sort_dependencies([], dependencies, []), ([], []))
+
+    def test_random_graph(self):
+        """Test that every expression comes after its dependencies, is one level above its deepest dependency, and that
+        the order is that of taking the expressions whose dependencies were taken in repeated scans."""
+        rng = np.random.default_rng(0)
+        names = [f"v{i}" for i in range(200)]
+        dependencies = {
+            name: {names[j] for j in rng.choice(i, min(i, 3), replace=False)} for i, name in enumerate(names)
+        }
+        expressions = list(rng.permutation(names))
+        order, levels = _load_utils.sort_dependencies(expressions, dependencies, [])
+
+        self.assertEqual(sorted(order), sorted(names))
+        position = {name: i for i, name in enumerate(order)}
+        level = {name: k for k, names_in_level in enumerate(levels) for name in names_in_level}
+        for name in names:
+            self.assertTrue(all(position[dep] < position[name] for dep in dependencies[name]), name)
+            self.assertEqual(level[name], max((level[dep] + 1 for dep in dependencies[name]), default=0), name)
+        for names_in_level in levels:
+            self.assertEqual(names_in_level, [name for name in expressions if name in names_in_level])
+
+        scan_order = []
+        while len(scan_order) < len(expressions):
+            for name in expressions:
+                if name not in scan_order and dependencies[name].issubset(scan_order):
+                    scan_order.append(name)
+        self.assertEqual(order, scan_order)
+
+    def test_self_loop(self):
+        """Test that an expression depending on itself raises a ValueError naming it."""
+        with self.assertRaisesRegex(ValueError, "^Circular dependency detected involving a: a -> a$"):
+            _load_utils.sort_dependencies(["b", "a"], {"a": {"a"}, "b": set()}, [])
+        # A basis expression may depend on itself
+        self.assertEqual(_load_utils.sort_dependencies(["a"], {"a": {"a"}}, ["a"]), (["a"], [["a"]]))
+
+    def test_cycle(self):
+        """Test that a cycle of three expressions raises a ValueError naming the path of the cycle, also if other
+        expressions depend on the cycle."""
+        dependencies = {"a": {"b"}, "b": {"c"}, "c": {"a", "y"}, "d": {"a"}, "e": set()}
+        with self.assertRaisesRegex(ValueError, "^Circular dependency detected involving a: a -> b -> c -> a$"):
+            _load_utils.sort_dependencies(["a", "b", "c", "d", "e"], dependencies, ["y"])
+        with self.assertRaisesRegex(ValueError, "^Circular dependency detected involving a: a -> b -> c -> a$"):
+            _load_utils.sort_dependencies(["d", "e", "a", "b", "c"], dependencies, ["y"])
+
+
+class TestExtractComponents(unittest.TestCase):
+    """Test cases for collecting the variables, initial values, and options of a model definition."""
+
+    def test_docstring_example(self):
+        """Test the example in the docstring of extract_components."""
+        components = _parse_model.extract_components(
+            {
+                "root": {
+                    "x": {"type": "state", "definition": "-x", "init": "1"},
+                    "c": {"type": "const", "definition": "2", "unit": "s"},
+                    "options": {"t_end": "86400"},
+                }
+            }
+        )
+        expected = {
+            "definition": {"x": "-x", "c": "2"},
+            "unit": {"x": "no_unit_defined", "c": "s"},
+            "description": {"x": "", "c": ""},
+            "reference": {"x": "", "c": ""},
+            "types": {"state": ["x"], "const": ["c"]},
+            "init": {"x": "1"},
+            "options": {"t_end": "86400"},
+        }
+        self.assertEqual(components, expected)
+
+    def test_nested_nodes(self):
+        """Test that variables are collected from all depths in the order in which they appear, with default
+        definitions for variables that only have a type, and that non-dict values are skipped."""
+        components = _parse_model.extract_components(
+            {
+                "about": "A model",
+                "Group": {
+                    "about": "A group",
+                    "a1": {"type": "aux", "definition": "y1 * 2", "description": "desc", "reference": "ref"},
+                    "Subgroup": {"d1": {"type": "input"}, "c1": {"definition": "3"}},
+                },
+                "y1": {"type": "state", "definition": "a1 - y1", "unit": "m"},
+                "c2": {"type": "const", "definition": "c1", "init": "5"},
+            }
+        )
+        self.assertEqual(list(components["definition"]), ["a1", "d1", "c1", "y1", "c2"])
+        self.assertEqual(components["definition"]["d1"], "d1")
+        self.assertEqual(components["unit"]["y1"], "m")
+        self.assertEqual(components["description"]["a1"], "desc")
+        self.assertEqual(components["reference"]["a1"], "ref")
+        self.assertEqual(components["types"], {"aux": ["a1"], "input": ["d1"], "state": ["y1"], "const": ["c2"]})
+        self.assertEqual(components["init"], {"c2": "5"})
+        self.assertEqual(components["options"], {})
+
+    def test_init(self):
+        """Test that initial values are collected also from nodes that only set an initial value."""
+        components = _parse_model.extract_components(
+            {"y1": {"type": "state", "definition": "-y1", "init": "1"}, "Init": {"y2": {"init": "2"}}}
+        )
+        self.assertEqual(components["init"], {"y1": "1", "y2": "2"})
+        self.assertNotIn("y2", components["definition"])
+
+    def test_options_case_insensitive(self):
+        """Test that options are collected from nodes named "Options" in any case, at any depth."""
+        for name in ["options", "Options", "OPTIONS", " oPtIoNs "]:
+            components = _parse_model.extract_components(
+                {"Group": {name: {"t_end": "100", "solver": "LSODA"}}, "other": {"t_start": "0"}}
+            )
+            self.assertEqual(components["options"], {"t_end": "100", "solver": "LSODA"}, name)
+            self.assertEqual(components["definition"], {})
+
+        components = _parse_model.extract_components({"options": {"t_end": "100"}, "Group": {"Options": {"a": "1"}}})
+        self.assertEqual(components["options"], {"t_end": "100", "a": "1"})
+
+    def test_duplicate_definition(self):
+        """Test that a ValueError is raised for a variable defined twice, also in different nodes."""
+        with self.assertRaisesRegex(ValueError, "Duplicate definition for variable 'x': '1' and '2'"):
+            _parse_model.extract_components(
+                {"A": {"x": {"definition": "1"}}, "B": {"x": {"type": "const", "definition": "2"}}}
+            )
+
+    def test_duplicate_init(self):
+        """Test that a ValueError is raised for an initial value set twice."""
+        with self.assertRaisesRegex(ValueError, "Duplicate definition for variable 'y': '1' and '2'"):
+            _parse_model.extract_components(
+                {"y": {"type": "state", "definition": "-y", "init": "1"}, "I": {"y": {"init": "2"}}}
+            )
+
+    def test_duplicate_option(self):
+        """Test that a ValueError is raised for an option set twice, naming the node that sets it the second time."""
+        with self.assertRaisesRegex(ValueError, "Duplicate definition for option 't_end' in the same file(?s:.)*'B'"):
+            _parse_model.extract_components({"A": {"options": {"t_end": "1"}}, "B": {"Options": {"t_end": "2"}}})
+
+    def test_katzin_2021(self):
+        """Test that the components of the Katzin 2021 definition files are consistent: every variable has one
+        type, and initial values are set for all states."""
+        definition_dir = os.path.join(os.path.dirname(greenlight.__file__), "models", "katzin_2021", "definition")
+        file_names = [
+            os.path.join(path, file_name)
+            for path, _, file_names in os.walk(definition_dir)
+            for file_name in file_names
+            if file_name.endswith(".json") and not file_name.startswith("main")
+        ]
+        self.assertGreater(len(file_names), 3)
+        for file_name in sorted(file_names):
+            with open(file_name, encoding="utf-8") as file:
+                components = _parse_model.extract_components(json.load(file))
+            typed = [name for names in components["types"].values() for name in names]
+            self.assertEqual(len(typed), len(set(typed)), file_name)
+            self.assertTrue(set(typed).issubset(components["definition"]), file_name)
+            for key in ["unit", "description", "reference"]:
+                self.assertEqual(list(components[key]), list(components["definition"]), file_name)
+            self.assertTrue(set(components["types"].get("state", [])).issubset(components["init"]), file_name)
+
+
+class TestJsonCache(unittest.TestCase):
+    """Test cases for the in-memory cache of parsed JSON files."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.temp_dir, "model.json")
+        self._write(self.file_name, {"Group": {"x": {"type": "state", "definition": "-x"}}, "list": [1, [2, {"a": 3}]]})
+        _json_cache.clear_json_cache()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        _json_cache.clear_json_cache()
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def _write(file_name, content):
+        """Write content to file_name as JSON"""
+        with open(file_name, "w", encoding="utf-8") as file:
+            json.dump(content, file)
+
+    def test_cached(self):
+        """Test that a second load returns the cached object, also through another path to the same file."""
+        content = _json_cache.load_json(self.file_name)
+        self.assertEqual(content["Group"]["x"]["definition"], "-x")
+        self.assertIs(_json_cache.load_json(self.file_name), content)
+        self.assertIs(_json_cache.load_json(os.path.join(self.temp_dir, ".", "model.json")), content)
+
+        _json_cache.clear_json_cache()
+        self.assertIsNot(_json_cache.load_json(self.file_name), content)
+        self.assertEqual(_json_cache.load_json(self.file_name), content)
+
+    def test_invalidated(self):
+        """Test that a change in the modification time or the size of the file invalidates the cached content."""
+        content = _json_cache.load_json(self.file_name)
+        stat = os.stat(self.file_name)
+
+        os.utime(self.file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        touched = _json_cache.load_json(self.file_name)
+        self.assertIsNot(touched, content)
+        self.assertEqual(touched, content)
+
+        # Content of a different size, with the modification time set back to that of the cached content
+        self._write(self.file_name, {"Group": {"x": {"type": "state", "definition": "-2 * x"}}})
+        os.utime(self.file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(_json_cache.load_json(self.file_name)["Group"]["x"]["definition"], "-2 * x")
+
+    def test_read_only(self):
+        """Test that modifying the content raises a TypeError at any depth, and that copies can be modified."""
+        content = _json_cache.load_json(self.file_name)
+        self.assertIsInstance(content["Group"]["x"], _json_cache.FrozenDict)
+        self.assertEqual(content["list"], (1, (2, {"a": 3})))
+
+        for node in [content, content["Group"], content["Group"]["x"], content["list"][1][1]]:
+            for modify in [
+                lambda: node.__setitem__("new", 1),
+                lambda: node.__delitem__(next(iter(node))),
+                lambda: node.update({"new": 1}),
+                lambda: node.setdefault("new", 1),
+                lambda: node.pop(next(iter(node))),
+                lambda: node.popitem(),
+                lambda: node.clear(),
+                lambda: node.__ior__({"new": 1}),
+            ]:
+                with self.assertRaisesRegex(TypeError, "FrozenDict is read-only"):
+                    modify()
+        with self.assertRaises(TypeError):
+            content["list"][1][0] = 3
+        self.assertEqual(_json_cache.load_json(self.file_name)["Group"]["x"]["definition"], "-x")
+
+        copy = dict(content)
+        copy["new"] = 1
+        self.assertNotIn("new", content)
+        self.assertEqual(pickle.loads(pickle.dumps(content)), content)
+        self.assertIsInstance(pickle.loads(pickle.dumps(content)), _json_cache.FrozenDict)
+
+    def test_duplicate_keys(self):
+        """Test that duplicate keys raise a ValueError, and that the file is not cached."""
+        with open(self.file_name, "w", encoding="utf-8") as file:
+            file.write('{"x": {"definition": "1"}, "x": {"definition": "2"}}')
+        with self.assertRaises(ValueError):
+            _json_cache.load_json(self.file_name)
+        self.assertEqual(_json_cache._parsed_files, {})
+
+    def test_max_files(self):
+        """Test that the file loaded first is removed from the cache when the cache is full."""
+        file_names = [os.path.join(self.temp_dir, f"model_{i}.json") for i in range(4)]
+        for i, file_name in enumerate(file_names):
+            self._write(file_name, {"i": i})
+
+        with mock.patch.object(_json_cache, "_MAX_FILES", 3):
+            contents = [_json_cache.load_json(file_name) for file_name in file_names]
+            self.assertEqual(len(_json_cache._parsed_files), 3)
+            self.assertNotIn(os.path.realpath(file_names[0]), _json_cache._parsed_files)
+            for file_name, content in zip(file_names[1:], contents[1:]):
+                self.assertIs(_json_cache.load_json(file_name), content)
+
+            # Loading the first file again removes the second one
+            self.assertIsNot(_json_cache.load_json(file_names[0]), contents[0])
+            self.assertNotIn(os.path.realpath(file_names[1]), _json_cache._parsed_files)
+            self.assertEqual(len(_json_cache._parsed_files), 3)
+
+    def test_package_resource(self):
+        """Test that package resources which are not on the filesystem (here, in a zip file) are cached by their
+        content, with their path as given as the key, without resolving it with os.path.realpath."""
+        zip_name = os.path.join(self.temp_dir, "models.zip")
+        with zipfile.ZipFile(zip_name, "w") as archive:
+            archive.writestr("models/model.json", json.dumps({"x": {"definition": "1"}}))
+        resource = zipfile.Path(zip_name, "models/model.json")
+
+        content = _json_cache.load_json(resource)
+        self.assertEqual(content, {"x": {"definition": "1"}})
+        self.assertEqual(list(_json_cache._parsed_files), [str(resource)])
+        self.assertIs(_json_cache.load_json(zipfile.Path(zip_name, "models/model.json")), content)
+
+        with zipfile.ZipFile(zip_name, "w") as archive:
+            archive.writestr("models/model.json", json.dumps({"x": {"definition": "2"}}))
+        self.assertEqual(_json_cache.load_json(zipfile.Path(zip_name, "models/model.json"))["x"]["definition"], "2")
+
+        # Package resources on the filesystem are paths, cached like files
+        resource = importlib.resources.files("greenlight") / "models" / "katzin_2021" / "definition"
+        content = _json_cache.load_json(resource / "main_katzin_2021.json")
+        self.assertIn(os.path.realpath(resource / "main_katzin_2021.json"), _json_cache._parsed_files)
+        self.assertIs(_json_cache.load_json(resource / "main_katzin_2021.json"), content)
+
+
+class TestReadInputCsv(unittest.TestCase):
+    """Test cases for reading CSV files with input data directly as numbers."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.temp_dir, "input.csv")
+        rng = np.random.default_rng(0)
+        self.rows = [f"{300 * i},{rng.normal():.6f},{rng.integers(-5, 5)}" for i in range(50)]
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def _write(self, lines, encoding="utf-8"):
+        """Write lines to self.csv_file"""
+        with open(self.csv_file, "w", encoding=encoding, newline="") as file:
+            file.write("\n".join(lines) + "\n")
+
+    def _read(self):
+        """Read self.csv_file, and return the header, the data, and the number of times it was read as text"""
+        with mock.patch.object(_input_files, "split_input_header", wraps=_input_files.split_input_header) as spy:
+            header_df, data = _input_files.read_input_file(
+                lambda mode: open(self.csv_file, mode), self.csv_file, ".csv"
+            )
+        return header_df, data, spy.call_count
+
+    def _assert_same_as_text_read(self, header_df, data, encoding="utf-8"):
+        """Assert that header_df and data are the same as when the whole file is read as text, as in previous
+        versions"""
+        text_header, text_data = _input_files.split_input_header(
+            pd.read_csv(self.csv_file, dtype=str, encoding=encoding)
+        )
+        pd.testing.assert_frame_equal(header_df, text_header)
+        # Integer columns are float64 when read directly as numbers, and values may differ in their last bit
+        pd.testing.assert_frame_equal(data, text_data, check_dtype=False, check_exact=False, rtol=1e-15)
+
+    def test_header_rows(self):
+        """Test files with 0, 1, and 2 header rows, which are read as text only up to the first numeric rows."""
+        for header in [[], ["s,W m**-2,-"], [",Radiation,Count", "s,W m**-2,-"]]:
+            with self.subTest(header_rows=len(header)):
+                self._write(["Time,d1,d2"] + header + self.rows)
+                header_df, data, text_reads = self._read()
+                self.assertEqual(text_reads, 1)
+                self.assertTrue((data.dtypes == np.float64).all())
+                self.assertEqual(len(header_df), len(header))
+                self.assertEqual(len(data), len(self.rows))
+                self._assert_same_as_text_read(header_df, data)
+
+    def test_not_numbers(self):
+        """Test that values that are not numbers make the file be read as text, and become NaN, also after the rows
+        used to find the header rows. Empty values, and values that pandas reads as missing, are NaN without reading
+        the file as text."""
+        for row, value, expected_text_reads in [
+            (3, "x", 2),
+            (40, "abc", 2),
+            (45, "1,5", 2),
+            (3, "", 1),
+            (40, "n/a", 1),
+            (45, "NaN", 1),
+        ]:
+            with self.subTest(row=row, value=value):
+                rows = list(self.rows)
+                rows[row] = rows[row].rsplit(",", 1)[0] + f',"{value}"'
+                self._write(["Time,d1,d2", "s,W m**-2,-"] + rows)
+                header_df, data, text_reads = self._read()
+                self.assertEqual(text_reads, expected_text_reads)
+                self.assertTrue(np.isnan(data.loc[row, "d2"]))
+                self._assert_same_as_text_read(header_df, data)
+
+    def test_no_numeric_rows(self):
+        """Test a file with only header rows."""
+        self._write(["Time,d1,d2", "s,W m**-2,-"])
+        header_df, data, _ = self._read()
+        self.assertEqual(len(data), 0)
+        self._assert_same_as_text_read(header_df, data)
+
+    def test_windows_1252(self):
+        """Test that a file which is not valid UTF-8 is read with the Windows-1252 encoding."""
+        self._write(["Time,d1,d2", ",Temperature,Radiation", "s,\u00b0C,\u00b5mol m**-2 s**-1"] + self.rows, "cp1252")
+        with self.assertRaises(UnicodeDecodeError):
+            pd.read_csv(self.csv_file, dtype=str, encoding="utf-8")
+        header_df, data, text_reads = self._read()
+        self.assertEqual(text_reads, 1)
+        self.assertEqual(header_df.loc[1, "d1"], "\u00b0C")
+        self._assert_same_as_text_read(header_df, data, "Windows-1252")
+
+
+if __name__ == "__main__":
+    unittest.main()
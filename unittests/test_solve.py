@@ -0,0 +1,324 @@
+"""
+Unit tests for the GreenLight solve package.
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csc_matrix
+
+import greenlight
+from greenlight._load import _utils as _load_utils
+from greenlight._solve import _jac_sparsity, _scalar_code, _solve_ivp_from_str
+from greenlight._solve._input_interpolator import InputInterpolator
+
+
+class TestInputInterpolator(unittest.TestCase):
+    """Test cases for the input data interpolator."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        rng = np.random.default_rng(0)
+        self.time = np.cumsum(rng.random(50))
+        self.values = rng.random((50, 3))
+        # Time points outside the data, at the data, and in increasing order as requested by a solver
+        self.t_points = np.concatenate(
+            (
+                rng.uniform(self.time[0] - 1, self.time[-1] + 1, 200),
+                self.time,
+                np.sort(rng.uniform(self.time[0], self.time[-1], 200)),
+            )
+        )
+
+    def test_linear_matches_numpy_interp(self):
+        """Test that linear interpolation gives the same values as np.interp for each column."""
+        interpolator = InputInterpolator(self.time, self.values, "linear")
+        for t in self.t_points:
+            expected = [np.interp(t, self.time, self.values[:, col]) for col in range(3)]
+            np.testing.assert_allclose(interpolator(t), expected, rtol=1e-12, atol=1e-12)
+
+    def test_left_uses_last_earlier_row(self):
+        """Test that left interpolation uses the last row with time smaller than t."""
+        interpolator = InputInterpolator(self.time, self.values, "left")
+        for t in self.t_points:
+            row = np.clip(np.searchsorted(self.time, t) - 1, 0, len(self.time) - 1)
+            np.testing.assert_array_equal(interpolator(t), self.values[row])
+
+    def test_uniform_grid(self):
+        """Test that with equally spaced time points, the interval found from step gives the same values as searching
+        the data, also for time points on the grid, within 1e-9 of it, and for grids with small rounding errors."""
+        rng = np.random.default_rng(1)
+        # Time in seconds from the start of the data, and from an epoch (where 1e-9 is below the resolution)
+        grids = [300 * np.arange(50.0), 1.7e9 + 300 * np.arange(50.0)]
+        for time in grids + [grid + rng.uniform(-1e-5, 1e-5, len(grid)) for grid in grids]:
+            step = _load_utils.uniform_step(time)
+            self.assertIsNotNone(step)
+            self.assertAlmostEqual(step, 300, delta=1e-6)
+
+            on_grid = np.concatenate((time, time[0] + step * np.arange(len(time))))
+            t_points = np.concatenate(
+                (
+                    on_grid,
+                    on_grid - 1e-9,
+                    on_grid + 1e-9,
+                    np.nextafter(on_grid, np.inf),
+                    np.nextafter(on_grid, -np.inf),
+                    rng.uniform(time[0] - 600, time[-1] + 600, 200),
+                )
+            )
+            rows = np.searchsorted(time, t_points) - 1
+            np.testing.assert_array_equal(_load_utils.find_rows(time, t_points, step), rows)
+
+            for mode in ["linear", "left"]:
+                searching = InputInterpolator(time, self.values, mode)
+                uniform = InputInterpolator(time, self.values, mode, step=step)
+                for t, row in zip(t_points, rows):
+                    self.assertEqual(uniform._interval(t), row, f"{mode}, {t!r}")
+                    np.testing.assert_array_equal(uniform(t), searching(t), err_msg=f"{mode}, {t!r}")
+
+    def test_uniform_step(self):
+        """Test that uniform_step only gives a step for grids whose time points are all within 1e-6 steps of the
+        uniform grid."""
+        grid = 300 * np.arange(50.0)
+        self.assertEqual(_load_utils.uniform_step(grid), 300)
+        self.assertEqual(_load_utils.uniform_step(grid[:2]), 300)
+        self.assertIsNone(_load_utils.uniform_step(self.time))
+        for index in [1, 25, 48]:
+            nearly_uniform = grid.copy()
+            nearly_uniform[index] += 300 * 1e-3
+            self.assertIsNone(_load_utils.uniform_step(nearly_uniform), index)
+            nearly_uniform[index] = grid[index] + 300 * 1e-5
+            self.assertIsNone(_load_utils.uniform_step(nearly_uniform), index)
+            nearly_uniform[index] = grid[index] + 300 * 1e-7
+            self.assertAlmostEqual(_load_utils.uniform_step(nearly_uniform), 300)
+        self.assertIsNone(_load_utils.uniform_step(np.array([0.0])))
+        self.assertIsNone(_load_utils.uniform_step(np.zeros(5)))
+        self.assertIsNone(_load_utils.uniform_step(grid[::-1]))
+
+    def test_single_row(self):
+        """Test that data with a single time point is returned for any t."""
+        interpolator = InputInterpolator(np.array([5.0]), np.array([[1.0, 2.0]]), "linear")
+        np.testing.assert_array_equal(interpolator(0), [1.0, 2.0])
+        np.testing.assert_array_equal(interpolator(10), [1.0, 2.0])
+
+
+class TestJacobianSparsity(unittest.TestCase):
+    """Test cases for the sparsity pattern of the Jacobian passed to implicit solvers."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        # y1 depends on y2 through a1, y3 on y1, y4 on y2, and y2 only on itself
+        self.model = {
+            "y1": {"type": "state", "definition": "a1 - y1", "init": "1"},
+            "a1": {"type": "aux", "definition": "y2 * 2"},
+            "y2": {"type": "state", "definition": "-y2", "init": "1"},
+            "y3": {"type": "state", "definition": "y1 * y3", "init": "1"},
+            "y4": {"type": "state", "definition": "np.sin(y4) + y2", "init": "1"},
+        }
+        self.pattern = np.array([[1, 1, 0, 0], [0, 1, 0, 0], [1, 0, 1, 0], [0, 1, 0, 1]])
+
+    def _load(self, model=None, **options):
+        """Load a model with the given options, and return the loaded GreenLight object"""
+        mdl = greenlight.GreenLight(input_prompt=[model or self.model, {"options": {"t_end": "100"} | options}])
+        mdl.load()
+        return mdl
+
+    def test_jac_sparsity(self):
+        """Test that the sparsity pattern includes dependencies through auxiliary states and the diagonal."""
+        np.testing.assert_array_equal(_jac_sparsity.jac_sparsity(self._load()).toarray(), self.pattern)
+
+    def test_column_groups(self):
+        """Test that the columns are grouped greedily, and that no two columns in a group share a row."""
+        sparsity = _jac_sparsity.jac_sparsity(self._load())
+        groups = _jac_sparsity.column_groups(sparsity)
+        np.testing.assert_array_equal(groups, [0, 1, 1, 0])
+
+        rng = np.random.default_rng(0)
+        for pattern in [self.pattern, np.eye(6), np.ones((5, 5)), rng.random((30, 30)) < 0.1]:
+            groups = _jac_sparsity.column_groups(csc_matrix(pattern.astype(float)))
+            for group in np.unique(groups):
+                rows_per_column = pattern[:, groups == group].sum(axis=1)
+                self.assertLessEqual(rows_per_column.max(), 1, f"Columns of group {group} share a row")
+        self.assertEqual(_jac_sparsity.column_groups(csc_matrix(np.eye(6))).max(), 0)
+        self.assertEqual(_jac_sparsity.column_groups(csc_matrix(np.ones((5, 5)))).max(), 4)
+
+    def test_sparsity_solver_options(self):
+        """Test the keyword arguments passed to each solver."""
+        for solver in ["BDF", "Radau"]:
+            options = _jac_sparsity.sparsity_solver_options(self._load(jac_sparsity="True", solver=solver))
+            np.testing.assert_array_equal(options["jac_sparsity"].toarray(), self.pattern)
+        self.assertEqual(_jac_sparsity.sparsity_solver_options(self._load(jac_sparsity="True", solver="RK45")), {})
+        # The pattern of self.model is not banded, a chain of states is
+        self.assertEqual(_jac_sparsity.sparsity_solver_options(self._load(jac_sparsity="True", solver="LSODA")), {})
+        chain = {f"y{i}": {"type": "state", "definition": f"y{i - 1} - y{i}", "init": "1"} for i in range(1, 6)}
+        chain["y0"] = {"type": "const", "definition": "1"}
+        self.assertEqual(
+            _jac_sparsity.sparsity_solver_options(self._load(chain, jac_sparsity="True", solver="LSODA")),
+            {"lband": 1, "uband": 0},
+        )
+
+    def test_sparsity_off_by_default(self):
+        """Test that the sparsity pattern is only passed to the solver if options["jac_sparsity"] is "True". The grouped
+        finite difference Jacobian made BDF fail on the Katzin 2021 model with left interpolation, which completes
+        with the full Jacobian."""
+        mdl = self._load()
+        self.assertEqual(mdl.options["jac_sparsity"], "False")
+        self.assertEqual(_jac_sparsity.sparsity_solver_options(mdl), {})
+
+        for jac_sparsity in ["False", "True"]:
+            mdl = self._load(jac_sparsity=jac_sparsity)
+            with mock.patch.object(_solve_ivp_from_str, "solve_ivp", wraps=_solve_ivp_from_str.solve_ivp) as solve_ivp:
+                mdl.solve()
+            self.assertEqual("jac_sparsity" in solve_ivp.call_args.kwargs, jac_sparsity == "True")
+            self.assertTrue(mdl.states_sol.success)
+
+
+class TestSolveParameters(unittest.TestCase):
+    """Test cases for solving a model again with new values for its parameters."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        # k2 depends on the parameter k1, and k3 on the aux state a1, so k3 is not a parameter
+        self.model = {
+            "k1": {"type": "const", "definition": "0.5"},
+            "k2": {"type": "const", "definition": "2 * k1"},
+            "a1": {"type": "aux", "definition": "k2 * y1"},
+            "y1": {"type": "state", "definition": "-a1", "init": "1"},
+            "y2": {"type": "state", "definition": "k1 - y2", "init": "0"},
+        }
+
+    def _load(self, k1="0.5", **options):
+        """Load the model with k1 set to the given definition, and return the loaded GreenLight object"""
+        model = self.model | {"k1": {"type": "const", "definition": k1}}
+        options = {"t_end": "10", "parametrize_consts": "True", "expand_variables": "False"} | options
+        mdl = greenlight.GreenLight(input_prompt=[model, {"options": options}])
+        mdl.load()
+        return mdl
+
+    def _solve(self, mdl, params=None):
+        """Solve mdl with params, and return a copy of its full solution"""
+        mdl.solve(params)
+        return mdl.full_sol.copy()
+
+    def test_params_match_fresh_load(self):
+        """Test that solving with params gives the same solution as loading the model with the changed constant."""
+        for solving_method in ["solve_ivp_from_str", "solve_ivp"]:
+            with self.subTest(solving_method=solving_method):
+                mdl = self._load(solving_method=solving_method)
+                self.assertEqual(mdl.parameters, ["k1", "k2"])
+                solution = self._solve(mdl, {"k1": 0.25})
+                fresh = self._solve(self._load("0.25", solving_method=solving_method))
+                pd.testing.assert_frame_equal(solution, fresh)
+                np.testing.assert_allclose(solution["a1"], 0.5 * solution["y1"])
+
+    def test_params_not_a_parameter(self):
+        """Test that a ValueError is raised for names that are not parameters, before any parameter is changed."""
+        mdl = self._load()
+        definitions = dict(mdl.variables_formatted)
+        for name in ["a1", "y1", "no_such_name"]:
+            with self.assertRaisesRegex(ValueError, f"'{name}' is not a parameter"):
+                mdl.solve({"k1": 0.25, name: 1.0})
+        self.assertEqual(mdl.variables_formatted, definitions)
+
+    def test_params_apply_to_one_solve(self):
+        """Test that params are used only in the solve they are given to, and that the loaded values are used
+        otherwise."""
+        mdl = self._load()
+        definitions = dict(mdl.variables_formatted)
+        loaded = self._solve(mdl)
+        changed = self._solve(mdl, {"k1": 0.25})
+        self.assertEqual(mdl.variables_formatted, definitions)
+        self.assertIn("Parameter k1 set to 0.25 for this solve", mdl.log)
+
+        pd.testing.assert_frame_equal(self._solve(mdl), loaded)
+        pd.testing.assert_frame_equal(self._solve(mdl, {"k1": 0.25}), changed)
+        # A second parameter given alone is combined with the loaded value of the first
+        pd.testing.assert_frame_equal(self._solve(mdl, {"k2": 0.5}), self._solve(self._load(), {"k1": 0.5, "k2": 0.5}))
+
+
+class TestScalarCode(unittest.TestCase):
+    """Test cases for converting model commands into commands operating on Python floats."""
+
+    def _evaluate(self, commands, y, d, p):
+        """Evaluate commands with NumPy arrays, and converted to Python floats, and return both values of dy"""
+        n_aux = sum(command.startswith("a[") for command in commands)
+        namespace = {"np": np, "y": np.array(y), "d": np.array(d), "p": np.array(p), "a": np.zeros(n_aux)}
+        namespace["dy"] = np.zeros(len(y))
+        with np.errstate(all="ignore"):
+            for command in commands:
+                exec(command, namespace)
+
+        initializations, converted = _scalar_code.scalar_commands(commands)
+        scalar_namespace = dict(_scalar_code.SCALAR_FUNCTIONS)
+        for name, values in (("y", y), ("d", d), ("p", p)):
+            scalar_namespace.update({f"{name}_{i}": float(value) for i, value in enumerate(values)})
+        for command in initializations + converted:
+            exec(command, scalar_namespace)
+        return namespace["dy"], np.array([scalar_namespace[f"dy_{i}"] for i in range(len(y))])
+
+    def test_docstring_example(self):
+        """Test the example in the docstring of scalar_commands."""
+        self.assertEqual(
+            _scalar_code.scalar_commands(["a[0] = np.exp(y[0]) * a[1]", "a[1] = d[1]", "dy[0] = a[0]**0.5"]),
+            (["a_1 = 0.0"], ["a_0 = math.exp(y_0) * a_1", "a_1 = d_1", "dy_0 = math.pow(a_0, 0.5)"]),
+        )
+
+    def test_matches_array_commands(self):
+        """Test that the converted commands give the same values as the NumPy commands, for np.where, np.maximum and
+        np.minimum with NaN, powers, elements of a read before they are assigned, and functions of the math package."""
+        commands = [
+            "a[0] = a[2] + y[0]",  # a[2] is read before it is assigned, and is zero
+            "a[1] = np.where(y[0] > 0, y[1], -y[1])",
+            "a[2] = np.maximum(y[1], d[1]) + np.minimum(d[1], y[2])",
+            "dy[0] = a[0] * p[0] + a[1] + dy[1]",  # dy[1] is read before it is assigned, and is zero
+            "dy[1] = np.maximum(d[2], y[0]) + np.minimum(y[0], d[2])",  # d[2] is NaN
+            "dy[2] = (-y[2]) ** 3 + y[1] ** -2 + np.abs(y[2]) ** 0.5 + np.exp(-y[2] ** 2) + np.sign(y[0])",
+        ]
+        initializations, _ = _scalar_code.scalar_commands(commands)
+        self.assertEqual(initializations, ["a_2 = 0.0", "dy_1 = 0.0"])
+
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            y = rng.standard_normal(3).tolist()
+            array_dy, scalar_dy = self._evaluate(commands, y, [0.0, rng.standard_normal(), np.nan], [2.0])
+            self.assertTrue(np.isnan(array_dy[1]) and np.isnan(scalar_dy[1]))
+            np.testing.assert_allclose(scalar_dy, array_dy, rtol=1e-14)
+
+    def test_invalid_operations_raise(self):
+        """Test that invalid operations, for which NumPy returns NaN or inf, raise an error in the converted
+        commands: a fractional power of a negative base, the logarithm of a negative number, and division by zero."""
+        for command, error in [
+            ("dy[0] = y[0] ** 0.5", ValueError),
+            ("dy[0] = y[0] ** p[0]", ValueError),
+            ("dy[0] = np.log(y[0])", ValueError),
+            ("dy[0] = 1 / (y[0] + 1)", ZeroDivisionError),
+        ]:
+            with self.subTest(command=command):
+                array_dy, _ = self._evaluate([command], [0.5], [0.0], [0.5])
+                self.assertTrue(np.isfinite(array_dy).all())
+                with self.assertRaises(error):
+                    self._evaluate([command], [-1.0], [0.0], [0.5])
+
+    def test_fallback(self):
+        """Test that a solve with rhs_mode "scalar" uses the NumPy function for calls in which the scalar function
+        raises an ArithmeticError, logs these calls, and gives the same solution as rhs_mode "array"."""
+        # np.where evaluates both of its branches, 1 / y1 raises a ZeroDivisionError at y1 = 0
+        model = {"y1": {"type": "state", "definition": "np.where(y1 > 0, 1 / y1, 0) + 1", "init": "0"}}
+        solutions = {}
+        for rhs_mode in ["array", "scalar"]:
+            options = {"t_end": "10", "rhs_mode": rhs_mode, "solver": "RK45", "expand_variables": "False"}
+            mdl = greenlight.GreenLight(input_prompt=[model, {"options": options}])
+            mdl.load()
+            with np.errstate(divide="ignore"):
+                mdl.solve()
+            self.assertTrue(mdl.states_sol.success)
+            solutions[rhs_mode] = mdl.states_sol.y
+            self.assertEqual("encountered invalid operations" in mdl.log, rhs_mode == "scalar")
+        self.assertIn("encountered invalid operations in 1 calls", mdl.log)
+        np.testing.assert_array_equal(solutions["scalar"], solutions["array"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -67,6 +67,73 @@ class TestGreenLightUtils(unittest.TestCase):
         finally:
             os.chdir(original_cwd)
 
+    def test_convert_input_data_to_npz(self):
+        """Test that convert_input_data keeps the data, units, and descriptions of a CSV file."""
+        from greenlight._load import _input_files
+
+        csv_file = os.path.join(self.temp_dir, "input.csv")
+        with open(csv_file, "w", encoding="utf-8") as file:
+            file.write("Time,d\n,Electricity input power\ns,W\n0,0\n300,50.5\n600,150\n")
+        npz_file = os.path.join(self.temp_dir, "input.npz")
+
+        greenlight.utils.convert_input_data(csv_file, npz_file)
+        header_df, data = _input_files.read_input_table(lambda mode: open(npz_file, mode), ".npz")
+
+        self.assertEqual(list(data.columns), ["Time", "d"])
+        self.assertEqual(data["d"].tolist(), [0.0, 50.5, 150.0])
+        self.assertEqual(header_df.loc[0, "d"], "Electricity input power")
+        self.assertEqual(header_df.loc[1, "Time"], "s")
+        self.assertEqual(header_df.loc[1, "d"], "W")
+
+    def test_convert_input_data_to_npy(self):
+        """Test that input data converted to a .npy file is read memory-mapped, and stays memory-mapped in the input
+        interpolator built when solving the model, with either solving method."""
+        from unittest import mock
+
+        from greenlight._load import _input_files
+        from greenlight._solve import _solve_ivp, _solve_ivp_from_str
+
+        csv_file = os.path.join(self.temp_dir, "input.csv")
+        with open(csv_file, "w", encoding="utf-8") as file:
+            file.write("Time,d\ns,W\n0,0\n300,50.5\n600,150\n")
+        npy_file = os.path.join(self.temp_dir, "input.npy")
+
+        greenlight.utils.convert_input_data(csv_file, npy_file)
+        header_df, data = _input_files.read_input_array(npy_file)
+
+        self.assertTrue(os.path.exists(npy_file + ".json"))
+        self.assertEqual(list(data.columns), ["Time", "d"])
+        self.assertEqual(data["d"].tolist(), [0.0, 50.5, 150.0])
+        self.assertEqual(header_df.loc[0, "d"], "W")
+        del data  # Release the memory-mapped file, so that it can be removed
+
+        model = {
+            "x": {"type": "state", "definition": "d - x", "init": "0"},
+            "d": {"type": "input", "definition": "0"},
+        }
+        for solving_method, module in (("solve_ivp_from_str", _solve_ivp_from_str), ("solve_ivp", _solve_ivp)):
+            with self.subTest(solving_method=solving_method):
+                interpolators = []
+                input_interpolator = module.InputInterpolator
+
+                def build_interpolator(*args, **kwargs):
+                    interpolators.append(input_interpolator(*args, **kwargs))
+                    return interpolators[-1]
+
+                mdl = greenlight.GreenLight(
+                    base_path=self.temp_dir,
+                    input_prompt=[model, "input.npy", {"options": {"t_end": "600", "solving_method": solving_method}}],
+                )
+                mdl.load()
+                with mock.patch.object(module, "InputInterpolator", side_effect=build_interpolator):
+                    mdl.solve()
+
+                self.assertEqual(len(interpolators), 1)
+                self.assertTrue(interpolators[0].mapped)
+                self.assertEqual(interpolators[0](450.0)[-1], 100.25)
+                del mdl  # Release the memory-mapped file, so that it can be removed
+                interpolators.clear()
+
 
 if __name__ == '__main__':
     unittest.main()